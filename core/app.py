@@ -1,45 +1,57 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, Response
 from flask_cors import CORS
 from datetime import datetime
-import json
-import re
 import threading
+import asyncio
 import time
 from typing import Optional
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict, fields
 import os
 import io
-import mimetypes
-import struct
-import google.generativeai as genai
+import copy
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 
 # --- ADIÇÃO NECESSÁRIA: Importar a chave da API do config.py ---
 from config import GOOGLE_API_KEY as GEMINI_API_KEY_FROM_CONFIG
+from config import TOPICS_CACHE_TTL, GENERATION_LEASE_TTL, GENERATION_POLL_INTERVAL, GENERATION_WAIT_TIMEOUT, TTS_CACHE_MAX_BYTES
+from config import NEWS_MEMORY_CACHE_MAX_BYTES, NEWS_GENERATION_CHECK_INTERVAL
+from config import NEWS_CACHE_TTL, NEWS_CACHE_CATEGORY_TTLS, NEWS_CACHE_MAX_BYTES, CACHE_JANITOR_INTERVAL
+from config import NEWS_JOB_WORKERS, NEWS_JOB_MAX_ATTEMPTS, NEWS_JOB_RETENTION
+from config import NEWS_PREFETCH_TOP_K, NEWS_PREFETCH_MAX_CONCURRENT, NEWS_PREFETCH_DAILY_TOKENS, NEWS_PREFETCH_TOKENS_ESTIMATE
+from config import NEWS_BATCH_SIZE, NEWS_BATCH_MAX_WORKERS, NEWS_BATCH_MAX_ITEMS
+from config import NEWS_DEDUP_THRESHOLD, UPSTREAM_MODE
 
-try:
-    from google.adk.agents import Agent
-    from google.adk.tools import google_search
-    from utils import call_agent
-except ImportError:
-    print("AVISO: 'google.adk' ou 'utils' não encontradas. A geração de notícias pode falhar.")
-    Agent = None
-    google_search = None
-    def call_agent(agent, prompt): return "{}"
+# O ADK e os SDKs da Gemini são importados só no primeiro uso (agente e TTS), não na inicialização do servidor
+def call_agent(agent, prompt, on_progress=None):
+    from utils import call_agent as _call_agent
+    return _call_agent(agent, prompt, on_progress=on_progress)
+
+async def call_agent_async(agent, prompt, on_progress=None):
+    from utils import call_agent_async as _call_agent_async
+    return await _call_agent_async(agent, prompt, on_progress=on_progress)
 
 from utils_cache_sqlite import * # Importa as funções atualizadas
+from utils_singleflight import SingleFlight
+from utils_json import RawJSON, agent_json_stats, dumps_with_raw, parse_agent_json
+from utils_janitor import CacheJanitor
+from utils_jobs import JobProgress, NewsJobQueue
+from utils_prefetch import NewsPrefetcher, estimate_tokens
+from utils_governor import UpstreamUnavailable, agent_governor, tts_governor
+from utils_replay import agent_fixtures, tts_fixtures
+from utils_similarity import TopicSimilarityIndex
+from utils_http import conditional_response, parse_db_timestamp, response_body_cache
+from utils_tts import TTS_MODEL_NAME, build_wav_header, convert_to_wav, is_raw_pcm, iter_article_audio, tts_cache_key
 
 # --- Configuração do Flask ---
 app = Flask(__name__)
 CORS(app)
 
 # --- Configuração da API Gemini para TTS ---
-try:
-    if not GEMINI_API_KEY_FROM_CONFIG:
-        print("AVISO: GEMINI_API_KEY não definida em config.py. A funcionalidade TTS falhará.")
-    else:
-        genai.configure(api_key=GEMINI_API_KEY_FROM_CONFIG)
-except Exception as e:
-    print(f"Erro ao configurar Gemini TTS: {e}")
+# O SDK é configurado com a chave na primeira síntese (ver utils_tts)
+if not GEMINI_API_KEY_FROM_CONFIG:
+    print("AVISO: GEMINI_API_KEY não definida em config.py. A funcionalidade TTS falhará.")
 
 # --- Tuas Classes e Sistema de Notícias Existentes ---
 @dataclass
@@ -51,27 +63,66 @@ class NewsArticle:
     categoria: str = ""
     noticia_completa: str = ""
 
+    @classmethod
+    def from_agent(cls, data, categoria: str) -> Optional["NewsArticle"]:
+        """
+        Valida a notícia devolvida pelo agente: precisa de título e texto de verdade (não os "..." do modelo
+        de resposta do prompt). Campos desconhecidos são descartados e valores não textuais viram texto.
+        Retorna None se a notícia for inválida.
+        """
+        if not isinstance(data, dict):
+            return None
+        values = {
+            field.name: " ".join(str(data[field.name]).split()) if field.name != "noticia_completa" else str(data[field.name]).strip()
+            for field in fields(cls) if data.get(field.name) is not None
+        }
+        if any(values.get(campo, "").strip(". ") == "" for campo in ("titulo", "noticia_completa")):
+            return None
+        values["categoria"] = categoria
+        return cls(**values)
+
 class NewsSystemOptimized:
     def __init__(self, model: str = "gemini-2.0-flash"):
         self.model = model
-        self._setup_agents()
+        self._agent_lock = threading.Lock()
+        self._unified_agent = None
+        self._agents_ready = False
+
+    @property
+    def unified_agent(self):
+        """Agente criado no primeiro uso (importar o ADK é a parte mais lenta da inicialização)."""
+        if not self._agents_ready:
+            with self._agent_lock:
+                if not self._agents_ready:
+                    self._setup_agents()
+                    self._agents_ready = True
+        return self._unified_agent
+
+    @unified_agent.setter
+    def unified_agent(self, agent):
+        self._unified_agent = agent
+        self._agents_ready = True
 
     def _setup_agents(self):
-        if Agent:
-            self.unified_agent = Agent(
-                name="agente_unificado_noticias",
-                model=self.model,
-                instruction="""
-                Você é um jornalista especializado em pesquisa e produção de conteúdo.
-                Suas funções incluem:
-                1. Identificar tópicos em alta
-                2. Pesquisar notícias relevantes
-                3. Gerar conteúdo completo e bem estruturado
-                """,
-                tools=[google_search]
-            )
-        else:
-            self.unified_agent = None
+        try:
+            from google.adk.agents import Agent
+            from google.adk.tools import google_search
+        except ImportError:
+            print("AVISO: 'google.adk' não encontrada. A geração de notícias pode falhar.")
+            self._unified_agent = None
+            return
+        self._unified_agent = Agent(
+            name="agente_unificado_noticias",
+            model=self.model,
+            instruction="""
+            Você é um jornalista especializado em pesquisa e produção de conteúdo.
+            Suas funções incluem:
+            1. Identificar tópicos em alta
+            2. Pesquisar notícias relevantes
+            3. Gerar conteúdo completo e bem estruturado
+            """,
+            tools=[google_search]
+        )
 
     def get_trending_topics(self, limit: int = 20):
         if not self.unified_agent: return []
@@ -87,20 +138,28 @@ class NewsSystemOptimized:
             ]
         }}
         """
+        def validate(data):
+            if not isinstance(data, dict) or not isinstance(data.get("topicos"), list):
+                return None
+            topicos = [
+                {"topico": " ".join(str(item["topico"]).split()), "categoria": " ".join(str(item.get("categoria") or "Geral").split())}
+                for item in data["topicos"]
+                if isinstance(item, dict) and str(item.get("topico") or "").strip(". ")
+            ]
+            return topicos or None
+
         try:
             response = call_agent(self.unified_agent, prompt)
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                data = json.loads(json_match.group())
-                return data.get("topicos", [])
+            topicos = parse_agent_json(response, "topicos", validate)
+            if topicos is None:
+                print("Resposta do agente sem uma lista de tópicos válida.")
+            return topicos or []
         except Exception as e:
             print(f"Erro ao buscar tópicos: {e}")
         return []
 
-    def search_and_process_news(self, topico: str, categoria: str) -> Optional[dict]:
-        if not self.unified_agent: return None
-
-        prompt = f"""
+    def _news_prompt(self, topico: str, categoria: str) -> str:
+        return f"""
         Gere uma notícia detalhada para o tópico: {topico} (categoria: {categoria})
         Formato:
         {{
@@ -114,74 +173,521 @@ class NewsSystemOptimized:
             "status": "Notícia completa gerada com sucesso!"
         }}
         """
+
+    def _parse_news(self, response: str, topico: str, categoria: str) -> Optional[dict]:
+        def validate(data):
+            article = NewsArticle.from_agent(data.get("noticia") if isinstance(data, dict) else None, categoria)
+            if article is None:
+                return None
+            return {"noticia": asdict(article), "status": str(data.get("status") or "Notícia completa gerada com sucesso!")}
+
+        result = parse_agent_json(response, "noticia", validate)
+        if result is None:
+            print(f"Resposta do agente sem uma notícia válida para '{topico}'.")
+        return result
+
+    def search_and_process_news(self, topico: str, categoria: str, on_progress=None, on_usage=None) -> Optional[dict]:
+        """
+        Gera a notícia com o agente. Se 'on_progress' for informado, a resposta é gerada em modo
+        streaming e o andamento é repassado a ele (ver call_agent).
+        'on_usage(tokens)', se informado, recebe a estimativa de tokens gastos na chamada.
+        """
+        if not self.unified_agent: return None
+
+        prompt = self._news_prompt(topico, categoria)
         try:
-            response = call_agent(self.unified_agent, prompt)
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group())
+            response = call_agent(self.unified_agent, prompt, on_progress=on_progress)
+            if on_usage:
+                on_usage(estimate_tokens(prompt, response))
+            return self._parse_news(response, topico, categoria)
+        except UpstreamUnavailable:
+            raise  # As rotas respondem 503 em vez de "notícia não encontrada"
         except Exception as e:
             print(f"Erro ao processar notícia: {e}")
         return None
 
-# --- Funções Auxiliares para TTS ---
-def convert_to_wav(audio_data: bytes, mime_type: str) -> bytes:
-    """Gera um cabeçalho WAV para os dados de áudio."""
-    parameters = parse_audio_mime_type(mime_type)
-    bits_per_sample = parameters["bits_per_sample"]
-    sample_rate = parameters["rate"]
-    num_channels = 1
-    data_size = len(audio_data)
-    bytes_per_sample = bits_per_sample // 8
-    block_align = num_channels * bytes_per_sample
-    byte_rate = sample_rate * block_align
-    chunk_size = 36 + data_size
-
-    print(f"Convertendo para WAV: bits_per_sample={bits_per_sample}, sample_rate={sample_rate}, num_channels={num_channels}, data_size={data_size}")
-    header = struct.pack(
-        "<4sI4s4sIHHIIHH4sI",
-        b"RIFF", chunk_size, b"WAVE", b"fmt ",
-        16, 1, num_channels, sample_rate,
-        byte_rate, block_align, bits_per_sample,
-        b"data", data_size
-    )
-    return header + audio_data
-
-def parse_audio_mime_type(mime_type: str) -> dict[str, int | None]:
-    """Extrai bits_per_sample e rate do MIME type."""
-    bits_per_sample = 16
-    rate = 24000
-    print(f"Analisando MIME type: {mime_type}")
-    parts = mime_type.split(";")
-    for param in parts:
-        param = param.strip()
-        if param.lower().startswith("rate="):
-            try:
-                rate = int(param.split("=", 1)[1])
-            except (ValueError, IndexError):
-                pass
-        elif param.startswith("audio/L"):
-            try:
-                bits_per_sample = int(param.split("L", 1)[1])
-            except (ValueError, IndexError):
-                pass
-    print(f"Analisado: bits_per_sample={bits_per_sample}, rate={rate}")
-    return {"bits_per_sample": bits_per_sample, "rate": rate}
+    async def search_and_process_news_async(self, topico: str, categoria: str, on_progress=None) -> Optional[dict]:
+        """Versão de search_and_process_news para o modo ASGI (ver call_agent_async)."""
+        # O primeiro uso importa o ADK (segundos): numa thread, para não travar o event loop
+        agent = self._unified_agent if self._agents_ready else await asyncio.to_thread(lambda: self.unified_agent)
+        if not agent: return None
+
+        prompt = self._news_prompt(topico, categoria)
+        try:
+            response = await call_agent_async(agent, prompt, on_progress=on_progress)
+            return self._parse_news(response, topico, categoria)
+        except UpstreamUnavailable:
+            raise
+        except Exception as e:
+            print(f"Erro ao processar notícia: {e}")
+        return None
+
+    def search_and_process_news_batch(self, itens: list, on_usage=None) -> dict:
+        """
+        Gera as notícias de vários (topico, categoria) numa única chamada ao agente, dividindo a resposta
+        de volta por tópico. Retorna {(topico, categoria): noticia} só com as notícias que vieram completas;
+        as que faltarem devem ser geradas uma a uma pelo chamador.
+        """
+        if not self.unified_agent or not itens: return {}
+
+        lista = "\n".join(f"{i}. {topico} (categoria: {categoria})" for i, (topico, categoria) in enumerate(itens, 1))
+        prompt = f"""
+        Gere uma notícia detalhada para cada um dos tópicos abaixo, pesquisando cada tópico separadamente.
+        Tópicos:
+        {lista}
+        Formato (uma entrada por tópico, na mesma ordem, com o tópico exatamente como na lista):
+        {{
+            "noticias": [
+                {{
+                    "topico": "...",
+                    "noticia": {{
+                        "titulo": "...",
+                        "data": "...",
+                        "fonte": "...",
+                        "categoria": "...",
+                        "noticia_completa": "..."
+                    }}
+                }}
+            ]
+        }}
+        """
+        def validate(data):
+            entradas = data.get("noticias") if isinstance(data, dict) else None
+            return entradas if isinstance(entradas, list) and entradas else None
 
+        try:
+            response = call_agent(self.unified_agent, prompt)
+            if on_usage:
+                on_usage(estimate_tokens(prompt, response))
+            entradas = parse_agent_json(response, "lote", validate) or []
+        except Exception as e:
+            print(f"Erro ao processar notícias em lote: {e}")
+            return {}
+
+        por_topico = {" ".join(topico.split()).casefold(): (topico, categoria) for topico, categoria in itens}
+        noticias = {}
+        for posicao, entrada in enumerate(entradas):
+            if not isinstance(entrada, dict):
+                continue
+            chave = por_topico.get(" ".join(str(entrada.get("topico") or "").split()).casefold())
+            if chave is None and len(entradas) == len(itens):
+                chave = itens[posicao]  # tópico reescrito pelo agente: vale a ordem da lista
+            if chave is None or chave in noticias:
+                continue
+            article = NewsArticle.from_agent(entrada.get("noticia"), chave[1])
+            if article is not None:
+                noticias[chave] = asdict(article)
+        return noticias
 
 # --- Inicialização ---
+# O ETag do áudio muda quando ele é regenerado, então o navegador pode guardá-lo mas deve revalidar
+AUDIO_CACHE_CONTROL = "public, max-age=3600, must-revalidate"
 news_system = NewsSystemOptimized()
 init_cache_db()
+configure_news_memory_cache(NEWS_MEMORY_CACHE_MAX_BYTES, NEWS_GENERATION_CHECK_INTERVAL)
+# Com o circuito do agente aberto as notícias vencidas não são removidas: são o que ainda dá para servir
+cache_janitor = CacheJanitor(
+    NEWS_CACHE_TTL, NEWS_CACHE_CATEGORY_TTLS, NEWS_CACHE_MAX_BYTES, CACHE_JANITOR_INTERVAL,
+    hold_expiration=lambda: agent_governor.is_open
+)
+cache_janitor.start()
+# Progresso dos jobs de geração em execução neste processo (job_id -> JobProgress),
+# exibido na consulta do job e transmitido por /api/news/jobs/<job_id>/events
 processing_status = {}
 
+# --- Cache de Tópicos em Alta (TTL + stale-while-revalidate) ---
+# Limites com atualização em segundo plano já em andamento, para não disparar o agente em dobro.
+_topics_refreshing = set()
+_topics_lock = threading.Lock()
+# Com o cache vazio, requisições simultâneas para o mesmo limite esperam uma única busca no agente
+_topics_flight = SingleFlight()
+
+def _refresh_trending_topics(limit: int):
+    """Busca os tópicos no agente e grava no cache. Listas vazias (falha) não sobrescrevem o cache."""
+    try:
+        topicos = news_system.get_trending_topics(limit)
+        if topicos:
+            save_topics_to_cache(limit, topicos)
+            try:
+                news_prefetcher.schedule(topicos)
+            except Exception as e:
+                print(f"Erro ao agendar a pré-geração dos tópicos: {e}")
+        return topicos
+    finally:
+        with _topics_lock:
+            _topics_refreshing.discard(limit)
+
+def _fetch_trending_topics(limit: int):
+    # Quem chega logo depois de uma busca terminar encontra o cache já preenchido
+    cached = get_cached_topics(limit)
+    if cached:
+        return cached["topicos"]
+    with _topics_lock:
+        _topics_refreshing.add(limit)
+    return _refresh_trending_topics(limit)
+
+def get_trending_topics_cached(limit: int):
+    """
+    Retorna (topicos, from_cache).
+    Entradas dentro do TTL são servidas direto; entradas vencidas são servidas na hora
+    e atualizadas numa thread em segundo plano. Só um cache vazio espera pelo agente, numa única
+    chamada por limite entre as requisições simultâneas.
+    """
+    cached = get_cached_topics(limit)
+    if cached:
+        if time.time() - cached["updated_at"] > TOPICS_CACHE_TTL:
+            with _topics_lock:
+                start_refresh = limit not in _topics_refreshing
+                _topics_refreshing.add(limit)
+            if start_refresh:
+                print(f"Tópicos em cache vencidos (limit={limit}), atualizando em segundo plano...")
+                threading.Thread(target=_refresh_trending_topics, args=(limit,), daemon=True).start()
+        return cached["topicos"], True
+
+    topicos, shared = _topics_flight.do(limit, lambda: _fetch_trending_topics(limit))
+    if shared:
+        print(f"Requisição de tópicos (limit={limit}) aproveitou uma busca em andamento.")
+    return topicos, False
+
+# --- Geração Coalescida de Notícias ---
+# Requisições simultâneas para o mesmo (topico, categoria) esperam uma única geração:
+# dentro do processo via SingleFlight e entre processos (ex: workers do gunicorn) via lease em cache.db.
+_news_flight = SingleFlight()
+
+class GenerationInProgress(Exception):
+    """A notícia continua sendo gerada em outro processo depois do tempo que a requisição podia esperar."""
+
+def _generate_news_with_lease(topico: str, categoria: str, on_progress=None, origem="sob_demanda", on_usage=None,
+                              max_wait=GENERATION_LEASE_TTL) -> Optional[dict]:
+    owner = f"{os.getpid()}-{uuid.uuid4().hex}"
+    deadline = time.time() + max_wait
+    while True:
+        if acquire_generation_lease(topico, categoria, owner, GENERATION_LEASE_TTL):
+            try:
+                result = news_system.search_and_process_news(topico, categoria, on_progress=on_progress, on_usage=on_usage)
+                if result and result.get("noticia"):
+                    # Só o dono do lease grava, evitando REPLACEs concorrentes
+                    save_news_to_cache(topico, categoria, result["noticia"], origem)
+                return result
+            finally:
+                release_generation_lease(topico, categoria, owner)
+
+        # Outro processo está gerando esta notícia: espera o lease ser liberado e lê do cache
+        print(f"Geração de '{topico}' ({categoria}) em andamento em outro processo, aguardando...")
+        if on_progress:
+            on_progress("etapa", {"mensagem": "Notícia sendo gerada por outra requisição, aguardando..."})
+        while is_generation_lease_active(topico, categoria) and time.time() < deadline:
+            time.sleep(GENERATION_POLL_INTERVAL)
+        cached_data = get_cached_news(topico, categoria)
+        if cached_data:
+            return {"noticia": cached_data["noticia"], "status": "Notícia gerada por outra requisição simultânea."}
+        if time.time() >= deadline:
+            raise GenerationInProgress(f"Geração de '{topico}' ({categoria}) ainda em andamento em outro processo.")
+        # O outro processo falhou sem gravar: tenta adquirir o lease e gerar
+
+def generate_news_coalesced(topico: str, categoria: str, on_progress=None, origem="sob_demanda", on_usage=None,
+                            max_wait=GENERATION_LEASE_TTL) -> Optional[dict]:
+    """
+    Gera (e salva no cache, com a 'origem' informada) a notícia de um (topico, categoria), agrupando requisições simultâneas.
+    Cada chamador recebe a sua própria cópia do resultado, pois as rotas acrescentam campos a ele.
+    O andamento e o gasto de tokens só são repassados a 'on_progress' e 'on_usage' se esta chamada for a que executa a geração.
+    Se outro processo estiver gerando a notícia, espera por ela até 'max_wait' segundos e depois levanta GenerationInProgress.
+    """
+    result, shared = _news_flight.do(
+        (topico, categoria),
+        lambda: _generate_news_with_lease(topico, categoria, on_progress, origem, on_usage, max_wait)
+    )
+    if shared:
+        print(f"Requisição para '{topico}' ({categoria}) aproveitou uma geração em andamento.")
+    return copy.deepcopy(result)
+
+# --- Geração em Lote ---
+# Vários tópicos por chamada ao agente; lotes diferentes rodam em paralelo neste pool.
+_batch_executor = ThreadPoolExecutor(max_workers=NEWS_BATCH_MAX_WORKERS, thread_name_prefix="news-batch")
+
+def _generate_batch_item(item: tuple) -> Optional[dict]:
+    try:
+        return generate_news_coalesced(*item)
+    except (UpstreamUnavailable, GenerationInProgress) as e:
+        print(f"Geração de '{item[0]}' recusada: {e}")
+        return None
+
+def generate_news_batch(itens: list) -> dict:
+    """
+    Gera (e salva no cache) as notícias de vários (topico, categoria) em chamadas de até NEWS_BATCH_SIZE tópicos.
+    Os tópicos que o lote não devolveu completos, ou que já estavam sendo gerados por outra requisição,
+    passam para a geração individual (generate_news_coalesced).
+    Retorna ({(topico, categoria): resultado ou None}, número de tópicos que precisaram da geração individual).
+    """
+    owner = f"{os.getpid()}-{uuid.uuid4().hex}"
+    leased = [item for item in itens if acquire_generation_lease(item[0], item[1], owner, GENERATION_LEASE_TTL)]
+    results = {}
+    try:
+        chunks = [leased[i:i + NEWS_BATCH_SIZE] for i in range(0, len(leased), NEWS_BATCH_SIZE)]
+        for chunk, noticias in zip(chunks, _batch_executor.map(news_system.search_and_process_news_batch, chunks)):
+            for topico, categoria in chunk:
+                noticia = noticias.get((topico, categoria))
+                if noticia:
+                    save_news_to_cache(topico, categoria, noticia)
+                    results[(topico, categoria)] = {"noticia": noticia, "status": "Notícia gerada em lote com sucesso!"}
+    finally:
+        for topico, categoria in leased:
+            release_generation_lease(topico, categoria, owner)
+
+    fallback = [item for item in itens if item not in results]
+    if fallback:
+        print(f"Geração em lote: {len(fallback)} de {len(itens)} tópico(s) gerados individualmente.")
+        for item, result in zip(fallback, _batch_executor.map(_generate_batch_item, fallback)):
+            results[item] = result
+    return results, len(fallback)
+
+# --- Tópicos Parecidos ---
+# Buscas por um tópico escrito de outro jeito reaproveitam a notícia já gerada (ver TopicSimilarityIndex).
+topic_index = TopicSimilarityIndex(NEWS_DEDUP_THRESHOLD)
+
+def find_similar_news(topico: str, categoria: str) -> Optional[dict]:
+    """
+    Notícia do cache gravada para um tópico parecido com o buscado, com o 'topico' e a 'categoria' dela, ou None.
+    """
+    found = topic_index.find(topico, categoria, lambda key: get_cached_news(*key))
+    if not found:
+        return None
+    (similar_topico, similar_categoria), cached_data, score = found
+    print(f"'{topico}' ({categoria}) reaproveitou a notícia de '{similar_topico}' ({similar_categoria}), semelhança {score:.2f}.")
+    return {**cached_data, "topico": similar_topico, "categoria": similar_categoria}
+
+def is_news_cached(topico: str, categoria: str) -> bool:
+    """Se a notícia do próprio (topico, categoria) já está no cache (sem contar acesso)."""
+    return get_cached_news(topico, categoria) is not None
+
+def has_similar_news(topico: str, categoria: str) -> bool:
+    """Se há no cache a notícia de um tópico parecido (sem contar como geração economizada nem acesso)."""
+    return topic_index.find(topico, categoria, lambda key: get_cached_news(*key), record=False) is not None
+
+# --- Fila de Geração de Notícias ---
+# A geração pelo agente roda nas threads da fila; as rotas só enfileiram e consultam o job.
+def run_news_job(job: dict, progress: JobProgress) -> bool:
+    on_usage = None
+    if job["origem"] == "prefetch":
+        if is_news_cached(job["topico"], job["categoria"]) or has_similar_news(job["topico"], job["categoria"]):
+            return True  # Gerada sob demanda (ou um tópico parecido) enquanto a pré-geração esperava na fila
+        if not news_prefetcher.has_budget():
+            raise RuntimeError("Orçamento diário de tokens da pré-geração esgotado.")
+        on_usage = news_prefetcher.record_usage
+    progress.publish("etapa", {"mensagem": "Gerando notícia com o agente..."})
+    result = generate_news_coalesced(
+        job["topico"], job["categoria"], on_progress=progress.agent_progress, origem=job["origem"], on_usage=on_usage
+    )
+    return bool(result and result.get("noticia"))
+
+news_jobs = NewsJobQueue(
+    run_news_job, NEWS_JOB_WORKERS, GENERATION_LEASE_TTL, NEWS_JOB_MAX_ATTEMPTS, NEWS_JOB_RETENTION,
+    progress=processing_status, max_prefetch=NEWS_PREFETCH_MAX_CONCURRENT,
+    paused=lambda: agent_governor.is_open  # com o circuito aberto os jobs esperam na fila em vez de falhar
+)
+news_jobs.start()
+
+# --- Pré-geração dos Tópicos em Alta ---
+# Cada lista nova de tópicos enfileira a geração dos primeiros ainda fora do cache (ver NewsPrefetcher).
+news_prefetcher = NewsPrefetcher(
+    news_jobs.submit, is_news_cached, has_similar_news,
+    NEWS_PREFETCH_TOP_K, NEWS_PREFETCH_DAILY_TOKENS, NEWS_PREFETCH_TOKENS_ESTIMATE
+)
+
+# --- Respostas com a API Indisponível ---
+def upstream_unavailable_response(error: UpstreamUnavailable):
+    """503 com Retry-After, para quando o circuito está aberto ou não há vaga para chamar a Gemini."""
+    response = jsonify({"success": False, "error": "Serviço de geração temporariamente indisponível. Tente novamente em instantes."})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response
+
+# --- Respostas com um Job de Geração ---
+def news_job_accepted_payload(job: dict, created: bool) -> dict:
+    """Corpo do 202 que devolve um job da fila para o cliente acompanhar."""
+    return {
+        "success": True,
+        "job_id": job["id"],
+        "status": job["status"],
+        "created": created,
+        "status_url": f"/api/news/jobs/{job['id']}",
+        "events_url": f"/api/news/jobs/{job['id']}/events"
+    }
+
+def generation_in_progress_response(topico: str, categoria: str):
+    """
+    202 para quando a notícia ainda está sendo gerada em outro processo depois de GENERATION_WAIT_TIMEOUT:
+    em vez de a requisição continuar esperando, o cliente acompanha um job que lê a notícia quando ela for gravada.
+    """
+    job, created = news_jobs.submit(topico, categoria)
+    return jsonify(news_job_accepted_payload(job, created)), 202
+
+# --- Respostas com Notícias do Cache ---
+def raw_json_response(payload: dict, status: int = 200):
+    """
+    Monta a resposta JSON copiando as notícias do cache (RawJSON) como estão gravadas,
+    sem decodificar e codificar de novo o corpo de cada uma.
+    """
+    return Response(dumps_with_raw(payload), status=status, mimetype="application/json")
+
+def find_cached_news(topico: str, categoria: str, record_hit: bool = True) -> Optional[dict]:
+    """
+    Procura no cache a notícia de uma busca e conta o acesso a ela (se 'record_hit').
+    Primeiro a gravada para o próprio (topico, categoria), como as pré-geradas dos tópicos em alta,
+    depois a mais recente cujo título contenha o texto buscado e, por fim, a de um tópico parecido.
+    Retorna um item como os de get_latest_news_by_title, ou None.
+    """
+    cached_data = get_cached_news(topico, categoria)
+    if cached_data:
+        cached_data = {**cached_data, "topico": topico, "categoria": categoria}
+    else:
+        latest_news_list = get_latest_news_by_title(topico, limit=1)
+        cached_data = latest_news_list[0] if latest_news_list else find_similar_news(topico, categoria)
+        if not cached_data:
+            return None
+    if record_hit:
+        record_news_hit(cached_data["topico"], cached_data["categoria"])
+    return cached_data
+
+# Chave do scope ASGI em que asgi.py passa a notícia que já encontrou no cache: (topico, categoria, item)
+CACHED_NEWS_SCOPE_KEY = "noticias.cached_news"
+
+def lookup_cached_news(topico: str, categoria: str) -> Optional[dict]:
+    """
+    find_cached_news da requisição atual, aproveitando a notícia já encontrada pela rota assíncrona
+    (quando a requisição veio de asgi.py) em vez de procurar de novo. Conta o acesso em ambos os casos.
+    """
+    handed = request.environ.get("asgi.scope", {}).get(CACHED_NEWS_SCOPE_KEY)
+    if handed and handed[:2] == (topico, categoria):
+        cached_data = handed[2]
+        record_news_hit(cached_data["topico"], cached_data["categoria"])
+        return cached_data
+    return find_cached_news(topico, categoria)
+
+def cached_news_payload(cached_data: dict) -> dict:
+    """Corpo da resposta para uma notícia encontrada no cache (resultado de find_cached_news)."""
+    # O tópico no cache é o tópico original da busca.
+    # O "título" da notícia no JSON é o que o usuário vê.
+    # 'timestamp' é a data em que a notícia foi gravada, para o corpo só mudar com a versão da notícia
+    return {
+        "noticia": RawJSON(cached_data["noticia_json"]),
+        "from_cache": True,
+        "audio_data_available": cached_data["audio_available"],
+        "timestamp": parse_db_timestamp(cached_data["created_at"]).isoformat(),
+        "topico_original_do_cache": cached_data["topico"], # Retorna para o frontend
+        "categoria_original_do_cache": cached_data["categoria"] # Retorna para o frontend
+    }
+
+def cached_news_response(cached_data: dict) -> Response:
+    """
+    Resposta condicional (ETag/Last-Modified, 304) e comprimida para uma notícia do cache.
+    A versão é a da gravação da notícia (nunca se repete, ao contrário do rowid), mais a disponibilidade do áudio.
+    """
+    etag = f"v{cached_data['versao']}-{int(cached_data['audio_available'])}"
+    return conditional_response(
+        etag,
+        lambda: dumps_with_raw(cached_news_payload(cached_data)),
+        last_modified=parse_db_timestamp(cached_data["created_at"])
+    )
+
+def news_page_response(rota: str, build_payload, *args) -> Response:
+    """
+    Resposta condicional e comprimida para uma página de notícias ('build_payload()' monta o corpo).
+    A versão é a geração do cache de notícias, que muda a cada gravação ou remoção, mais os parâmetros da página.
+    """
+    params = zlib.crc32("|".join(str(arg) for arg in args).encode("utf-8"))
+    etag = f"{rota}{get_news_generation()}-{params:08x}"
+    return conditional_response(etag, lambda: dumps_with_raw(build_payload()))
+
+def news_job_payload(job: dict) -> dict:
+    """Corpo da consulta de um job; quando concluído, inclui em 'result' a notícia como em /api/news/<topic>."""
+    payload = {
+        "success": True,
+        "job_id": job["id"],
+        "status": job["status"],
+        "topico": job["topico"],
+        "categoria": job["categoria"],
+        "attempts": job["attempts"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "error": job["erro"]
+    }
+    progress = processing_status.get(job["id"])
+    if progress and progress.etapa:
+        payload["etapa"] = progress.etapa
+    if job["status"] == "concluido":
+        cached_data = get_cached_news(job["topico"], job["categoria"])
+        if not cached_data:
+            payload["error"] = "A notícia gerada não está mais no cache."
+        else:
+            payload["result"] = {
+                "noticia": RawJSON(cached_data["noticia_json"]),
+                "from_cache": False,
+                "audio_data_available": cached_data["audio_available"],
+                "timestamp": datetime.now().isoformat(),
+                "topico_original_do_cache": job["topico"],
+                "categoria_original_do_cache": job["categoria"]
+            }
+    return payload
+
+# --- Envio de Áudio do Cache ---
+def send_cached_audio(audio_info: dict, download_name: str):
+    """
+    Responde com um áudio do cache de TTS (metadados de get_cached_audio_info/get_tts_audio_info),
+    com suporte a Range, ETag/If-None-Match e Cache-Control.
+    """
+    size = audio_info["audio_size"]
+    mime_type = audio_info["audio_mime_type"] or "audio/wav" # Default para wav
+    # O áudio é endereçado por conteúdo, então a chave do cache é um ETag forte e estável
+    etag = audio_info["chave"]
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = AUDIO_CACHE_CONTROL
+        return response
+
+    # Suporte a 'Range' (um único intervalo) para o navegador poder buscar pontos do áudio
+    # e começar a tocar antes do fim do download. 'If-Range' com outra versão devolve o arquivo inteiro.
+    start, end, status = 0, size, 200
+    byte_range = request.range
+    if_range = request.headers.get("If-Range")
+    if byte_range is not None and len(byte_range.ranges) == 1 and (not if_range or request.if_range.etag == etag):
+        bounds = byte_range.range_for_length(size)
+        if bounds is None:
+            response = Response(status=416)
+            response.headers["Content-Range"] = f"bytes */{size}"
+            return response
+        start, end = bounds
+        status = 206
+
+    # O áudio é lido do SQLite em pedaços enquanto é enviado, sem carregar o BLOB inteiro na memória
+    response = Response(
+        iter_cached_audio(audio_info["rowid"], start, end),
+        status=status,
+        mimetype=mime_type,
+        direct_passthrough=True
+    )
+    response.content_length = end - start
+    response.accept_ranges = "bytes"
+    if status == 206:
+        response.headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = AUDIO_CACHE_CONTROL
+    response.headers["Content-Disposition"] = f"inline; filename={download_name}"
+    return response
+
 # --- Tuas Rotas Existentes ---
 @app.route('/api/topics', methods=['GET'])
 def get_trending():
     try:
         limit = min(max(request.args.get('limit', 20, type=int), 1), 50)
-        topicos = news_system.get_trending_topics(limit)
+        topicos, from_cache = get_trending_topics_cached(limit)
         return jsonify({
             "success": True,
             "topics": topicos,
+            "from_cache": from_cache,
             "timestamp": datetime.now().isoformat()
         })
     except Exception as e:
@@ -193,30 +699,16 @@ def get_news_by_title_or_generate(topic): # Renomeado para maior clareza
     try:
         categoria = request.args.get("categoria", "Geral")
 
-        # Prioriza buscar as últimas notícias do banco de dados pelo título
-        # Isso vai buscar o 'topico' do HTML que na verdade é o 'titulo' da notícia
-        # Vamos buscar por notícias onde o título contenha o 'topic' fornecido
-        latest_news_list = get_latest_news_by_title(topic, limit=1) # Busca a mais recente
-        
-        if latest_news_list:
-            cached_data = latest_news_list[0]
-            # O tópico no cache é o tópico original da busca.
-            # O "título" da notícia no JSON é o que o usuário vê.
-            return jsonify({
-                "noticia": cached_data["noticia"],
-                "from_cache": True,
-                "audio_data_available": cached_data["audio_data"] is not None,
-                "timestamp": datetime.now().isoformat(),
-                "topico_original_do_cache": cached_data["topico"], # Retorna para o frontend
-                "categoria_original_do_cache": cached_data["categoria"] # Retorna para o frontend
-            })
+        # Prioriza buscar a notícia no banco de dados: a do próprio tópico ou a mais recente
+        # cujo título contenha o 'topic' fornecido
+        cached_data = lookup_cached_news(topic, categoria)
+        if cached_data:
+            return cached_news_response(cached_data)
 
         # Se não encontrar no cache, tenta gerar uma nova notícia
-        result = news_system.search_and_process_news(topic, categoria)
+        # A notícia é salva no cache com o 'topic' original da busca e a categoria
+        result = generate_news_coalesced(topic, categoria, max_wait=GENERATION_WAIT_TIMEOUT)
         if result and result.get("noticia"):
-            news_data = result["noticia"]
-            # Salva no cache com o 'topic' original da busca e a categoria
-            save_news_to_cache(topic, categoria, news_data) 
             result["from_cache"] = False
             result["audio_data_available"] = False # Áudio não disponível ainda
             result["timestamp"] = datetime.now().isoformat()
@@ -225,6 +717,10 @@ def get_news_by_title_or_generate(topic): # Renomeado para maior clareza
             return jsonify(result)
 
         return jsonify({"success": False, "error": "Notícia não encontrada ou gerada"}), 404
+    except UpstreamUnavailable as e:
+        return upstream_unavailable_response(e)
+    except GenerationInProgress:
+        return generation_in_progress_response(topic, categoria)
     except Exception as e:
         print(f"Erro na rota /api/news/<topic>: {e}")
         import traceback
@@ -241,22 +737,12 @@ def post_news():
             return jsonify({"success": False, "error": "topico obrigatório"}), 400
 
         # Para POST, ainda vamos tentar buscar a mais recente que corresponde
-        latest_news_list = get_latest_news_by_title(topico, limit=1)
-        if latest_news_list:
-            cached_data = latest_news_list[0]
-            return jsonify({
-                "noticia": cached_data["noticia"],
-                "from_cache": True,
-                "audio_data_available": cached_data["audio_data"] is not None,
-                "timestamp": datetime.now().isoformat(),
-                "topico_original_do_cache": cached_data["topico"],
-                "categoria_original_do_cache": cached_data["categoria"]
-            })
+        cached_data = lookup_cached_news(topico, categoria)
+        if cached_data:
+            return raw_json_response(cached_news_payload(cached_data))
 
-        result = news_system.search_and_process_news(topico, categoria)
+        result = generate_news_coalesced(topico, categoria, max_wait=GENERATION_WAIT_TIMEOUT)
         if result and result.get("noticia"):
-            news_data = result["noticia"]
-            save_news_to_cache(topico, categoria, news_data)
             result["from_cache"] = False
             result["audio_data_available"] = False
             result["timestamp"] = datetime.now().isoformat()
@@ -265,47 +751,286 @@ def post_news():
             return jsonify(result)
 
         return jsonify({"success": False, "error": "Notícia não encontrada"}), 404
+    except UpstreamUnavailable as e:
+        return upstream_unavailable_response(e)
+    except GenerationInProgress:
+        return generation_in_progress_response(topico, categoria)
     except Exception as e:
         print(f"Erro na rota /api/news (POST): {e}")
         import traceback
         traceback.print_exc()
         return jsonify({"success": False, "error": str(e)}), 500
 
+# Rota /api/news/batch (POST) - Gera as notícias de vários tópicos com menos chamadas ao agente
+@app.route('/api/news/batch', methods=['POST'])
+def post_news_batch():
+    try:
+        data = request.get_json(silent=True) or {}
+        itens = []
+        for item in data.get("topicos") or []:
+            topico = (item.get("topico") or "").strip() if isinstance(item, dict) else ""
+            if not topico:
+                return jsonify({"success": False, "error": "cada item precisa de 'topico'"}), 400
+            par = (topico, item.get("categoria") or "Geral")
+            if par not in itens:
+                itens.append(par)
+        if not itens:
+            return jsonify({"success": False, "error": "topicos obrigatório"}), 400
+        if len(itens) > NEWS_BATCH_MAX_ITEMS:
+            return jsonify({"success": False, "error": f"no máximo {NEWS_BATCH_MAX_ITEMS} tópicos por lote"}), 400
+
+        found = {}
+        for topico, categoria in itens:
+            cached_data = find_cached_news(topico, categoria)
+            if cached_data:
+                found[(topico, categoria)] = cached_news_payload(cached_data)
+        generated, fallback = generate_news_batch([item for item in itens if item not in found])
+
+        results = []
+        for topico, categoria in itens:
+            payload = found.get((topico, categoria))
+            if payload is None:
+                result = generated.get((topico, categoria))
+                if result and result.get("noticia"):
+                    payload = {
+                        "noticia": result["noticia"],
+                        "from_cache": False,
+                        "audio_data_available": False,
+                        "timestamp": datetime.now().isoformat(),
+                        "topico_original_do_cache": topico,
+                        "categoria_original_do_cache": categoria
+                    }
+                else:
+                    payload = {"error": "Notícia não encontrada ou gerada"}
+            results.append({"topico": topico, "categoria": categoria, "success": "error" not in payload, **payload})
+
+        return raw_json_response({
+            "success": True,
+            "count": len(results),
+            "from_cache": len(found),
+            "generated": sum(1 for item in results if item["success"]) - len(found),
+            "fallback": fallback,
+            "results": results
+        })
+    except Exception as e:
+        print(f"Erro na rota /api/news/batch: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({"success": False, "error": str(e)}), 500
+
+# Rotas da fila de geração: POST enfileira e responde na hora; o cliente consulta o job até concluir
+@app.route('/api/news/jobs', methods=['POST'])
+def create_news_job_route():
+    try:
+        data = request.get_json(silent=True) or {}
+        topico = data.get("topico")
+        categoria = data.get("categoria", "Geral")
+        if not topico:
+            return jsonify({"success": False, "error": "topico obrigatório"}), 400
+
+        cached_data = find_cached_news(topico, categoria)
+        if cached_data:
+            # Já está no cache: nenhum job é criado
+            return raw_json_response({
+                "success": True,
+                "job_id": None,
+                "status": "concluido",
+                "result": cached_news_payload(cached_data)
+            })
+
+        job, created = news_jobs.submit(topico, categoria)
+        return jsonify(news_job_accepted_payload(job, created)), 202
+    except Exception as e:
+        print(f"Erro na rota /api/news/jobs (POST): {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route('/api/news/jobs/<job_id>', methods=['GET'])
+def get_news_job_route(job_id):
+    try:
+        job = get_news_job(job_id)
+        if not job:
+            return jsonify({"success": False, "error": "Job não encontrado"}), 404
+        return raw_json_response(news_job_payload(job))
+    except Exception as e:
+        print(f"Erro na rota /api/news/jobs/<job_id>: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+# Mensagens de etapa para jobs acompanhados por outro processo (sem eventos detalhados)
+JOB_STATUS_MESSAGES = {
+    "pendente": "Na fila para geração...",
+    "processando": "Gerando notícia com o agente..."
+}
+SSE_HEARTBEAT_INTERVAL = 15  # segundos; comentários SSE mantêm a conexão viva em proxies
+
+def sse_event(tipo: str, dados) -> bytes:
+    return b"event: " + tipo.encode("utf-8") + b"\ndata: " + dumps_with_raw(dados) + b"\n\n"
+
+@app.route('/api/news/jobs/<job_id>/events', methods=['GET'])
+def stream_news_job(job_id):
+    """
+    Server-Sent Events com o andamento do job: 'etapa', 'busca' (consultas ao Google), 'titulo',
+    'texto' (trechos da notícia à medida que o agente escreve) e 'reinicio'; termina com 'noticia'
+    (o mesmo conteúdo de 'result' na consulta do job) ou 'erro'.
+    Se o job roda em outro processo, só as mudanças de status são enviadas.
+    """
+    if not get_news_job(job_id):
+        return jsonify({"success": False, "error": "Job não encontrado"}), 404
+
+    def generate():
+        last_message = None
+        idle_since = time.monotonic()
+        while True:
+            job = get_news_job(job_id)
+            if job is None:
+                yield sse_event("erro", {"error": "Job não encontrado"})
+                return
+            if job["status"] in ("concluido", "erro"):
+                payload = news_job_payload(job)
+                if "result" in payload:
+                    yield sse_event("noticia", payload["result"])
+                else:
+                    yield sse_event("erro", {"error": payload["error"] or "Notícia não encontrada ou gerada."})
+                return
+
+            progress = processing_status.get(job_id)
+            if progress:
+                # O job roda neste processo: repassa todos os eventos até ele terminar
+                for event in progress.iter_events(SSE_HEARTBEAT_INTERVAL):
+                    yield b": heartbeat\n\n" if event is None else sse_event(*event)
+                continue
+
+            message = JOB_STATUS_MESSAGES.get(job["status"])
+            if message != last_message:
+                last_message = message
+                idle_since = time.monotonic()
+                yield sse_event("etapa", {"mensagem": message})
+            elif time.monotonic() - idle_since >= SSE_HEARTBEAT_INTERVAL:
+                idle_since = time.monotonic()
+                yield b": heartbeat\n\n"
+            time.sleep(NewsJobQueue.POLL_INTERVAL)
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def history_item(item: dict) -> dict:
+    """Item do histórico como enviado ao frontend, com a notícia copiada do cache como está (RawJSON)."""
+    return {
+        "topico": item["topico"], # O tópico original da busca
+        "categoria": item["categoria"], # A categoria original
+        "noticia": RawJSON(item["noticia_json"]), # O JSON completo da notícia, como está no cache
+        "audio_data_available": item["audio_available"],
+        "created_at": item["created_at"]
+    }
+
+def page_args():
+    """Lê 'limit' (1 a 100) e 'cursor' da query string das rotas paginadas."""
+    limit = request.args.get("limit", 10, type=int)
+    # Garante que o limite não é irrealista (e.g., muito grande ou negativo)
+    return max(1, min(limit, 100)), request.args.get("cursor") or None
+
 # Rota /api/news/history (NOVA ROTA)
+# Paginada por cursor: a resposta traz 'next_cursor', que pede a página seguinte em ?cursor=
 @app.route('/api/news/history', methods=['GET'])
 def news_history():
     try:
-        limit = request.args.get("limit", 10, type=int)
-        # Garante que o limite não é irrealista (e.g., muito grande ou negativo)
-        limit = max(1, min(limit, 100)) 
-        
-        history = get_news_history(limit)
-        
-        # Prepara os dados para o frontend
-        formatted_history = []
-        for item in history:
-            formatted_history.append({
-                "topico": item["topico"], # O tópico original da busca
-                "categoria": item["categoria"], # A categoria original
-                "noticia": item["noticia"], # O dicionário completo da notícia
-                "audio_data_available": item["audio_data"] is not None,
-                "created_at": item["created_at"]
-            })
+        limit, cursor = page_args()
+        categoria = request.args.get("categoria") or None
 
-        return jsonify({
-            "success": True,
-            "count": len(formatted_history),
-            "history": formatted_history
-        })
+        def build_payload():
+            history, next_cursor = get_news_page(limit, categoria, cursor)
+            formatted_history = [history_item(item) for item in history]
+            return {
+                "success": True,
+                "count": len(formatted_history),
+                "history": formatted_history,
+                "next_cursor": next_cursor
+            }
+
+        return news_page_response("h", build_payload, limit, categoria, cursor)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
     except Exception as e:
         print(f"Erro na rota /api/news/history: {e}")
         import traceback
         traceback.print_exc()
         return jsonify({"success": False, "error": str(e)}), 500
 
+# Rota /api/news/filter - Notícias de uma categoria, das mais recentes para as mais antigas, paginadas como o histórico
+@app.route('/api/news/filter', methods=['GET'])
+def news_filter():
+    try:
+        categoria = request.args.get("categoria")
+        if not categoria:
+            return jsonify({"success": False, "error": "categoria obrigatória"}), 400
+        limit, cursor = page_args()
+
+        def build_payload():
+            noticias, next_cursor = get_news_page(limit, categoria, cursor)
+            return {
+                "success": True,
+                "categoria": categoria,
+                "count": len(noticias),
+                "noticias": [history_item(item) for item in noticias],
+                "next_cursor": next_cursor
+            }
+
+        return news_page_response("f", build_payload, limit, categoria, cursor)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        print(f"Erro na rota /api/news/filter: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+# Rota /api/news/categorias - Categorias com notícias no cache (as com mais notícias primeiro) e as contagens
+@app.route('/api/news/categorias', methods=['GET'])
+def news_categories():
+    try:
+        categorias = get_news_categories()
+        return jsonify({
+            "success": True,
+            "categorias": [categoria for categoria, _ in categorias],
+            "contagens": dict(categorias)
+        })
+    except Exception as e:
+        print(f"Erro na rota /api/news/categorias: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+
+# Rota com os contadores do cache em memória das notícias e dos corpos comprimidos, do cache em disco, da pré-geração
+# e do reaproveitamento de tópicos parecidos ('dedup': 'saved_calls' são as gerações evitadas)
+# ('origins': notícias e acessos por origem, para medir o aproveitamento das pré-geradas)
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    try:
+        return jsonify({
+            "success": True,
+            "news_memory_cache": get_news_memory_cache_stats(),
+            "http_body_cache": response_body_cache.stats(),
+            "dedup": topic_index.stats(),
+            "disk_cache": {**get_cache_db_stats(), **cache_janitor.stats()},
+            "prefetch": {**news_prefetcher.stats(), "origins": get_news_origin_stats()}
+        })
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e)}), 500
+
+# Rota com o estado do controle de chamadas à Gemini (limites, erros e disjuntor),
+# a taxa de sucesso da extração do JSON das respostas do agente e as gravações usadas ou feitas (UPSTREAM_MODE)
+@app.route('/api/upstream/stats', methods=['GET'])
+def upstream_stats():
+    return jsonify({
+        "success": True,
+        "agent": agent_governor.stats(),
+        "tts": tts_governor.stats(),
+        "agent_json": agent_json_stats.stats(),
+        "fixtures": {"agent": agent_fixtures.stats(), "tts": tts_fixtures.stats()}
+    })
 
 # Rota para servir o áudio diretamente do cache
-@app.route('/api/news/audio/<topico_encoded>/<categoria_encoded>', methods=['GET'])
+# 'path' aceita tópicos com '/' (codificada como %2F na URL, que o servidor decodifica antes da rota)
+@app.route('/api/news/audio/<path:topico_encoded>/<categoria_encoded>', methods=['GET'])
 def get_news_audio(topico_encoded, categoria_encoded):
     # Decodifica os parâmetros da URL, pois o frontend os enviará encodidos
     topico = topico_encoded # Já vem decodificado pelo Flask para o @app.route
@@ -313,20 +1038,14 @@ def get_news_audio(topico_encoded, categoria_encoded):
 
     print(f"Tentando buscar áudio para tópico: {topico}, categoria: {categoria}")
 
-    cached_data = get_cached_news(topico, categoria)
-    if cached_data and cached_data["audio_data"]:
-        print(f"Áudio encontrado no cache para {topico}")
-        audio_data = cached_data["audio_data"]
-        mime_type = cached_data["audio_mime_type"] or "audio/wav" # Default para wav
-
-        return send_file(
-            io.BytesIO(audio_data),
-            mimetype=mime_type,
-            as_attachment=False,
-            download_name='noticia_cached.wav'
-        )
-    print(f"Áudio não encontrado no cache para {topico}")
-    return jsonify({"error": "Áudio não encontrado para esta notícia no cache."}), 404
+    audio_info = get_cached_audio_info(topico, categoria)
+    if not audio_info:
+        print(f"Áudio não encontrado no cache para {topico}")
+        return jsonify({"error": "Áudio não encontrado para esta notícia no cache."}), 404
+
+    print(f"Áudio encontrado no cache para {topico}")
+    touch_tts_audio(audio_info["chave"])
+    return send_cached_audio(audio_info, "noticia_cached.wav")
 
 # Rota para Gemini TTS - AGORA SALVA O ÁUDIO NO CACHE TAMBÉM
 @app.route('/api/gemini-tts', methods=['POST'])
@@ -335,8 +1054,10 @@ def generate_tts_endpoint():
     Endpoint para gerar áudio TTS usando Gemini e salvar no cache.
     Recebe texto, voz, tópico e categoria via JSON.
     Gera o áudio, converte se necessário, salva no cache e retorna o arquivo de áudio.
+    Por padrão o áudio é transmitido ao cliente à medida que a Gemini o gera ("stream": false
+    espera o áudio completo e responde com Content-Length).
     """
-    if not GEMINI_API_KEY_FROM_CONFIG:
+    if not GEMINI_API_KEY_FROM_CONFIG and UPSTREAM_MODE != "replay":
         print("ERRO: GEMINI_API_KEY não está configurada em config.py.")
         return jsonify({"error": "Configuração da API Key em falta no servidor (verifique config.py)."}), 500
 
@@ -345,80 +1066,101 @@ def generate_tts_endpoint():
     voice = data.get('voice', 'Zephyr')
     topico = data.get('topico', 'desconhecido')
     categoria = data.get('categoria', 'Geral')
+    stream = data.get('stream', True)
 
     if not text_to_speak:
         return jsonify({"error": "Texto não fornecido."}), 400
 
     try:
-        model_name = "gemini-2.5-flash-preview-tts"
-        contents = [
-            {"parts": [{"text": text_to_speak}]}
-        ]
-        generate_content_config = {
-            "response_modalities": ["AUDIO"],
-            "speech_config": {
-                "voice_config": {
-                    "prebuilt_voice_config": {"voice_name": voice}
-                }
-            },
-        }
+        # Cache endereçado por conteúdo: o mesmo texto com a mesma voz e modelo nunca é sintetizado duas vezes,
+        # venha de qual tópico vier
+        audio_key = tts_cache_key(text_to_speak, voice, TTS_MODEL_NAME, kind="texto")
+        audio_info = get_tts_audio_info(audio_key)
+        if audio_info:
+            print(f"Áudio encontrado no cache de TTS para '{text_to_speak[:60]}...' com voz '{voice}'")
+            touch_tts_audio(audio_key)
+            link_news_audio(topico, categoria, audio_key)
+            return send_cached_audio(audio_info, "noticia.wav")
 
         print(f"Gerando áudio para: '{text_to_speak[:60]}...' com voz '{voice}'")
 
-        audio_chunks = []
-        output_mime_type = "audio/wav"
-
-        model = genai.GenerativeModel(model_name)
+        # Textos longos são sintetizados em pedaços paralelos, entregues em ordem
+        audio_iter = iter_article_audio(text_to_speak, voice, TTS_MODEL_NAME)
 
-        response_stream = model.generate_content(
-            contents=contents,
-            generation_config=generate_content_config,
-            stream=True
-        )
-
-        # Processa os chunks de áudio recebidos do Gemini
-        for chunk in response_stream:
-            if chunk.candidates and chunk.candidates[0].content and chunk.candidates[0].content.parts:
-                part = chunk.candidates[0].content.parts[0]
-                if part.inline_data and part.inline_data.data:
-                    inline_data = part.inline_data
-                    data_buffer = inline_data.data
-                    mime_type = inline_data.mime_type
+        # Espera só o primeiro pedaço de áudio: ele define o MIME type e permite responder com erro se nada vier
+        try:
+            first_chunk = next(audio_iter, None)
+        except UpstreamUnavailable as e:
+            # Sem a Gemini, serve o último áudio gerado para a notícia, mesmo que de uma versão anterior ou outra voz
+            audio_info = get_cached_audio_info(topico, categoria)
+            if audio_info:
+                print(f"TTS indisponível ({e}); servindo o áudio anterior da notícia '{topico}'.")
+                touch_tts_audio(audio_info["chave"])
+                return send_cached_audio(audio_info, "noticia_cached.wav")
+            return upstream_unavailable_response(e)
+        if first_chunk is None:
+            print("Nenhum dado de áudio recebido da Gemini.")
+            return jsonify({"error": "Falha ao gerar áudio."}), 500
 
-                    file_extension = mimetypes.guess_extension(mime_type)
+        first_data, mime_type = first_chunk
+        # Se for áudio cru (ex: L16), o cliente recebe um único cabeçalho WAV e depois o PCM
+        raw_pcm = is_raw_pcm(mime_type)
+        output_mime_type = "audio/wav" if raw_pcm else mime_type
+        if raw_pcm:
+            print("Formato L16 detectado, convertendo para WAV...")
 
-                    # Se for áudio cru (ex: L16), converte para WAV
-                    if file_extension is None and "L16" in mime_type:
-                        print("Formato L16 detectado, convertendo para WAV...")
-                        data_buffer = convert_to_wav(data_buffer, mime_type)
-                        output_mime_type = "audio/wav"
-                    else:
-                        output_mime_type = mime_type
+        def save_audio(audio_chunks):
+            full_audio_data = b"".join(audio_chunks)
+            if raw_pcm:
+                full_audio_data = convert_to_wav(full_audio_data, mime_type)
+            print(f"Áudio gerado: {len(full_audio_data)} bytes, Tipo: {output_mime_type}")
 
-                    audio_chunks.append(data_buffer)
+            # Salva o áudio no cache de TTS após gerar e liga-o à notícia do 'topico' e 'categoria' fornecidos
+            save_tts_audio(audio_key, voice, TTS_MODEL_NAME, full_audio_data, output_mime_type, TTS_CACHE_MAX_BYTES)
+            if link_news_audio(topico, categoria, audio_key):
+                print(f"Áudio salvo no cache para tópico '{topico}', categoria '{categoria}'.")
+            else:
+                print(f"AVISO: Notícia para tópico '{topico}', categoria '{categoria}' não encontrada no cache. O áudio foi mantido no cache de TTS e será reaproveitado quando o mesmo texto for pedido.")
+            return full_audio_data
 
-        if not audio_chunks:
-            print("Nenhum dado de áudio recebido da Gemini.")
-            return jsonify({"error": "Falha ao gerar áudio."}), 500
+        if not stream:
+            audio_chunks = [first_data] + [data for data, _ in audio_iter]
+            return send_file(
+                io.BytesIO(save_audio(audio_chunks)),
+                mimetype=output_mime_type,
+                as_attachment=False,
+                download_name='noticia.wav'
+            )
 
-        full_audio_data = b"".join(audio_chunks)
-        print(f"Áudio gerado: {len(full_audio_data)} bytes, Tipo: {output_mime_type}")
+        def drain_and_save(audio_chunks):
+            try:
+                save_audio(audio_chunks + [data for data, _ in audio_iter])
+            except Exception as e:
+                print(f"Erro ao concluir o áudio após desconexão do cliente: {e}")
 
-        # Salva o áudio no cache após gerar
-        # Usa o 'topico' e 'categoria' fornecidos para atualizar a notícia correspondente
-        cached_news_data = get_cached_news(topico, categoria)
-        if cached_news_data and cached_news_data["noticia"]:
-            save_news_to_cache(topico, categoria, cached_news_data["noticia"], full_audio_data, output_mime_type)
-            print(f"Áudio salvo no cache para tópico '{topico}', categoria '{categoria}'.")
-        else:
-            print(f"AVISO: Notícia para tópico '{topico}', categoria '{categoria}' não encontrada no cache para salvar áudio. Isso pode ocorrer se a notícia for nova e o áudio for gerado antes da notícia ser persistida.")
+        def generate():
+            # Repassa cada pedaço assim que chega e guarda uma cópia para gravar no cache ao final
+            audio_chunks = [first_data]
+            try:
+                if raw_pcm:
+                    yield build_wav_header(mime_type, None)
+                yield first_data
+                for data, _ in audio_iter:
+                    audio_chunks.append(data)
+                    yield data
+            except GeneratorExit:
+                # O cliente desconectou: termina de receber em segundo plano para não perder o áudio já pago
+                threading.Thread(target=drain_and_save, args=(audio_chunks,), daemon=True).start()
+                raise
+            except Exception as e:
+                print(f"Erro durante o streaming de áudio da Gemini: {e}")
+                return
+            try:
+                save_audio(audio_chunks)
+            except Exception as e:
+                print(f"Erro ao salvar o áudio no cache: {e}")
 
-        return send_file(
-            io.BytesIO(full_audio_data),
-            mimetype=output_mime_type,
-            as_attachment=False,
-            download_name='noticia.wav'
-        )
+        return Response(generate(), mimetype=output_mime_type)
 
     except Exception as e:
         print(f"Erro crítico na API /api/gemini-tts: {e}")
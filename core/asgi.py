@@ -0,0 +1,382 @@
+"""
+Servidor ASGI (modo assíncrono) para produção.
+
+As rotas que esperam a Gemini por dezenas de segundos rodam como corrotinas, sem ocupar uma thread
+por requisição: a geração de notícias (GET /api/news/<topic> e POST /api/news, quando a notícia não está
+no cache), o acompanhamento de jobs por SSE e o streaming do TTS. O agente é chamado com Runner.run_async,
+o TTS roda no pool de threads dele (limitado por TTS_MAX_WORKERS) e o SQLite é acessado por threads próprias
+(um pool de leitura e uma thread de escrita).
+As demais rotas, e as respostas vindas do cache, são atendidas pelo app Flask como sempre (numa thread).
+
+Uso (a partir de core/):
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+    python asgi.py
+"""
+import os
+import copy
+import json
+import time
+import uuid
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import quote, unquote
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount
+from werkzeug.exceptions import HTTPException
+
+from config import GOOGLE_API_KEY, UPSTREAM_MODE, GENERATION_LEASE_TTL, GENERATION_POLL_INTERVAL, GENERATION_WAIT_TIMEOUT, TTS_CACHE_MAX_BYTES
+from app import (
+    app as flask_app, news_system, news_jobs, processing_status, find_cached_news, news_job_payload, CACHED_NEWS_SCOPE_KEY,
+    news_job_accepted_payload, GenerationInProgress, sse_event, JOB_STATUS_MESSAGES, SSE_HEARTBEAT_INTERVAL
+)
+from utils_cache_sqlite import (
+    acquire_generation_lease, release_generation_lease, is_generation_lease_active,
+    get_cached_news, save_news_to_cache, get_news_job, get_tts_audio_info, get_cached_audio_info,
+    save_tts_audio, link_news_audio
+)
+from utils_governor import UpstreamUnavailable
+from utils_jobs import NewsJobQueue
+from utils_singleflight import AsyncSingleFlight
+from utils_tts import TTS_MODEL_NAME, aiter_article_audio, build_wav_header, convert_to_wav, is_raw_pcm, tts_cache_key
+
+SSE_POLL_INTERVAL = 0.1  # segundos entre verificações de eventos novos de um job deste processo
+FLASK_WORKERS = 40  # threads que atendem as rotas do Flask (o limite padrão de threads do anyio)
+# As respostas do Flask já vêm com CORS (flask_cors, que também responde os preflights); estas opções cobrem as rotas assíncronas
+CORS_OPTIONS = {"allow_origins": ["*"], "allow_methods": ["*"], "allow_headers": ["*"]}
+
+flask_asgi = WSGIMiddleware(flask_app, workers=FLASK_WORKERS)
+
+# --- Acesso ao SQLite ---
+# As leituras e gravações das rotas assíncronas rodam fora do event loop. Com WAL as leituras não esperam
+# as gravações, então têm um pool próprio; as gravações passam por uma única thread (o SQLite só grava uma por vez).
+DB_READ_WORKERS = 4
+_db_readers = ThreadPoolExecutor(max_workers=DB_READ_WORKERS, thread_name_prefix="sqlite-leitura")
+_db_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-escrita")
+
+async def db(fn, *args):
+    """Roda uma leitura do cache no pool de leitura."""
+    return await asyncio.get_running_loop().run_in_executor(_db_readers, fn, *args)
+
+async def db_write(fn, *args):
+    """Roda uma gravação no cache na thread de escrita."""
+    return await asyncio.get_running_loop().run_in_executor(_db_writer, fn, *args)
+
+# Tasks que continuam depois da resposta (ex: gravar o áudio de um cliente que desconectou)
+_background_tasks = set()
+
+def run_in_background(coro):
+    task = asyncio.ensure_future(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+# --- Respostas ---
+class FlaskResponse:
+    """
+    Responde repassando a requisição ao app Flask, com o corpo já lido pela rota assíncrona.
+    'path' (com 'method') troca a rota de destino, ex: servir o áudio em cache de uma notícia;
+    é o caminho como viria na URL, com cada parte codificada (quote(..., safe="")).
+    'cached_news' é a notícia já encontrada no cache para (topico, categoria), que o Flask usa sem procurar de novo.
+    """
+
+    def __init__(self, body=b"", path=None, method="GET", cached_news=None):
+        self.body = body
+        self.path = path
+        self.method = method
+        self.cached_news = cached_news
+
+    async def __call__(self, scope, receive, send):
+        if self.path is not None:
+            scope = {**scope, "path": unquote(self.path), "raw_path": self.path.encode("ascii"), "method": self.method, "query_string": b""}
+        if self.cached_news is not None:
+            scope = {**scope, CACHED_NEWS_SCOPE_KEY: self.cached_news}
+        replayed = False
+
+        async def replay():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": self.body, "more_body": False}
+            return await receive()
+
+        await flask_asgi(scope, replay, send)
+
+def upstream_unavailable_response(error: UpstreamUnavailable):
+    return JSONResponse(
+        {"success": False, "error": "Serviço de geração temporariamente indisponível. Tente novamente em instantes."},
+        status_code=503, headers={"Retry-After": str(error.retry_after)}
+    )
+
+def read_json(body: bytes):
+    try:
+        data = json.loads(body) if body else None
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+# --- Geração Coalescida de Notícias ---
+# Mesma coordenação de generate_news_coalesced: uma geração por (topico, categoria) no event loop
+# e, entre processos e com as threads da fila de jobs, o lease em cache.db.
+_news_flight = AsyncSingleFlight()
+
+async def _generate_news_with_lease(topico: str, categoria: str):
+    owner = f"{os.getpid()}-{uuid.uuid4().hex}"
+    deadline = time.time() + GENERATION_WAIT_TIMEOUT
+    while True:
+        if await db_write(acquire_generation_lease, topico, categoria, owner, GENERATION_LEASE_TTL):
+            try:
+                result = await news_system.search_and_process_news_async(topico, categoria)
+                if result and result.get("noticia"):
+                    await db_write(save_news_to_cache, topico, categoria, result["noticia"])
+                return result
+            finally:
+                await db_write(release_generation_lease, topico, categoria, owner)
+
+        print(f"Geração de '{topico}' ({categoria}) em andamento em outra requisição, aguardando...")
+        while await db(is_generation_lease_active, topico, categoria) and time.time() < deadline:
+            await asyncio.sleep(GENERATION_POLL_INTERVAL)
+        cached_data = await db(get_cached_news, topico, categoria)
+        if cached_data:
+            return {"noticia": cached_data["noticia"], "status": "Notícia gerada por outra requisição simultânea."}
+        if time.time() >= deadline:
+            raise GenerationInProgress(f"Geração de '{topico}' ({categoria}) ainda em andamento em outro processo.")
+
+async def generate_news_async(topico: str, categoria: str):
+    """Versão assíncrona de generate_news_coalesced (cada chamador recebe a sua cópia do resultado)."""
+    result, shared = await _news_flight.do((topico, categoria), lambda: _generate_news_with_lease(topico, categoria))
+    if shared:
+        print(f"Requisição para '{topico}' ({categoria}) aproveitou uma geração em andamento.")
+    return copy.deepcopy(result)
+
+# --- Rotas Assíncronas ---
+async def news_response(topico: str, categoria: str, body: bytes = b""):
+    """GET /api/news/<topic> e POST /api/news: do cache pelo Flask, senão gerada aqui sem ocupar thread."""
+    try:
+        cached_data = await db(find_cached_news, topico, categoria, False)
+        if cached_data:
+            # ETag/304, compressão e contagem do acesso ficam com o Flask, que recebe a notícia já encontrada
+            return FlaskResponse(body, cached_news=(topico, categoria, cached_data))
+        result = await generate_news_async(topico, categoria)
+    except UpstreamUnavailable as e:
+        return upstream_unavailable_response(e)
+    except GenerationInProgress:
+        # Como no Flask: depois de GENERATION_WAIT_TIMEOUT o cliente acompanha um job em vez de continuar esperando
+        job, created = await db_write(news_jobs.submit, topico, categoria)
+        return JSONResponse(news_job_accepted_payload(job, created), status_code=202)
+    except Exception as e:
+        print(f"Erro na geração assíncrona de '{topico}': {e}")
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+
+    if result and result.get("noticia"):
+        result["from_cache"] = False
+        result["audio_data_available"] = False # Áudio não disponível ainda
+        result["timestamp"] = datetime.now().isoformat()
+        result["topico_original_do_cache"] = topico
+        result["categoria_original_do_cache"] = categoria
+        return JSONResponse(result)
+    return JSONResponse({"success": False, "error": "Notícia não encontrada ou gerada"}, status_code=404)
+
+async def get_news_by_title_or_generate(request: Request, topic: str):
+    return await news_response(topic, request.query_params.get("categoria", "Geral"))
+
+async def post_news(request: Request):
+    body = await request.body()
+    data = read_json(body)
+    if not data or not data.get("topico"):
+        return FlaskResponse(body)  # Erros de validação respondidos pelo Flask
+    return await news_response(data["topico"], data.get("categoria", "Geral"), body)
+
+async def stream_news_job(request: Request, job_id: str):
+    """Mesmos eventos de stream_news_job no Flask; os de um job deste processo são lidos sem bloquear."""
+    if not await db(get_news_job, job_id):
+        return JSONResponse({"success": False, "error": "Job não encontrado"}, status_code=404)
+
+    async def generate():
+        last_message = None
+        idle_since = time.monotonic()
+        while True:
+            job = await db(get_news_job, job_id)
+            if job is None:
+                yield sse_event("erro", {"error": "Job não encontrado"})
+                return
+            if job["status"] in ("concluido", "erro"):
+                payload = await db(news_job_payload, job)
+                if "result" in payload:
+                    yield sse_event("noticia", payload["result"])
+                else:
+                    yield sse_event("erro", {"error": payload["error"] or "Notícia não encontrada ou gerada."})
+                return
+
+            progress = processing_status.get(job_id)
+            if progress:
+                index = 0
+                while True:
+                    batch, finished = progress.events_since(index)
+                    index += len(batch)
+                    for event in batch:
+                        yield sse_event(*event)
+                    if finished:
+                        break
+                    if batch:
+                        idle_since = time.monotonic()
+                    elif time.monotonic() - idle_since >= SSE_HEARTBEAT_INTERVAL:
+                        idle_since = time.monotonic()
+                        yield b": heartbeat\n\n"
+                    await asyncio.sleep(SSE_POLL_INTERVAL)
+                continue
+
+            message = JOB_STATUS_MESSAGES.get(job["status"])
+            if message != last_message:
+                last_message = message
+                idle_since = time.monotonic()
+                yield sse_event("etapa", {"mensagem": message})
+            elif time.monotonic() - idle_since >= SSE_HEARTBEAT_INTERVAL:
+                idle_since = time.monotonic()
+                yield b": heartbeat\n\n"
+            await asyncio.sleep(NewsJobQueue.POLL_INTERVAL)
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _build_audio(audio_chunks, mime_type, raw_pcm):
+    # Roda numa thread do pool padrão, fora da thread de escrita: junta os pedaços e monta o WAV
+    full_audio_data = b"".join(audio_chunks)
+    return convert_to_wav(full_audio_data, mime_type) if raw_pcm else full_audio_data
+
+def _save_audio(audio_key, voice, topico, categoria, full_audio_data, output_mime_type):
+    # Roda na thread de escrita: grava no cache de TTS e liga o áudio à notícia
+    print(f"Áudio gerado: {len(full_audio_data)} bytes, Tipo: {output_mime_type}")
+    save_tts_audio(audio_key, voice, TTS_MODEL_NAME, full_audio_data, output_mime_type, TTS_CACHE_MAX_BYTES)
+    if link_news_audio(topico, categoria, audio_key):
+        print(f"Áudio salvo no cache para tópico '{topico}', categoria '{categoria}'.")
+    else:
+        print(f"AVISO: Notícia para tópico '{topico}', categoria '{categoria}' não encontrada no cache. O áudio foi mantido no cache de TTS.")
+
+async def generate_tts_endpoint(request: Request):
+    """
+    POST /api/gemini-tts: o áudio em cache é servido pelo Flask (Range, ETag); o áudio novo é
+    transmitido daqui à medida que o pool do TTS o gera, e gravado no cache mesmo se o cliente desconectar.
+    """
+    body = await request.body()
+    data = read_json(body)
+    if (not GOOGLE_API_KEY and UPSTREAM_MODE != "replay") or not data or not data.get("text"):
+        return FlaskResponse(body)  # Erros de configuração e validação respondidos pelo Flask
+
+    text_to_speak = data["text"]
+    voice = data.get("voice", "Zephyr")
+    topico = data.get("topico", "desconhecido")
+    categoria = data.get("categoria", "Geral")
+    stream = data.get("stream", True)
+
+    try:
+        audio_key = tts_cache_key(text_to_speak, voice, TTS_MODEL_NAME, kind="texto")
+        if await db(get_tts_audio_info, audio_key):
+            return FlaskResponse(body)
+
+        print(f"Gerando áudio para: '{text_to_speak[:60]}...' com voz '{voice}'")
+        audio_iter = aiter_article_audio(text_to_speak, voice, TTS_MODEL_NAME)
+        try:
+            first_chunk = await anext(audio_iter, None)
+        except UpstreamUnavailable as e:
+            # Sem a Gemini, serve o último áudio gerado para a notícia (rota de áudio do Flask)
+            if await db(get_cached_audio_info, topico, categoria):
+                print(f"TTS indisponível ({e}); servindo o áudio anterior da notícia '{topico}'.")
+                return FlaskResponse(path=f"/api/news/audio/{quote(topico, safe='')}/{quote(categoria, safe='')}")
+            return upstream_unavailable_response(e)
+        if first_chunk is None:
+            print("Nenhum dado de áudio recebido da Gemini.")
+            return JSONResponse({"error": "Falha ao gerar áudio."}, status_code=500)
+
+        first_data, mime_type = first_chunk
+        raw_pcm = is_raw_pcm(mime_type)
+        output_mime_type = "audio/wav" if raw_pcm else mime_type
+
+        async def save(audio_chunks):
+            full_audio_data = await asyncio.to_thread(_build_audio, audio_chunks, mime_type, raw_pcm)
+            await db_write(_save_audio, audio_key, voice, topico, categoria, full_audio_data, output_mime_type)
+            return full_audio_data
+
+        if not stream:
+            audio_chunks = [first_data] + [data async for data, _ in audio_iter]
+            return Response(
+                await save(audio_chunks),
+                media_type=output_mime_type,
+                headers={"Content-Disposition": "inline; filename=noticia.wav"}
+            )
+
+        # O áudio é recebido por uma task separada da resposta: se o cliente desconectar,
+        # ela termina de receber e grava no cache o áudio já pago
+        pending = asyncio.Queue()
+
+        async def receive_audio():
+            audio_chunks = [first_data]
+            try:
+                async for data, _ in audio_iter:
+                    audio_chunks.append(data)
+                    pending.put_nowait(data)
+            except Exception as e:
+                print(f"Erro durante o streaming de áudio da Gemini: {e}")
+                return
+            finally:
+                pending.put_nowait(None)
+            try:
+                await save(audio_chunks)
+            except Exception as e:
+                print(f"Erro ao salvar o áudio no cache: {e}")
+
+        run_in_background(receive_audio())
+
+        async def generate():
+            if raw_pcm:
+                yield build_wav_header(mime_type, None)
+            yield first_data
+            while (data := await pending.get()) is not None:
+                yield data
+
+        return StreamingResponse(generate(), media_type=output_mime_type)
+
+    except Exception as e:
+        print(f"Erro crítico na API /api/gemini-tts: {e}")
+        return JSONResponse({"error": f"Erro interno do servidor: {str(e)}"}, status_code=500)
+
+# Endpoints do Flask atendidos aqui; a rota é resolvida pelo próprio url_map do Flask,
+# então as demais rotas (e a precedência entre elas) continuam definidas só em app.py
+ASYNC_ENDPOINTS = {
+    "get_news_by_title_or_generate": get_news_by_title_or_generate,
+    "post_news": post_news,
+    "stream_news_job": stream_news_job,
+    "generate_tts_endpoint": generate_tts_endpoint
+}
+
+async def dispatch(scope, receive, send):
+    # OPTIONS (inclusive os preflights de CORS) fica com o Flask
+    if scope["type"] == "http" and scope["method"] != "OPTIONS":
+        try:
+            endpoint, args = flask_app.url_map.bind("localhost").match(scope["path"], method=scope["method"])
+        except HTTPException:
+            endpoint = None  # 404, 405 e redirecionamentos ficam com o Flask
+        handler = ASYNC_ENDPOINTS.get(endpoint)
+        if handler is not None:
+            response = await handler(Request(scope, receive), **args)
+            if not isinstance(response, FlaskResponse):
+                response = CORSMiddleware(response, **CORS_OPTIONS)
+            await response(scope, receive, send)
+            return
+    await flask_asgi(scope, receive, send)
+
+app = Starlette(routes=[Mount("/", app=dispatch)])
+
+# --- Executar o Servidor ---
+if __name__ == "__main__":
+    import uvicorn
+    print("Iniciando o servidor ASGI na porta 5000...")
+    uvicorn.run(app, host="0.0.0.0", port=5000)
@@ -0,0 +1,88 @@
+"""
+Benchmark da montagem da resposta de /api/news/history (100 notícias) para vários tamanhos de notícia.
+
+Compara três caminhos a partir do JSON gravado no cache:
+  - antigo: json.loads de cada notícia + jsonify do envelope (antes do cache em memória);
+  - LRU: notícias já decodificadas em memória, mas o jsonify codifica cada uma de novo;
+  - fragmentos: o JSON gravado é copiado para o envelope (RawJSON + dumps_with_raw).
+
+Uso (a partir de core/):
+    python benchmarks/bench_json_splice.py [iteracoes]
+"""
+import os
+import sys
+import json
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify, Response
+from utils_json import RawJSON, dumps_with_raw
+
+NOTICIAS = 100
+
+
+def gerar_linhas(tamanho):
+    texto = ("Parágrafo da notícia com acentuação e pontuação. " * (tamanho // 50 + 1))[:tamanho]
+    return [
+        {
+            "topico": f"topico {i}",
+            "categoria": "Geral",
+            "noticia": json.dumps({"titulo": f"Título {i}", "fonte": "Fonte", "resumo": texto[:200], "noticia_completa": texto}),
+            "created_at": "2026-01-01 12:00:00"
+        }
+        for i in range(NOTICIAS)
+    ]
+
+
+def envelope(itens, noticia):
+    return {
+        "success": True,
+        "count": len(itens),
+        "history": [
+            {
+                "topico": item["topico"],
+                "categoria": item["categoria"],
+                "noticia": noticia(item),
+                "audio_data_available": False,
+                "created_at": item["created_at"]
+            }
+            for item in itens
+        ]
+    }
+
+
+def medir(fn, iteracoes):
+    inicio = time.perf_counter()
+    for _ in range(iteracoes):
+        fn()
+    return (time.perf_counter() - inicio) / iteracoes * 1000  # milissegundos por resposta
+
+
+def main():
+    iteracoes = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    app = Flask(__name__)
+    print(f"{NOTICIAS} notícias por resposta, {iteracoes} iterações (ms por resposta)")
+    print(f"{'tamanho':>10} {'antigo':>10} {'LRU':>10} {'fragmentos':>12}")
+    with app.app_context():
+        for tamanho in (1_000, 10_000, 50_000):
+            linhas = gerar_linhas(tamanho)
+            decodificadas = [dict(linha, noticia_dict=json.loads(linha["noticia"])) for linha in linhas]
+            for linha in linhas:
+                linha["noticia_bytes"] = linha["noticia"].encode("utf-8")  # como guardado no cache em memória
+
+            antigo = medir(lambda: jsonify(envelope(linhas, lambda item: json.loads(item["noticia"]))).get_data(), iteracoes)
+            lru = medir(lambda: jsonify(envelope(decodificadas, lambda item: item["noticia_dict"])).get_data(), iteracoes)
+            fragmentos = medir(
+                lambda: Response(dumps_with_raw(envelope(linhas, lambda item: RawJSON(item["noticia_bytes"]))), mimetype="application/json").get_data(),
+                iteracoes
+            )
+
+            # As três respostas representam o mesmo documento
+            esperado = json.loads(jsonify(envelope(linhas, lambda item: json.loads(item["noticia"]))).get_data())
+            assert json.loads(dumps_with_raw(envelope(linhas, lambda item: RawJSON(item["noticia_bytes"])))) == esperado
+            print(f"{tamanho:>10} {antigo:>10.2f} {lru:>10.2f} {fragmentos:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Teste de carga do servidor sem rede: as chamadas à Gemini são reproduzidas de gravações (UPSTREAM_MODE=replay)
+com a latência gravada multiplicada pelo fator informado, e N requisições simultâneas pedem notícias
+ainda fora do cache ao app ASGI (asgi.py), passando pelo controle de chamadas, pelo cache e pelas rotas reais.
+
+As gravações são feitas antes, com rede, rodando o servidor com UPSTREAM_MODE=record e gerando algumas notícias
+(e áudios). O limite de taxa do agente continua valendo: para medir só o servidor, aumente AGENT_RATE_LIMIT
+e AGENT_MAX_CONCURRENCY. O processo roda num diretório temporário, com um cache.db vazio.
+
+Para testar com uma ferramenta externa, suba o servidor no mesmo modo:
+    UPSTREAM_MODE=replay UPSTREAM_FIXTURES_DIR=<gravações> uvicorn asgi:app --port 5000
+
+Uso (a partir de core/):
+    python benchmarks/bench_replay.py <diretório das gravações> [requisições] [fator de latência]
+"""
+import os
+import sys
+import time
+import asyncio
+import tempfile
+import statistics
+from collections import Counter
+
+CORE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def carga(app, requisicoes):
+    import httpx
+
+    async def pedir(cliente, i):
+        inicio = time.perf_counter()
+        resposta = await cliente.get(f"/api/news/tema {i}", params={"categoria": "Geral"})
+        return resposta.status_code, time.perf_counter() - inicio
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as cliente:
+        inicio = time.perf_counter()
+        resultados = await asyncio.gather(*[pedir(cliente, i) for i in range(requisicoes)])
+        total = time.perf_counter() - inicio
+        stats = (await cliente.get("/api/upstream/stats")).json()
+    return resultados, total, stats
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    os.environ["UPSTREAM_MODE"] = "replay"
+    os.environ["UPSTREAM_FIXTURES_DIR"] = os.path.abspath(sys.argv[1])
+    requisicoes = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    if len(sys.argv) > 3:
+        os.environ["UPSTREAM_REPLAY_LATENCY"] = sys.argv[3]
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        os.chdir(diretorio)
+        sys.path.insert(0, CORE_DIR)
+        from asgi import app, news_system
+
+        news_system.unified_agent  # Importa o ADK antes da medição (ver bench_startup.py)
+        resultados, total, stats = asyncio.run(carga(app, requisicoes))
+
+    latencias = sorted(latencia for _, latencia in resultados)
+    p95 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.95))]
+    print(f"{requisicoes} requisições simultâneas em {total:.2f} s ({requisicoes / total:.1f} req/s)")
+    print(f"status: {dict(Counter(status for status, _ in resultados))}")
+    print(f"latência (s): mediana {statistics.median(latencias):.3f}, p95 {p95:.3f}, máx {latencias[-1]:.3f}")
+    print(f"gravações reproduzidas: {stats['fixtures']['agent']}")
+    print(f"agente: {stats['agent']}")
+
+
+if __name__ == "__main__":
+    main()
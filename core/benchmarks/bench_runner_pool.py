@@ -0,0 +1,65 @@
+"""
+Micro-benchmark do custo de preparação por chamada em utils.call_agent.
+
+Compara a preparação antiga (InMemorySessionService + sessão + Runner novos a cada chamada)
+com o RunnerPool (Runner compartilhado + sessão descartável). Não chama o modelo:
+mede só o overhead que antecede runner.run_async(), sem precisar de rede ou chave de API.
+
+Uso (a partir de core/):
+    python benchmarks/bench_runner_pool.py [iteracoes]
+"""
+import os
+import sys
+import time
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.adk.agents import Agent
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from utils import RunnerPool
+
+
+def setup_antigo(agent):
+    session_service = InMemorySessionService()
+    session_service.create_session(app_name=agent.name, user_id="user1", session_id="session1")
+    Runner(agent=agent, app_name=agent.name, session_service=session_service)
+
+
+def setup_pool(pool, agent):
+    pool.get_runner(agent)
+    with pool.session(agent):
+        pass
+
+
+def medir(fn, iteracoes):
+    inicio = time.perf_counter()
+    for _ in range(iteracoes):
+        fn()
+    return (time.perf_counter() - inicio) / iteracoes * 1e6  # microssegundos por chamada
+
+
+def main():
+    iteracoes = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    agent = Agent(name="agente_bench", model="gemini-2.0-flash", instruction="Benchmark.")
+    pool = RunnerPool()
+
+    antes = medir(lambda: setup_antigo(agent), iteracoes)
+    depois = medir(lambda: setup_pool(pool, agent), iteracoes)
+    print(f"Iterações: {iteracoes}")
+    print(f"Antes (Runner + sessão novos): {antes:8.1f} us/chamada")
+    print(f"Depois (RunnerPool):           {depois:8.1f} us/chamada")
+    print(f"Ganho: {antes / depois:.1f}x")
+
+    # Uso concorrente: cada thread abre sessões próprias; ao final nenhuma pode sobrar
+    threads = [threading.Thread(target=medir, args=(lambda: setup_pool(pool, agent), iteracoes // 8)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print(f"Sessões abertas após 8 threads concorrentes: {pool.active_sessions()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmark de concorrência do cache SQLite: várias threads leitoras e uma escritora.
+
+Os leitores consultam o histórico e buscam notícias por título (como /api/news/history e
+/api/news/<topico>), enquanto um escritor grava áudios de TTS de vários MB (como /api/gemini-tts).
+Compara a configuração antiga (uma conexão nova por chamada, journal em rollback/DELETE)
+com o pool de conexões persistentes em WAL. Cada cenário usa um banco temporário novo, as conexões dos dois
+abrem com os mesmos PRAGMAs do app e o cache em memória das notícias fica desligado, para as leituras irem ao SQLite.
+
+Uso (a partir de core/):
+    python benchmarks/bench_sqlite_pool.py [leitores] [segundos]
+"""
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils_cache_sqlite as cache
+
+NOTICIAS = 2000
+TAMANHO_AUDIO = 4 * 1024 * 1024
+
+
+@contextmanager
+def conexao_antiga():
+    """Comportamento anterior ao pool: abre, usa, confirma e fecha a cada chamada."""
+    conn = cache._new_connection(cache.DB_PATH)
+    try:
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def preparar_banco(caminho, wal):
+    cache.DB_PATH = caminho
+    cache.init_cache_db()
+    if not wal:
+        conn = cache._new_connection(caminho)
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.close()
+    for i in range(NOTICIAS):
+        cache.save_news_to_cache(f"topico {i}", "Geral", {"titulo": f"Titulo numero {i} sobre assunto {i % 100}"})
+
+
+def rodar(leitores, segundos):
+    parar = threading.Event()
+    leituras = [0] * leitores
+    escritas = [0]
+    erros = []
+
+    def leitor(idx):
+        n = 0
+        while not parar.is_set():
+            try:
+                cache.get_news_history(10)
+                cache.get_latest_news_by_title(f"assunto {n % 100}")
+            except sqlite3.Error as e:
+                erros.append(e)
+            n += 1
+        leituras[idx] = n * 2
+
+    def escritor():
+        audio = os.urandom(TAMANHO_AUDIO)
+        n = 0
+        while not parar.is_set():
+            try:
+                cache.save_tts_audio(f"bench:{n}", "Kore", "bench", audio, "audio/wav")
+                escritas[0] += 1
+            except sqlite3.Error as e:
+                erros.append(e)
+            n += 1
+
+    threads = [threading.Thread(target=leitor, args=(i,)) for i in range(leitores)]
+    threads.append(threading.Thread(target=escritor))
+    for t in threads:
+        t.start()
+    time.sleep(segundos)
+    parar.set()
+    for t in threads:
+        t.join()
+    return sum(leituras) / segundos, escritas[0] / segundos, len(erros)
+
+
+def cenario(nome, leitores, segundos, wal, db_connection):
+    original = cache.db_connection
+    cache.db_connection = db_connection
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            preparar_banco(os.path.join(tmp, "bench.db"), wal)
+            leituras, escritas, erros = rodar(leitores, segundos)
+            # esvazia o pool antes de apagar o diretório temporário
+            with cache._pool_lock:
+                for conn in cache._idle_connections.pop(cache.DB_PATH, []):
+                    conn.close()
+    finally:
+        cache.db_connection = original
+    print(f"{nome:<32} {leituras:10.0f} leituras/s {escritas:8.1f} áudios gravados/s  erros: {erros}")
+    return leituras
+
+
+def main():
+    leitores = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    segundos = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    # Com o cache em memória das notícias ligado, as leituras repetidas seriam respondidas por ele, não pelo SQLite
+    cache.configure_news_memory_cache(0)
+    print(f"{leitores} leitores, 1 escritor ({TAMANHO_AUDIO // (1024 * 1024)} MB por áudio), {segundos:.0f}s por cenário")
+    antes = cenario("Antes (conexão por chamada)", leitores, segundos, False, conexao_antiga)
+    depois = cenario("Depois (pool + WAL)", leitores, segundos, True, cache.db_connection)
+    print(f"Ganho nas leituras: {depois / antes:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
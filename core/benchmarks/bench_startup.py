@@ -0,0 +1,59 @@
+"""
+Benchmark da inicialização do servidor, cada rodada num processo Python novo (como um worker recém-criado):
+  - import: tempo para importar app.py (config, banco, threads de fundo);
+  - 1ª requisição: tempo até responder a primeira requisição (/api/news/history, pelo test client do Flask);
+  - 1º agente: tempo para criar o agente no primeiro uso (import do ADK), que não entra mais na inicialização.
+
+Cada processo roda num diretório temporário, com um cache.db vazio.
+
+Uso (a partir de core/):
+    python benchmarks/bench_startup.py [rodadas]
+"""
+import os
+import sys
+import json
+import tempfile
+import statistics
+import subprocess
+
+CORE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+RODADA = """
+import sys, time, json
+inicio = time.perf_counter()
+sys.path.insert(0, {core!r})
+import app
+importado = time.perf_counter()
+resposta = app.app.test_client().get("/api/news/history")
+respondido = time.perf_counter()
+app.news_system.unified_agent
+agente = time.perf_counter()
+print(json.dumps({{
+    "import": importado - inicio,
+    "requisicao": respondido - importado,
+    "agente": agente - respondido,
+    "status": resposta.status_code
+}}))
+"""
+
+
+def rodar():
+    with tempfile.TemporaryDirectory() as diretorio:
+        saida = subprocess.run(
+            [sys.executable, "-c", RODADA.format(core=CORE_DIR)],
+            cwd=diretorio, capture_output=True, text=True, check=True
+        ).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def main():
+    rodadas = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    resultados = [rodar() for _ in range(rodadas)]
+    assert all(r["status"] == 200 for r in resultados)
+    print(f"{rodadas} processos novos (mediana, segundos)")
+    for campo, nome in (("import", "import do app"), ("requisicao", "1ª requisição"), ("agente", "1º uso do agente")):
+        print(f"{nome:>18}: {statistics.median(r[campo] for r in resultados):.3f}")
+
+
+if __name__ == "__main__":
+    main()
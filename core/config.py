@@ -1,8 +1,6 @@
 import os
 import warnings
 from dotenv import load_dotenv
-import google.generativeai as genai
-from pytrends.request import TrendReq
 
 # Ignorar avisos
 warnings.filterwarnings("ignore")
@@ -15,18 +13,88 @@ GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 MAX_RETRIES = 3
 INITIAL_BACKOFF = 2  # segundos
 
-# Inicialização do Modelo Gemini
-# Tenta inicializar o modelo Gemini se a chave da API estiver disponível.
-gemini_model = None
-if GOOGLE_API_KEY:
-    try:
-        genai.configure(api_key=GOOGLE_API_KEY)
-        gemini_model = genai.GenerativeModel('models/gemini-2.0-flash-001')
-        print("Modelo Gemini inicializado com sucesso.")
-    except Exception as e:
-        print(f"Erro ao inicializar o modelo Gemini: {e}")
-else:
-    print("Chave da API do Google Generative AI não encontrada no arquivo .env")
-
-# Inicialização do Pytrends para pesquisas de tendências do Google.
-pytrends = TrendReq(hl='pt-BR', tz=-180)
+# Configurações do Cache de Tópicos em Alta
+# Após o TTL a lista ainda é servida, mas é atualizada em segundo plano.
+TOPICS_CACHE_TTL = int(os.getenv("TOPICS_CACHE_TTL", 6 * 3600))  # segundos
+
+# Configurações da Geração Coalescida de Notícias
+# Duração do lease em cache.db que impede outros processos de gerar o mesmo (topico, categoria).
+GENERATION_LEASE_TTL = int(os.getenv("GENERATION_LEASE_TTL", 300))  # segundos
+GENERATION_POLL_INTERVAL = 0.5  # segundos entre verificações de quem espera outro processo
+# Quanto uma requisição espera pela geração em outro processo antes de responder 202 com um job para acompanhar.
+GENERATION_WAIT_TIMEOUT = int(os.getenv("GENERATION_WAIT_TIMEOUT", 15))  # segundos
+
+# Configurações da Síntese de Voz (TTS)
+# Textos longos são divididos em pedaços de até TTS_CHUNK_MAX_CHARS caracteres, sintetizados em paralelo.
+TTS_CHUNK_MAX_CHARS = int(os.getenv("TTS_CHUNK_MAX_CHARS", 1200))
+TTS_MAX_WORKERS = int(os.getenv("TTS_MAX_WORKERS", 4))  # chamadas TTS simultâneas por processo
+# Orçamento do cache de áudio; acima dele os áudios usados há mais tempo são removidos (LRU).
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+
+# Configurações do Cache em Memória das Notícias
+# Limite (em bytes) das notícias já decodificadas mantidas por processo; 0 desativa o cache.
+NEWS_MEMORY_CACHE_MAX_BYTES = int(os.getenv("NEWS_MEMORY_CACHE_MAX_BYTES", 32 * 1024 ** 2))
+# Intervalo máximo até um processo perceber gravações feitas por outros processos.
+NEWS_GENERATION_CHECK_INTERVAL = float(os.getenv("NEWS_GENERATION_CHECK_INTERVAL", 1.0))  # segundos
+
+# Configurações do Reaproveitamento de Tópicos Parecidos
+# Semelhança mínima (0 a 1, índice de Jaccard dos termos) para uma busca reaproveitar a notícia de um
+# tópico escrito de outro jeito em vez de gerar outra; 0 desativa.
+NEWS_DEDUP_THRESHOLD = float(os.getenv("NEWS_DEDUP_THRESHOLD", 0.6))
+
+# Configurações das Respostas HTTP
+# Limite (em bytes) dos corpos já comprimidos (gzip/brotli) guardados por processo para as notícias e o histórico.
+HTTP_COMPRESSED_CACHE_MAX_BYTES = int(os.getenv("HTTP_COMPRESSED_CACHE_MAX_BYTES", 16 * 1024 ** 2))
+
+# Configurações de Gravação e Reprodução das Chamadas à Gemini (testes de carga sem rede)
+# "live" chama a API; "record" chama a API e grava as respostas e os tempos em UPSTREAM_FIXTURES_DIR;
+# "replay" responde com as gravações, sem rede.
+UPSTREAM_MODE = os.getenv("UPSTREAM_MODE", "live")
+UPSTREAM_FIXTURES_DIR = os.getenv("UPSTREAM_FIXTURES_DIR", "fixtures")
+# Fator aplicado aos tempos gravados no modo "replay" (1 = latência real, 0 = sem espera).
+UPSTREAM_REPLAY_LATENCY = float(os.getenv("UPSTREAM_REPLAY_LATENCY", 1.0))
+
+# Configurações da Limpeza do Cache em Disco
+# Notícias mais velhas que o TTL da sua categoria são removidas (com o áudio exclusivo delas).
+NEWS_CACHE_TTL = int(os.getenv("NEWS_CACHE_TTL", 2 * 24 * 3600))  # segundos, para categorias sem TTL próprio
+# TTL por categoria no formato "Categoria=segundos,..." (ex: "Esportes=43200,Tecnologia=604800")
+NEWS_CACHE_CATEGORY_TTLS = {
+    categoria.strip(): int(ttl)
+    for categoria, _, ttl in (item.partition("=") for item in os.getenv("NEWS_CACHE_CATEGORY_TTLS", "").split(","))
+    if categoria.strip() and ttl.strip()
+}
+# Orçamento do banco inteiro; acima dele sai primeiro o áudio menos usado e depois as notícias mais antigas.
+NEWS_CACHE_MAX_BYTES = int(os.getenv("NEWS_CACHE_MAX_BYTES", 4 * 1024 ** 3))
+CACHE_JANITOR_INTERVAL = int(os.getenv("CACHE_JANITOR_INTERVAL", 300))  # segundos entre rodadas de limpeza
+
+# Configurações da Fila de Geração de Notícias
+NEWS_JOB_WORKERS = int(os.getenv("NEWS_JOB_WORKERS", 2))  # gerações simultâneas por processo
+NEWS_JOB_MAX_ATTEMPTS = 3  # tentativas de um job interrompido (ex: processo reiniciado) antes de virar erro
+NEWS_JOB_RETENTION = int(os.getenv("NEWS_JOB_RETENTION", 24 * 3600))  # segundos que jobs terminados ficam consultáveis
+
+# Configurações da Pré-geração dos Tópicos em Alta
+# A cada lista nova de tópicos, os primeiros K que não estão no cache são gerados em segundo plano; 0 desativa.
+NEWS_PREFETCH_TOP_K = int(os.getenv("NEWS_PREFETCH_TOP_K", 0))
+NEWS_PREFETCH_MAX_CONCURRENT = int(os.getenv("NEWS_PREFETCH_MAX_CONCURRENT", 1))  # pré-gerações simultâneas (todos os processos)
+# Orçamento diário (dia UTC) de tokens da pré-geração, estimados pelo tamanho do prompt e da resposta.
+NEWS_PREFETCH_DAILY_TOKENS = int(os.getenv("NEWS_PREFETCH_DAILY_TOKENS", 200_000))
+NEWS_PREFETCH_TOKENS_ESTIMATE = 2_000  # estimativa por notícia até haver pré-gerações no dia
+
+# Configurações do Controle de Chamadas à Gemini (por processo)
+# Taxa máxima (chamadas por segundo) e teto de chamadas simultâneas; o limite efetivo de simultâneas
+# se ajusta sozinho abaixo do teto, caindo quando a API erra (429/5xx) ou passa da latência alvo.
+AGENT_RATE_LIMIT = float(os.getenv("AGENT_RATE_LIMIT", 2))
+AGENT_MAX_CONCURRENCY = int(os.getenv("AGENT_MAX_CONCURRENCY", 8))
+AGENT_TARGET_LATENCY = float(os.getenv("AGENT_TARGET_LATENCY", 60))  # segundos (inclui as buscas no Google)
+TTS_RATE_LIMIT = float(os.getenv("TTS_RATE_LIMIT", 5))
+TTS_MAX_CONCURRENCY = int(os.getenv("TTS_MAX_CONCURRENCY", 8))
+TTS_TARGET_LATENCY = float(os.getenv("TTS_TARGET_LATENCY", 20))  # segundos por pedaço de texto
+# Disjuntor: após N erros de sobrecarga seguidos, as chamadas são recusadas (e o cache antigo é servido) por um tempo.
+UPSTREAM_FAILURE_THRESHOLD = int(os.getenv("UPSTREAM_FAILURE_THRESHOLD", 5))
+UPSTREAM_OPEN_SECONDS = int(os.getenv("UPSTREAM_OPEN_SECONDS", 30))
+UPSTREAM_ACQUIRE_TIMEOUT = 30  # segundos esperando vaga antes de desistir com "serviço indisponível"
+
+# Configurações da Geração em Lote (/api/news/batch)
+NEWS_BATCH_SIZE = int(os.getenv("NEWS_BATCH_SIZE", 4))  # notícias pedidas ao agente numa única chamada
+NEWS_BATCH_MAX_WORKERS = int(os.getenv("NEWS_BATCH_MAX_WORKERS", 2))  # chamadas em lote simultâneas por processo
+NEWS_BATCH_MAX_ITEMS = 50  # tópicos aceitos por requisição
@@ -127,10 +127,8 @@ def exemplo_uso_completo():
 
             # Gerar áudio para a notícia completa processada via GET
             print("\n🔊 Gerando áudio da notícia processada via GET...")
+            # Notícias longas são divididas e sintetizadas em paralelo pelo servidor
             text_to_speak_get = noticia_get.get('noticia_completa', 'Conteúdo da notícia não disponível para áudio.')
-            if len(text_to_speak_get) > 4000:
-                print("AVISO: Notícia muito longa para TTS. Usando apenas os primeiros 4000 caracteres.")
-                text_to_speak_get = text_to_speak_get[:4000]
 
             audio_result_get = client.generate_audio_from_text(text_to_speak_get, voice="Zephyr", output_filename="noticia_audio_get.wav")
             if audio_result_get.get("success"):
@@ -158,10 +156,8 @@ def exemplo_uso_completo():
 
             # Gerar áudio para a notícia completa processada via POST
             print("\n🔊 Gerando áudio da notícia processada via POST...")
+            # Notícias longas são divididas e sintetizadas em paralelo pelo servidor
             text_to_speak_post = noticia_post.get('noticia_completa', 'Conteúdo da notícia não disponível para áudio.')
-            if len(text_to_speak_post) > 4000:
-                print("AVISO: Notícia muito longa para TTS. Usando apenas os primeiros 4000 caracteres.")
-                text_to_speak_post = text_to_speak_post[:4000]
 
             audio_result_post = client.generate_audio_from_text(text_to_speak_post, voice="Zephyr", output_filename="noticia_audio_post.wav")
             if audio_result_post.get("success"):
@@ -8,6 +8,7 @@ class NewsGenerator {
             autoTrending: document.getElementById('auto-trending'),
             autoAudio: document.getElementById('auto-audio'),
             loading: document.getElementById('loading'),
+            loadingProgress: document.getElementById('loading-progress'),
             audioLoading: document.getElementById('audio-loading'),
             newsContainer: document.getElementById('news-container'),
             trendingTopics: document.getElementById('trending-topics'),
@@ -18,7 +19,9 @@ class NewsGenerator {
             apiUrl: 'http://127.0.0.1:5000',
             maxRetries: 3,
             retryDelay: 1000,
-            fetchTimeout: 30000000
+            fetchTimeout: 300000,
+            jobPollInterval: 1000,
+            jobTimeout: 600000
         };
 
         this.trendingTopics = [];
@@ -241,16 +244,11 @@ setupDisplayHandlers() {
                 const category = decodeURIComponent(e.target.dataset.category);
                 this.setAudioLoading(true);
                 try {
-                    const response = await fetch(`${this.config.apiUrl}/api/news/${encodeURIComponent(topic)}?categoria=${encodeURIComponent(category)}`);
-                    if (response.ok) {
-                        const data = await response.json();
-                        if (data.noticia) {
-                            await this.generateAudio(data.noticia, topic, category);
-                        } else {
-                            this.showAudioError("Não foi possível obter os detalhes da notícia para gerar áudio.");
-                        }
+                    const data = await this.requestNews(topic, category);
+                    if (data.noticia) {
+                        await this.generateAudio(data.noticia, topic, category);
                     } else {
-                        this.showAudioError("Erro ao carregar notícia para gerar áudio.");
+                        this.showAudioError("Não foi possível obter os detalhes da notícia para gerar áudio.");
                     }
                 } catch (error) {
                     this.showAudioError("Erro de rede ao carregar notícia para áudio.");
@@ -286,40 +284,123 @@ setupDisplayHandlers() {
         }
     }
 
+    // Acompanha o job pelos eventos SSE, repassando o andamento a onProgress.
+    // Resolve com a notícia, ou com null se a conexão cair (o chamador volta a consultar o job).
+    followJobEvents(jobId, onProgress) {
+        return new Promise((resolve, reject) => {
+            const source = new EventSource(`${this.config.apiUrl}/api/news/jobs/${jobId}/events`);
+            const finish = (settle, value) => {
+                clearTimeout(timer);
+                source.close();
+                settle(value);
+            };
+            const timer = setTimeout(() => finish(reject, new Error('Tempo esgotado aguardando a geração da notícia')), this.config.jobTimeout);
+            ['etapa', 'busca', 'titulo', 'texto', 'reinicio'].forEach(type => {
+                source.addEventListener(type, (e) => onProgress(type, JSON.parse(e.data)));
+            });
+            source.addEventListener('noticia', (e) => finish(resolve, JSON.parse(e.data)));
+            source.addEventListener('erro', (e) => finish(reject, new Error(JSON.parse(e.data).error)));
+            source.onerror = () => finish(resolve, null);
+        });
+    }
+
+    // Pede a notícia à fila de geração: se já estiver no cache vem na hora, senão acompanha
+    // o job (por SSE, se houver onProgress, ou consultando até ele terminar).
+    // Retorna o mesmo formato de /api/news/<topic>.
+    async requestNews(topic, category, onProgress = null) {
+        const response = await fetch(`${this.config.apiUrl}/api/news/jobs`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ topico: topic, categoria: category })
+        });
+        let job = await response.json().catch(() => ({ error: `Erro ${response.status}` }));
+        if (!response.ok) throw new Error(job.error || response.statusText);
+
+        const pending = job.status === 'pendente' || job.status === 'processando';
+        if (pending && onProgress && window.EventSource) {
+            const result = await this.followJobEvents(job.job_id, onProgress);
+            if (result) return result;
+        }
+
+        const deadline = Date.now() + this.config.jobTimeout;
+        while (job.status === 'pendente' || job.status === 'processando') {
+            if (Date.now() > deadline) throw new Error('Tempo esgotado aguardando a geração da notícia');
+            await new Promise(resolve => setTimeout(resolve, this.config.jobPollInterval));
+            const statusResponse = await fetch(`${this.config.apiUrl}/api/news/jobs/${job.job_id}`);
+            job = await statusResponse.json().catch(() => ({ error: `Erro ${statusResponse.status}` }));
+            if (!statusResponse.ok) throw new Error(job.error || statusResponse.statusText);
+        }
+        if (job.status !== 'concluido' || !job.result) {
+            throw new Error(job.error || 'Notícia não encontrada ou gerada');
+        }
+        return job.result;
+    }
+
     async generateNews(topic, category) {
         if (this.isLoading) return;
         this.setLoading(true);
         this.hideError();
         try {
             // Garante que o topic é o título da notícia para buscar corretamente do backend
-            const response = await fetch(`${this.config.apiUrl}/api/news/${encodeURIComponent(topic)}?categoria=${encodeURIComponent(category)}`);
-            if (response.ok) {
-                const newsData = await response.json();
-                if (newsData && newsData.noticia) {
-                    this.currentNewsData = newsData; // Guarda a notícia atual
-                    this.renderNews(newsData);
-                    // Se o áudio já está disponível no cache, toca. Senão, gera (se autoAudio estiver marcado).
-                    if (newsData.audio_data_available) {
-                        // Usa o topico_original_do_cache e categoria_original_do_cache para buscar o áudio
-                        await this.playCachedAudio(newsData.topico_original_do_cache, newsData.categoria_original_do_cache);
-                    } else if (this.elements.autoAudio.checked) {
-                        await this.generateAudio(newsData.noticia, newsData.topico_original_do_cache, newsData.categoria_original_do_cache);
-                    }
-                } else {
-                    this.showError('⚠️ Notícia não encontrada ou gerada. Tente um tópico diferente.');
+            const newsData = await this.requestNews(topic, category, (type, data) => this.showGenerationProgress(type, data));
+            if (newsData && newsData.noticia) {
+                this.currentNewsData = newsData; // Guarda a notícia atual
+                this.renderNews(newsData);
+                // Se o áudio já está disponível no cache, toca. Senão, gera (se autoAudio estiver marcado).
+                if (newsData.audio_data_available) {
+                    // Usa o topico_original_do_cache e categoria_original_do_cache para buscar o áudio
+                    await this.playCachedAudio(newsData.topico_original_do_cache, newsData.categoria_original_do_cache);
+                } else if (this.elements.autoAudio.checked) {
+                    await this.generateAudio(newsData.noticia, newsData.topico_original_do_cache, newsData.categoria_original_do_cache);
                 }
             } else {
-                const errorData = await response.json().catch(() => ({ error: `Erro ${response.status}` }));
-                this.showError(`⚠️ Erro ao buscar notícia: ${errorData.error || response.statusText}.`);
+                this.showError('⚠️ Notícia não encontrada ou gerada. Tente um tópico diferente.');
             }
         } catch (error) {
-            this.showError('⚠️ Erro de conexão. Verifique sua internet e o backend.');
+            // fetch rejeita com TypeError quando o backend está inacessível
+            if (error instanceof TypeError) {
+                this.showError('⚠️ Erro de conexão. Verifique sua internet e o backend.');
+            } else {
+                this.showError(`⚠️ Erro ao buscar notícia: ${error.message}.`);
+            }
             console.error(error);
         } finally {
             this.setLoading(false);
         }
     }
 
+    // Mostra o andamento da geração enquanto o agente pesquisa e escreve a notícia
+    showGenerationProgress(type, data) {
+        const panel = this.elements.loadingProgress;
+        if (!panel) return;
+        const title = panel.querySelector('.loading-progress-title');
+        const text = panel.querySelector('.loading-progress-text');
+        if (type === 'etapa') {
+            panel.querySelector('.loading-progress-step').textContent = data.mensagem;
+        } else if (type === 'busca') {
+            const list = panel.querySelector('.loading-progress-queries');
+            data.consultas.forEach(query => {
+                const item = document.createElement('li');
+                item.textContent = `🔎 ${query}`;
+                list.appendChild(item);
+            });
+        } else if (type === 'titulo') {
+            title.textContent = data.titulo;
+        } else if (type === 'texto') {
+            text.textContent += data.delta;
+        } else if (type === 'reinicio') {
+            title.textContent = '';
+            text.textContent = '';
+        }
+    }
+
+    clearGenerationProgress() {
+        const panel = this.elements.loadingProgress;
+        if (!panel) return;
+        panel.querySelectorAll('.loading-progress-step, .loading-progress-queries, .loading-progress-title, .loading-progress-text')
+            .forEach(element => { element.textContent = ''; });
+    }
+
     renderNews(data) {
         const news = data.noticia;
         const paragraphs = (news.noticia_completa || '').split('\n\n').filter(p => p.trim());
@@ -386,11 +467,13 @@ setupDisplayHandlers() {
     // --- Funções de Geração e Gestão de Áudio (ATUALIZADAS) ---
 
     prepareTextForSpeech(newsData) {
-        let text = `${newsData.titulo}. `;
-        text += (newsData.noticia_completa || '').replace(/\n\n/g, '. ');
-        text = text.replace(/[^\w\s\.,!?áéíóúàèìòùâêîôûãõçÁÉÍÓÚÀÈÌÒÙÂÊÎÔÛÃÕÇ]/gi, ' ');
-        text = text.replace(/\s+/g, ' ').trim();
-        return text.substring(0, 5000);
+        // Mantém as quebras de parágrafo: o backend divide o texto por parágrafos para sintetizar
+        // os pedaços em paralelo e reaproveitar do cache os parágrafos que não mudaram
+        const paragraphs = [`${newsData.titulo}.`, ...(newsData.noticia_completa || '').split('\n\n')];
+        return paragraphs
+            .map(p => p.replace(/[^\w\s\.,!?áéíóúàèìòùâêîôûãõçÁÉÍÓÚÀÈÌÒÙÂÊÎÔÛÃÕÇ]/gi, ' ').replace(/\s+/g, ' ').trim())
+            .filter(p => p)
+            .join('\n\n');
     }
 
     async generateAudio(newsData, topicForSave, categoryForSave) {
@@ -444,13 +527,17 @@ setupDisplayHandlers() {
             const encodedCategory = encodeURIComponent(category);
             const audioUrl = `${this.config.apiUrl}/api/news/audio/${encodedTopic}/${encodedCategory}`;
             
+            // Só confirma que o áudio existe; o player baixa direto da URL (com Range),
+            // podendo começar a tocar e avançar sem baixar o arquivo inteiro antes
             const response = await fetch(audioUrl, {
+                method: 'HEAD',
                 signal: AbortSignal.timeout(this.config.fetchTimeout)
             });
 
             if (response.ok) {
-                const audioBlob = await response.blob();
-                this.addAudioPlayer(audioBlob);
+                this.addAudioPlayerFromUrl(audioUrl, response.headers.get('Content-Type') || 'audio/wav');
+            } else if (response.status === 404) {
+                this.showAudioError('Falha ao carregar áudio do cache: Áudio não encontrado para esta notícia no cache.');
             } else {
                 const errorData = await response.json().catch(() => ({ error: `Erro ${response.status}` }));
                 this.showAudioError(`Falha ao carregar áudio do cache: ${errorData.error}`);
@@ -464,14 +551,17 @@ setupDisplayHandlers() {
     }
 
     addAudioPlayer(audioBlob) {
-        const audioUrl = URL.createObjectURL(audioBlob);
+        this.addAudioPlayerFromUrl(URL.createObjectURL(audioBlob), audioBlob.type || 'audio/wav');
+    }
+
+    addAudioPlayerFromUrl(audioUrl, audioType) {
         const audioPlayerHTML = `
             <div class="audio-player-container">
                 <div class="audio-header">
                     <span style="font-size: 24px;">🔊</span><h3>Áudio da Notícia</h3>
                 </div>
                 <audio controls autoplay>
-                    <source src="${audioUrl}" type="${audioBlob.type || 'audio/wav'}">
+                    <source src="${audioUrl}" type="${audioType}">
                     Seu navegador não suporta áudio.
                 </audio>
                 <button onclick="this.parentElement.remove()">✕ Fechar</button>
@@ -499,6 +589,7 @@ setupDisplayHandlers() {
     // --- Funções Auxiliares (Loading, Erro, Scroll) ---
     setLoading(loading) {
         this.isLoading = loading;
+        this.clearGenerationProgress();
         this.elements.loading.classList.toggle('hidden', !loading);
         this.elements.searchBtn.disabled = loading;
         if (this.elements.showHistoryBtn) {
@@ -0,0 +1,16 @@
+"""
+Configuração dos testes (a partir de core/): python -m pytest -q tests
+
+O app grava o cache.db no diretório atual ao ser importado, então os testes rodam num diretório temporário.
+"""
+import os
+import sys
+import tempfile
+
+CORE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, CORE_DIR)
+os.chdir(tempfile.mkdtemp(prefix="noticias-testes-"))
+
+from utils_cache_sqlite import init_cache_db  # noqa: E402
+
+init_cache_db()
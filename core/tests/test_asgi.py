@@ -0,0 +1,104 @@
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+import app
+import asgi
+from utils_cache_sqlite import link_news_audio, save_news_to_cache, save_tts_audio
+from utils_governor import UpstreamUnavailable
+
+
+def request(method, url, **kwargs):
+    async def send():
+        transport = httpx.ASGITransport(app=asgi.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://teste") as client:
+            return await client.request(method, url, **kwargs)
+    return asyncio.run(send())
+
+
+@pytest.mark.parametrize("url", ["/api/news/history", "/api/news/categorias"])
+def test_vary_origin_uma_vez_nas_rotas_do_flask(url):
+    response = request("GET", url, headers={"Origin": "http://exemplo.com"})
+    vary = [value.strip() for value in response.headers["Vary"].split(",")]
+    assert vary.count("Origin") == 1
+    assert "Access-Control-Allow-Origin" in response.headers
+
+
+def test_preflight_respondido_pelo_flask():
+    response = request("OPTIONS", "/api/news/Tema", headers={
+        "Origin": "http://exemplo.com", "Access-Control-Request-Method": "GET"
+    })
+    assert response.status_code == 200
+    assert "Access-Control-Allow-Origin" in response.headers
+
+
+def test_tts_indisponivel_serve_audio_anterior_de_topico_com_barra(monkeypatch):
+    topico = "Câmbio/Juros? 50% #2026"
+    save_news_to_cache(topico, "Economia", {"titulo": "Câmbio e juros", "noticia_completa": "Texto."})
+    save_tts_audio("audio-anterior", "Zephyr", "teste", b"RIFF" + b"\x00" * 64, "audio/wav")
+    assert link_news_audio(topico, "Economia", "audio-anterior")
+
+    async def indisponivel(*args):
+        raise UpstreamUnavailable("tts: circuito aberto", 30)
+        yield
+
+    monkeypatch.setattr(asgi, "GOOGLE_API_KEY", "chave-de-teste")
+    monkeypatch.setattr(asgi, "aiter_article_audio", indisponivel)
+    response = request("POST", "/api/gemini-tts", json={"text": "Texto novo", "topico": topico, "categoria": "Economia"})
+    assert response.status_code == 200
+    assert response.content == b"RIFF" + b"\x00" * 64
+
+
+def test_leitura_nao_espera_gravacao_lenta():
+    liberar = threading.Event()
+
+    async def run():
+        gravacao = asyncio.ensure_future(asgi.db_write(liberar.wait, 5))
+        leitura = await asyncio.wait_for(asgi.db(lambda: "lido"), timeout=2)
+        liberar.set()
+        await gravacao
+        return leitura
+
+    assert asyncio.run(run()) == "lido"
+
+
+def test_noticia_em_cache_procurada_uma_vez(monkeypatch):
+    save_news_to_cache("Tema Único", "Geral", {"titulo": "Tema único", "noticia_completa": "Texto."})
+    chamadas = []
+    original = app.get_cached_news
+
+    def contar(*args):
+        chamadas.append(args)
+        return original(*args)
+
+    monkeypatch.setattr(app, "get_cached_news", contar)
+    for method, url, kwargs in [("GET", "/api/news/Tema%20%C3%9Anico", {}),
+                                ("POST", "/api/news", {"json": {"topico": "Tema Único"}})]:
+        chamadas.clear()
+        response = request(method, url, **kwargs)
+        assert response.status_code == 200
+        assert response.json()["from_cache"] is True
+        assert len(chamadas) == 1
+
+
+def test_geracao_assincrona_coalescida(monkeypatch):
+    calls = []
+
+    async def search_and_process_news_async(topico, categoria, on_progress=None):
+        calls.append(topico)
+        await asyncio.sleep(0.2)
+        return {"noticia": {"titulo": topico, "noticia_completa": "Texto."}, "status": "ok"}
+
+    monkeypatch.setattr(asgi.news_system, "search_and_process_news_async", search_and_process_news_async)
+
+    async def send():
+        transport = httpx.ASGITransport(app=asgi.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://teste") as client:
+            return await asyncio.gather(*[client.get("/api/news/Tema%20Assíncrono") for _ in range(20)])
+
+    responses = asyncio.run(send())
+    assert calls == ["Tema Assíncrono"]
+    assert all(r.status_code == 200 and r.json()["noticia"]["titulo"] == "Tema Assíncrono" for r in responses)
+    assert app.get_cached_news("Tema Assíncrono", "Geral") is not None
@@ -0,0 +1,42 @@
+import pytest
+
+import app
+from utils_cache_sqlite import link_news_audio, save_news_to_cache, save_tts_audio
+
+AUDIO = bytes(range(256)) * 40
+
+
+@pytest.fixture
+def client():
+    save_news_to_cache("Tópico/Áudio", "Geral", {"titulo": "Áudio", "noticia_completa": "Texto."})
+    save_tts_audio("audio-range", "Zephyr", "teste", AUDIO, "audio/wav")
+    assert link_news_audio("Tópico/Áudio", "Geral", "audio-range")
+    return app.app.test_client()
+
+
+URL = "/api/news/audio/T%C3%B3pico%2F%C3%81udio/Geral"
+
+
+def test_audio_completo_com_etag_e_cache_control(client):
+    response = client.get(URL)
+    assert response.status_code == 200
+    assert response.data == AUDIO
+    assert response.headers["Accept-Ranges"] == "bytes"
+    assert response.headers["ETag"] == '"audio-range"'
+    assert "max-age" in response.headers["Cache-Control"]
+
+    assert client.get(URL, headers={"If-None-Match": '"audio-range"'}).status_code == 304
+
+
+def test_intervalo_do_audio(client):
+    response = client.get(URL, headers={"Range": "bytes=100-299"})
+    assert response.status_code == 206
+    assert response.data == AUDIO[100:300]
+    assert response.headers["Content-Range"] == f"bytes 100-299/{len(AUDIO)}"
+
+    assert client.get(URL, headers={"Range": "bytes=-10"}).data == AUDIO[-10:]
+    # If-Range com outra versão: o áudio inteiro
+    assert client.get(URL, headers={"Range": "bytes=0-9", "If-Range": '"outra"'}).status_code == 200
+    fora = client.get(URL, headers={"Range": f"bytes={len(AUDIO)}-"})
+    assert fora.status_code == 416
+    assert fora.headers["Content-Range"] == f"bytes */{len(AUDIO)}"
@@ -0,0 +1,40 @@
+import app
+
+
+def noticia(topico):
+    return {"titulo": topico, "noticia_completa": "Texto."}
+
+
+def test_lote_divide_as_chamadas_e_gera_individualmente_o_que_faltou(monkeypatch):
+    app.save_news_to_cache("Lote em cache", "Geral", noticia("Lote em cache"))
+    lotes, individuais = [], []
+
+    def search_and_process_news_batch(itens, on_usage=None):
+        lotes.append(list(itens))
+        # O agente não devolve completa a notícia do último tópico
+        return {item: noticia(item[0]) for item in itens if item[0] != "Lote D"}
+
+    def search_and_process_news(topico, categoria, on_progress=None, on_usage=None):
+        individuais.append(topico)
+        return {"noticia": noticia(topico)}
+
+    monkeypatch.setattr(app, "NEWS_BATCH_SIZE", 2)
+    monkeypatch.setattr(app.news_system, "search_and_process_news_batch", search_and_process_news_batch)
+    monkeypatch.setattr(app.news_system, "search_and_process_news", search_and_process_news)
+    topicos = [{"topico": t} for t in ("Lote A", "Lote em cache", "Lote B", "Lote C", "Lote D", "Lote A")]
+
+    response = app.app.test_client().post("/api/news/batch", json={"topicos": topicos})
+    body = response.get_json()
+
+    assert sorted(len(lote) for lote in lotes) == [2, 2]
+    assert individuais == ["Lote D"]
+    assert [item["topico"] for item in body["results"]] == ["Lote A", "Lote em cache", "Lote B", "Lote C", "Lote D"]
+    assert all(item["success"] for item in body["results"])
+    assert (body["from_cache"], body["generated"], body["fallback"]) == (1, 4, 1)
+    assert app.get_cached_news("Lote D", "Geral") is not None
+
+
+def test_lote_sem_topico_valido():
+    client = app.app.test_client()
+    assert client.post("/api/news/batch", json={"topicos": []}).status_code == 400
+    assert client.post("/api/news/batch", json={"topicos": [{"categoria": "Geral"}]}).status_code == 400
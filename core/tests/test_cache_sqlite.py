@@ -0,0 +1,73 @@
+import pytest
+
+from utils_cache_sqlite import (
+    db_connection, get_cached_audio_info, get_cached_news, get_latest_news_by_title, get_tts_audio_info,
+    link_news_audio, save_news_to_cache, save_tts_audio
+)
+
+
+def geracao():
+    with db_connection() as conn:
+        return conn.execute("SELECT geracao FROM cache_geracao WHERE id = 1").fetchone()[0]
+
+
+def test_religar_o_mesmo_audio_nao_muda_a_geracao():
+    save_news_to_cache("Tópico com áudio", "Geral", {"titulo": "Com áudio", "noticia_completa": "Texto."})
+    assert link_news_audio("Tópico com áudio", "Geral", "chave-1")
+    depois_de_ligar = geracao()
+
+    assert link_news_audio("Tópico com áudio", "Geral", "chave-1")
+    assert geracao() == depois_de_ligar
+
+    assert link_news_audio("Tópico com áudio", "Geral", "chave-2")
+    assert geracao() == depois_de_ligar + 1
+    assert not link_news_audio("Tópico sem notícia", "Geral", "chave-1")
+
+
+def test_busca_por_titulo_sem_acentos_por_prefixo_e_mais_recente_primeiro():
+    save_news_to_cache("Eleição A", "Política", {"titulo": "Eleições presidenciais começam", "noticia_completa": "A."})
+    save_news_to_cache("Eleição B", "Política", {"titulo": "ELEICOES presidenciais terminam", "noticia_completa": "B."})
+
+    topicos = [n["topico"] for n in get_latest_news_by_title("eleicoes pres", limit=5)]
+    assert topicos == ["Eleição B", "Eleição A"]
+    assert get_latest_news_by_title("presidenciais eleições") == []
+    assert get_latest_news_by_title('"*') == []
+
+    # Regravar o tópico troca o título indexado
+    save_news_to_cache("Eleição A", "Política", {"titulo": "Apuração encerrada", "noticia_completa": "A."})
+    assert [n["topico"] for n in get_latest_news_by_title("eleições", limit=5)] == ["Eleição B"]
+    assert get_latest_news_by_title("apuracao")[0]["topico"] == "Eleição A"
+
+
+def test_metadados_da_noticia_nao_trazem_os_bytes_do_audio():
+    save_news_to_cache("Tópico com WAV", "Geral", {"titulo": "Com WAV", "noticia_completa": "Texto."})
+    save_tts_audio("chave-wav", "Zephyr", "teste", b"RIFF" + b"\x01" * 1000, "audio/wav")
+    assert link_news_audio("Tópico com WAV", "Geral", "chave-wav")
+
+    noticia = get_cached_news("Tópico com WAV", "Geral")
+    assert noticia["audio_available"] and noticia["audio_size"] == 1004
+    assert not any(isinstance(value, bytes) and value.startswith(b"RIFF") for value in noticia.values())
+
+    # Regravar a notícia desliga o áudio do texto antigo, que continua no cache de TTS
+    save_news_to_cache("Tópico com WAV", "Geral", {"titulo": "Com WAV", "noticia_completa": "Texto novo."})
+    assert get_cached_audio_info("Tópico com WAV", "Geral") is None
+    assert get_cached_news("Tópico com WAV", "Geral")["audio_available"] is False
+    assert get_tts_audio_info("chave-wav")["audio_size"] == 1004
+
+
+def test_conexao_reaproveitada_em_wal_e_devolvida_sem_transacao():
+    with db_connection() as conn:
+        primeira = conn
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA recursive_triggers").fetchone()[0] == 1
+    with db_connection() as conn:
+        assert conn is primeira
+
+    # Um erro no meio da transação a desfaz antes de a conexão voltar ao pool
+    with pytest.raises(RuntimeError):
+        with db_connection() as conn:
+            conn.execute("INSERT INTO cache_topicos (limite, topicos, updated_at) VALUES (999, '[]', 0)")
+            raise RuntimeError("falha")
+    with db_connection() as conn:
+        assert not conn.in_transaction
+        assert conn.execute("SELECT 1 FROM cache_topicos WHERE limite = 999").fetchone() is None
@@ -0,0 +1,63 @@
+import threading
+
+import pytest
+from google.adk.agents import Agent
+from google.genai import errors as genai_errors
+
+import utils
+from config import MAX_RETRIES
+from utils_governor import UpstreamGovernor
+
+
+class FailingRunner:
+    """Runner que responde 429 (cota esgotada) a toda chamada, como a Gemini sob carga."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def run_async(self, **kwargs):
+        self.calls += 1
+        raise genai_errors.ClientError(429, {"error": {"code": 429, "message": "quota", "status": "RESOURCE_EXHAUSTED"}})
+        yield
+
+
+@pytest.fixture
+def governor(monkeypatch):
+    governor = UpstreamGovernor("agente", rate=1000, max_concurrency=4, target_latency=60, failure_threshold=100,
+                                open_seconds=30, acquire_timeout=5, backoff_base=0.001)
+    monkeypatch.setattr(utils, "agent_governor", governor)
+    return governor
+
+
+@pytest.mark.parametrize("on_progress", [None, lambda tipo, dados: None])
+def test_429_do_runner_conta_como_falha_e_e_retentado(monkeypatch, governor, on_progress):
+    runner = FailingRunner()
+    monkeypatch.setattr(utils.runner_pool, "get_runner", lambda agent: runner)
+    agent = Agent(name="agente_teste", model="gemini-2.0-flash", instruction="teste")
+
+    with pytest.raises(Exception, match="após"):
+        utils.call_agent(agent, "Tópico", on_progress=on_progress)
+
+    assert runner.calls == MAX_RETRIES
+    assert governor.stats()["overload_errors"] == MAX_RETRIES
+    assert governor.limit < governor.max_limit
+
+
+def test_runner_compartilhado_e_sessoes_removidas_ao_final():
+    pool = utils.RunnerPool()
+    agent = Agent(name="agente_pool", model="gemini-2.0-flash", instruction="teste")
+    runners = []
+    threads = [threading.Thread(target=lambda: runners.append(pool.get_runner(agent))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(runner) for runner in runners}) == 1
+
+    with pool.session(agent) as primeira, pool.session(agent) as segunda:
+        assert primeira != segunda
+        assert pool.active_sessions() == 2
+    with pytest.raises(RuntimeError):
+        with pool.session(agent):
+            raise RuntimeError("falha na chamada")
+    assert pool.active_sessions() == 0
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+import app
+import asgi
+from utils_cache_sqlite import acquire_generation_lease, release_generation_lease
+
+
+@pytest.fixture
+def gerando_em_outro_processo(monkeypatch):
+    """Lease do tópico nas mãos de outro processo; a fila só registra os jobs pedidos."""
+    topico, categoria = "Tema em Geração", "Geral"
+    assert acquire_generation_lease(topico, categoria, "outro-processo", 60)
+    pedidos = []
+
+    def submit(topico, categoria, origem="sob_demanda"):
+        pedidos.append((topico, categoria))
+        return {"id": "job-1", "status": "pendente"}, True
+
+    monkeypatch.setattr(app.news_jobs, "submit", submit)
+    monkeypatch.setattr(app, "GENERATION_WAIT_TIMEOUT", 0.3)
+    monkeypatch.setattr(asgi, "GENERATION_WAIT_TIMEOUT", 0.3)
+    yield topico, pedidos
+    release_generation_lease(topico, categoria, "outro-processo")
+
+
+def test_rota_sincrona_responde_202_com_job(gerando_em_outro_processo):
+    topico, pedidos = gerando_em_outro_processo
+    inicio = time.monotonic()
+    response = app.app.test_client().get(f"/api/news/{topico}")
+    assert time.monotonic() - inicio < 5
+    assert response.status_code == 202
+    assert response.get_json()["status_url"] == "/api/news/jobs/job-1"
+    assert pedidos == [(topico, "Geral")]
+
+
+def test_rota_assincrona_responde_202_com_job(gerando_em_outro_processo):
+    topico, pedidos = gerando_em_outro_processo
+
+    async def send():
+        transport = httpx.ASGITransport(app=asgi.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://teste") as client:
+            return await client.post("/api/news", json={"topico": topico})
+
+    response = asyncio.run(send())
+    assert response.status_code == 202
+    assert response.json()["job_id"] == "job-1"
+    assert pedidos == [(topico, "Geral")]
+
+
+def test_job_enfileirado_e_concluido_pela_fila(monkeypatch):
+    liberar = threading.Event()
+
+    def run_job(job, progress):
+        liberar.wait(5)
+        app.save_news_to_cache(job["topico"], job["categoria"], {"titulo": "Do job", "noticia_completa": "Texto."})
+        return True
+
+    monkeypatch.setattr(app.news_jobs, "run_job", run_job)
+    client = app.app.test_client()
+    criado = client.post("/api/news/jobs", json={"topico": "Tema da Fila"})
+    assert criado.status_code == 202
+    repetido = client.post("/api/news/jobs", json={"topico": "Tema da Fila"})
+    # Um job ativo para o mesmo (topico, categoria) é reaproveitado
+    assert repetido.get_json()["job_id"] == criado.get_json()["job_id"]
+    assert repetido.get_json()["created"] is False
+
+    liberar.set()
+    status_url = criado.get_json()["status_url"]
+    for _ in range(100):
+        job = client.get(status_url).get_json()
+        if job["status"] == "concluido":
+            break
+        time.sleep(0.05)
+    assert job["status"] == "concluido"
+    assert job["result"]["noticia"]["titulo"] == "Do job"
@@ -0,0 +1,59 @@
+import time
+
+import pytest
+
+from utils_governor import UpstreamGovernor, UpstreamUnavailable
+
+
+def test_taxa_zero_desativa_o_limite_de_taxa():
+    governor = UpstreamGovernor("agente", rate=0, max_concurrency=2, target_latency=60, failure_threshold=5,
+                                open_seconds=30, acquire_timeout=0.2)
+    for _ in range(10):
+        with governor.call():
+            pass
+    assert governor.stats()["calls"] == 10
+
+
+class Sobrecarga(Exception):
+    code = 503
+
+
+def falhar(governor):
+    with pytest.raises(Sobrecarga):
+        with governor.call():
+            raise Sobrecarga()
+
+
+def test_disjuntor_abre_apos_falhas_seguidas_e_fecha_com_a_chamada_de_teste():
+    governor = UpstreamGovernor("agente", rate=0, max_concurrency=8, target_latency=60, failure_threshold=3,
+                                open_seconds=0.2, acquire_timeout=0.2)
+    falhar(governor)
+    assert governor.limit == 4  # cada erro de sobrecarga corta o limite pela metade
+    falhar(governor)
+    falhar(governor)
+    assert governor.is_open
+    with pytest.raises(UpstreamUnavailable) as recusa:
+        with governor.call():
+            pass
+    assert recusa.value.retry_after >= 1
+
+    time.sleep(0.25)
+    with governor.call():
+        # Meio-aberto: só a chamada de teste passa
+        with pytest.raises(UpstreamUnavailable):
+            with governor.call():
+                pass
+    assert not governor.is_open
+    with governor.call():
+        pass
+    assert governor.stats()["circuit_opened"] == 1
+
+
+def test_sem_vaga_a_tempo_recusa():
+    governor = UpstreamGovernor("tts", rate=0, max_concurrency=1, target_latency=60, failure_threshold=3,
+                                open_seconds=30, acquire_timeout=0.1)
+    with governor.call():
+        with pytest.raises(UpstreamUnavailable):
+            with governor.call():
+                pass
+    assert governor.in_flight == 0 and governor.stats()["rejected"] == 1
@@ -0,0 +1,32 @@
+import app
+from utils_cache_sqlite import save_news_to_cache
+
+
+def test_paginas_por_cursor_sem_repetir_nem_pular():
+    # Gravadas quase sempre no mesmo segundo: o empate no created_at é desfeito pelo rowid
+    topicos = [f"Página {i}" for i in range(5)]
+    for topico in topicos:
+        save_news_to_cache(topico, "Paginação", {"titulo": topico, "noticia_completa": "Texto."})
+    client = app.app.test_client()
+
+    vistos, cursor = [], None
+    for _ in range(5):
+        query = {"categoria": "Paginação", "limit": 2, **({"cursor": cursor} if cursor else {})}
+        pagina = client.get("/api/news/filter", query_string=query).get_json()
+        assert pagina["count"] <= 2
+        vistos += [item["topico"] for item in pagina["noticias"]]
+        cursor = pagina["next_cursor"]
+        if cursor is None:
+            break
+    assert vistos == topicos[::-1]
+
+    # Uma notícia nova não desloca a página seguinte de quem já está paginando
+    primeira = client.get("/api/news/filter", query_string={"categoria": "Paginação", "limit": 2}).get_json()
+    save_news_to_cache("Página nova", "Paginação", {"titulo": "Página nova", "noticia_completa": "Texto."})
+    segunda = client.get("/api/news/filter", query_string={
+        "categoria": "Paginação", "limit": 2, "cursor": primeira["next_cursor"]
+    }).get_json()
+    assert [item["topico"] for item in segunda["noticias"]] == ["Página 2", "Página 1"]
+
+    assert client.get("/api/news/categorias").get_json()["contagens"]["Paginação"] == 6
+    assert client.get("/api/news/history", query_string={"cursor": "inválido"}).status_code == 400
@@ -0,0 +1,66 @@
+import gzip
+import json
+
+from app import app
+from utils_cache_sqlite import expire_news_batch, get_cached_news, save_news_to_cache
+from utils_http import brotli, conditional_response
+
+
+def noticia(titulo):
+    return {"titulo": titulo, "fonte": "Teste", "resumo": "Resumo", "data": "2026-10-18",
+            "categoria": "Geral", "noticia_completa": "Texto " * 400}
+
+
+def test_etag_muda_quando_o_rowid_e_reaproveitado():
+    # Com o cache vazio, a primeira gravação recebe o rowid 1 e, depois de removida, a próxima também
+    expire_news_batch(-60, {}, 1000)
+    client = app.test_client()
+    save_news_to_cache("Topico antigo", "Geral", noticia("Notícia antiga"))
+    antiga = client.get("/api/news/Topico antigo", headers={"Accept-Encoding": "gzip"})
+    assert antiga.status_code == 200
+    rowid_antigo = get_cached_news("Topico antigo", "Geral")["rowid"]
+
+    expire_news_batch(-60, {}, 1000)
+    save_news_to_cache("Topico novo", "Geral", noticia("Notícia nova"))
+    assert get_cached_news("Topico novo", "Geral")["rowid"] == rowid_antigo
+
+    nova = client.get("/api/news/Topico novo", headers={"Accept-Encoding": "gzip"})
+    assert nova.status_code == 200
+    assert nova.headers["ETag"] != antiga.headers["ETag"]
+    assert json.loads(gzip.decompress(nova.data))["noticia"]["titulo"] == "Notícia nova"
+
+    # O ETag da notícia removida não vale para a nova; o da nova, sim
+    condicional = client.get("/api/news/Topico novo", headers={"If-None-Match": antiga.headers["ETag"]})
+    assert condicional.status_code == 200
+    assert json.loads(condicional.data)["noticia"]["titulo"] == "Notícia nova"
+    assert client.get("/api/news/Topico novo", headers={"If-None-Match": nova.headers["ETag"]}).status_code == 304
+
+
+def test_historico_revalidado_e_corpo_comprimido_reaproveitado():
+    client = app.test_client()
+    save_news_to_cache("Histórico condicional", "Geral", noticia("Histórico"))
+    primeira = client.get("/api/news/history", headers={"Accept-Encoding": "br, gzip"})
+    assert primeira.headers["Content-Encoding"] == ("br" if brotli else "gzip")
+    assert "Accept-Encoding" in primeira.headers["Vary"]
+    assert client.get("/api/news/history", headers={"If-None-Match": primeira.headers["ETag"]}).status_code == 304
+
+    save_news_to_cache("Outro histórico", "Geral", noticia("Outro"))
+    assert client.get("/api/news/history", headers={"If-None-Match": primeira.headers["ETag"]}).status_code == 200
+
+
+def test_corpo_montado_uma_vez_por_versao_e_codificacao():
+    montagens = []
+
+    def build_body():
+        montagens.append(1)
+        return b'{"texto": "' + b"a" * 4000 + b'"}'
+
+    for encoding in ("gzip", "gzip", "identity"):
+        with app.test_request_context(headers={"Accept-Encoding": encoding}):
+            response = conditional_response("v-teste-1", build_body)
+            assert response.content_encoding == (None if encoding == "identity" else "gzip")
+    assert len(montagens) == 2
+
+    with app.test_request_context(headers={"Accept-Encoding": "gzip"}):
+        pequeno = conditional_response("v-teste-2", lambda: b"{}")
+    assert pequeno.content_encoding is None
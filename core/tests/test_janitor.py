@@ -0,0 +1,44 @@
+from utils_cache_sqlite import (
+    db_connection, get_cached_news, get_tts_audio_info, link_news_audio, save_news_to_cache, save_tts_audio
+)
+from utils_janitor import CacheJanitor
+
+HORA = 3600
+
+
+def salvar(topico, categoria, horas_atras, chave=None):
+    save_news_to_cache(topico, categoria, {"titulo": topico, "noticia_completa": "Texto."})
+    with db_connection() as conn:
+        conn.execute(
+            "UPDATE cache_noticias SET created_at = datetime('now', ?) WHERE topico = ? AND categoria = ?",
+            (f"-{horas_atras} hours", topico, categoria)
+        )
+    if chave:
+        save_tts_audio(chave, "Zephyr", "teste", b"\x00" * 100, "audio/wav")
+        assert link_news_audio(topico, categoria, chave)
+
+
+def test_ttl_por_categoria_e_audio_exclusivo_removido():
+    salvar("Placar", "Esportes", 3, chave="audio-placar")
+    salvar("Mercado", "Economia", 3, chave="audio-compartilhado")
+    salvar("Mercado hoje", "Economia", 0, chave="audio-compartilhado")
+
+    janitor = CacheJanitor(default_ttl=2 * HORA, category_ttls={"Esportes": 1 * HORA}, max_bytes=10 ** 12, interval=60)
+    janitor.BATCH_PAUSE = 0
+    janitor.run_once()
+
+    assert get_cached_news("Placar", "Esportes") is None
+    assert get_tts_audio_info("audio-placar") is None
+    assert get_cached_news("Mercado", "Economia") is None
+    # O áudio ainda ligado a outra notícia continua no cache
+    assert get_tts_audio_info("audio-compartilhado") is not None
+    assert get_cached_news("Mercado hoje", "Economia") is not None
+    assert janitor.stats()["expired_news"] >= 2
+
+
+def test_vencidas_mantidas_enquanto_a_geracao_esta_fora():
+    salvar("Notícia velha", "Geral", 5)
+    janitor = CacheJanitor(default_ttl=HORA, category_ttls={}, max_bytes=10 ** 12, interval=60,
+                           hold_expiration=lambda: True)
+    janitor.run_once()
+    assert get_cached_news("Notícia velha", "Geral") is not None
@@ -0,0 +1,36 @@
+import json
+
+from utils_json import RawJSON, agent_json_stats, dumps_with_raw, parse_agent_json, partial_json_string, repair_json
+
+
+def test_trecho_pronto_copiado_como_esta():
+    noticia = json.dumps({"titulo": "Eleições", "texto": "Linha 1\nLinha 2"}, ensure_ascii=False)
+    payload = {"noticia": RawJSON(noticia), "from_cache": True, "lista": [1, None, "á"]}
+    corpo = dumps_with_raw(payload)
+    assert noticia.encode("utf-8") in corpo
+    assert json.loads(corpo) == {**payload, "noticia": json.loads(noticia)}
+
+
+
+def test_noticia_parcial_ate_o_ultimo_caractere_completo():
+    assert partial_json_string('{"titulo": "Tí', "noticia_completa") == (None, False)
+    assert partial_json_string('{"noticia_completa": "Primeira\\nlinha \\u00e', "noticia_completa") == ("Primeira\nlinha ", False)
+    assert partial_json_string('{"noticia_completa": "Fim \\"citado\\"."}', "noticia_completa") == ('Fim "citado".', True)
+
+
+def validate(data):
+    return data if isinstance(data, dict) and data.get("titulo") else None
+
+
+def test_json_extraido_de_resposta_com_texto_em_volta_e_reparado():
+    resposta = 'Claro! Segue:\n```json\n{"titulo": "Chuva {forte}", "texto": "Linha\ncrua",}\n```\nEspero ter ajudado {:)}'
+    assert parse_agent_json(resposta, "teste", validate) == {"titulo": "Chuva {forte}", "texto": "Linha\ncrua"}
+
+    # Aspas tipográficas como delimitadores; as de dentro de strings normais são mantidas
+    assert repair_json('{“titulo”: “Chuva”, "citacao": "Disse “sim”", “n”: [1, 2,],}') == \
+        '{"titulo": "Chuva", "citacao": "Disse “sim”", "n": [1, 2]}'
+    # O primeiro objeto que a validação recusa é pulado
+    assert parse_agent_json('{"outro": 1} {"titulo": "Este"}', "teste", validate) == {"titulo": "Este"}
+    assert parse_agent_json("Não encontrei notícias.", "teste", validate) is None
+    stats = agent_json_stats.stats()["teste"]
+    assert (stats["reparado"], stats["ok"], stats["sem_json"]) == (1, 1, 1)
@@ -0,0 +1,37 @@
+import json
+
+import utils_cache_sqlite
+from utils_cache_sqlite import get_cached_news, get_db_connection, save_news_to_cache
+from utils_lru import ByteLRUCache
+
+
+def test_limite_em_bytes_e_geracao_antiga_recusada():
+    cache = ByteLRUCache(100)
+    cache.set_generation(1)
+    assert cache.put("a", "A", 60, 1)
+    assert cache.put("b", "B", 30, 1)
+    cache.get("a")
+    assert cache.put("c", "C", 30, 1)  # passa do limite: sai "b", o usado há mais tempo
+    assert cache.get("b") is None and cache.get("a") == "A"
+    assert not cache.put("d", "D", 101, 1)
+
+    cache.set_generation(2)
+    assert cache.get("a") is None
+    assert not cache.put("a", "A antigo", 10, 1)  # leitura feita antes da gravação
+    cache.set_generation(1)  # gerações só avançam
+    assert cache.generation == 2
+
+
+def test_gravacao_de_outro_processo_invalida_o_cache(monkeypatch):
+    monkeypatch.setattr(utils_cache_sqlite, "NEWS_GENERATION_CHECK_INTERVAL", 0)
+    save_news_to_cache("Tema Compartilhado", "Geral", {"titulo": "Versão 1", "noticia_completa": "Texto."})
+    assert get_cached_news("Tema Compartilhado", "Geral")["noticia"]["titulo"] == "Versão 1"
+
+    # Outro processo regrava a notícia direto no banco
+    conn = get_db_connection()
+    with conn:
+        conn.execute("UPDATE cache_noticias SET noticia = ? WHERE topico = ? AND categoria = ?",
+                     (json.dumps({"titulo": "Versão 2"}), "Tema Compartilhado", "Geral"))
+        conn.execute("UPDATE cache_geracao SET geracao = geracao + 1 WHERE id = 1")
+    conn.close()
+    assert get_cached_news("Tema Compartilhado", "Geral")["noticia"]["titulo"] == "Versão 2"
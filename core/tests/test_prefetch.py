@@ -0,0 +1,41 @@
+from app import news_prefetcher, topic_index
+from utils_cache_sqlite import save_news_to_cache
+from utils_prefetch import NewsPrefetcher
+
+
+def test_topico_parecido_nao_conta_como_geracao_economizada(monkeypatch):
+    save_news_to_cache("Reforma tributária 2026", "Economia", {"titulo": "Reforma tributária", "noticia_completa": "Texto."})
+    submitted = []
+    monkeypatch.setattr(news_prefetcher, "top_k", 5)
+    monkeypatch.setattr(news_prefetcher, "submit", lambda *args: submitted.append(args) or ("job", True))
+    antes = news_prefetcher.stats()
+    economizadas = topic_index.stats()["saved_calls"]
+
+    enfileirados = news_prefetcher.schedule([
+        {"topico": "Reforma tributária 2026", "categoria": "Economia"},
+        {"topico": "reforma tributaria em 2026", "categoria": "Economia"}
+    ])
+
+    assert enfileirados == [] and submitted == []
+    depois = news_prefetcher.stats()
+    assert depois["skipped_cached"] == antes["skipped_cached"] + 1
+    assert depois["skipped_similar"] == antes["skipped_similar"] + 1
+    assert topic_index.stats()["saved_calls"] == economizadas
+
+
+def test_orcamento_diario_limita_os_topicos_enfileirados():
+    submitted = []
+    prefetcher = NewsPrefetcher(
+        lambda topico, categoria, origem: submitted.append((topico, origem)) or ("job", True),
+        is_cached=lambda topico, categoria: topico == "Já no cache",
+        is_similar=lambda topico, categoria: False,
+        top_k=5, daily_tokens=2500, default_estimate=1000
+    )
+    topicos = [{"topico": " Já no cache "}] + [{"topico": f"Tópico {i}", "categoria": "Geral"} for i in range(6)]
+
+    assert prefetcher.schedule(topicos) == ["Tópico 0", "Tópico 1"]
+    assert submitted == [("Tópico 0", "prefetch"), ("Tópico 1", "prefetch")]
+    stats = prefetcher.stats()
+    assert (stats["skipped_cached"], stats["skipped_budget"]) == (1, 3)
+    # top_k igual a 0 desativa a pré-geração
+    assert NewsPrefetcher(None, None, None, 0, 2500, 1000).schedule(topicos) == []
@@ -0,0 +1,43 @@
+import json
+
+from utils_jobs import JobProgress
+
+
+def test_texto_do_agente_vira_eventos_da_noticia():
+    progress = JobProgress()
+    for delta in ['{"titulo": "Chuva', ' forte", "noticia_completa": "Primeira', ' frase.']:
+        progress.agent_progress("texto", {"delta": delta})
+    progress.agent_progress("reinicio", {})
+    progress.agent_progress("texto", {"delta": '{"titulo": "Outra", "noticia_completa": "Nova."}'})
+    progress.close()
+
+    eventos = [(tipo, dados) for tipo, dados in progress.events if tipo != "etapa"]
+    assert eventos == [
+        ("titulo", {"titulo": "Chuva forte"}),
+        ("texto", {"delta": "Primeira"}),
+        ("texto", {"delta": " frase."}),
+        ("reinicio", {}),
+        ("titulo", {"titulo": "Outra"}),
+        ("texto", {"delta": "Nova."}),
+    ]
+    # Quem se inscreve depois recebe tudo desde o início
+    assert list(progress.iter_events(timeout=0.1)) == progress.events
+
+
+def test_eventos_do_job_terminam_com_a_noticia(monkeypatch):
+    import app
+
+    def run_job(job, progress):
+        app.save_news_to_cache(job["topico"], job["categoria"], {"titulo": "Via SSE", "noticia_completa": "Texto."})
+        return True
+
+    monkeypatch.setattr(app.news_jobs, "run_job", run_job)
+    client = app.app.test_client()
+    assert client.get("/api/news/jobs/inexistente/events").status_code == 404
+
+    job = client.post("/api/news/jobs", json={"topico": "Tema do SSE"}).get_json()
+    response = client.get(job["events_url"])
+    assert response.mimetype == "text/event-stream"
+    ultimo = response.data.decode("utf-8").strip().split("\n\n")[-1]
+    assert ultimo.startswith("event: noticia\ndata: ")
+    assert json.loads(ultimo.split("data: ", 1)[1])["noticia"]["titulo"] == "Via SSE"
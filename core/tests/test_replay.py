@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+
+from utils_replay import UpstreamFixtures
+
+
+def test_gravacao_reproduzida_sem_chamar_a_api(tmp_path):
+    def agente(progress):
+        progress("texto", {"delta": "{"})
+        return '{"titulo": "Eleições"}'
+
+    gravador = UpstreamFixtures("agente", "record", str(tmp_path), 1.0)
+    eventos = []
+    texto = gravador.call(("agente", "Notícia sobre eleições 2026"), agente, lambda tipo, dados: eventos.append((tipo, dados)))
+    assert texto == '{"titulo": "Eleições"}'
+
+    def sem_rede(progress):
+        raise AssertionError("a reprodução não deve chamar a API")
+
+    reprodutor = UpstreamFixtures("agente", "replay", str(tmp_path), 0.0)
+    reproduzidos = []
+    assert reprodutor.call(("agente", "Notícia sobre eleições 2026"), sem_rede,
+                           lambda tipo, dados: reproduzidos.append((tipo, dados))) == texto
+    assert reproduzidos == eventos == [("texto", {"delta": "{"})]
+    # Um texto nunca gravado recebe a gravação mais parecida
+    assert asyncio.run(reprodutor.call_async(("agente", "eleições de 2026 no Brasil"), sem_rede)) == texto
+    assert reprodutor.stats()["replayed_similar"] == 1
+
+
+def test_audio_gravado_em_pedacos_e_sem_gravacoes(tmp_path):
+    pedacos = [(b"\x00\x01", "audio/L16;rate=24000"), (b"\x02", "audio/L16;rate=24000")]
+    gravador = UpstreamFixtures("tts", "record", str(tmp_path), 1.0)
+    assert list(gravador.stream(("modelo", "Zephyr", "Texto"), lambda: iter(pedacos))) == pedacos
+
+    reprodutor = UpstreamFixtures("tts", "replay", str(tmp_path), 0.0)
+    assert list(reprodutor.stream(("modelo", "Zephyr", "Texto"), None)) == pedacos
+    with pytest.raises(RuntimeError, match="Nenhuma gravação"):
+        UpstreamFixtures("agente", "replay", str(tmp_path / "vazio"), 0.0).call(("agente", "x"), None)
@@ -0,0 +1,44 @@
+from app import app, find_similar_news, topic_index
+from utils_cache_sqlite import expire_news_batch, get_cached_news, save_news_to_cache
+from utils_similarity import normalize_tokens
+
+
+def noticia(titulo):
+    return {"titulo": titulo, "fonte": "Teste", "resumo": "Resumo", "data": "2026-10-18",
+            "categoria": "Esportes", "noticia_completa": "Texto da notícia."}
+
+
+def test_indice_ve_noticia_que_reaproveita_rowid_removido():
+    expire_news_batch(-60, {}, 1000)
+    save_news_to_cache("Eleições 2026", "Esportes", noticia("Eleições 2026"))
+    assert find_similar_news("eleições presidenciais 2026", "Esportes")["topico"] == "Eleições 2026"
+    rowid_antigo = get_cached_news("Eleições 2026", "Esportes")["rowid"]
+
+    # Todas as notícias vencem; a próxima gravada recebe o mesmo rowid
+    expire_news_batch(-60, {}, 1000)
+    save_news_to_cache("Copa do Mundo 2026", "Esportes", noticia("Copa do Mundo 2026"))
+    assert get_cached_news("Copa do Mundo 2026", "Esportes")["rowid"] == rowid_antigo
+
+    assert find_similar_news("eleições presidenciais 2026", "Esportes") is None
+    assert find_similar_news("copa mundo 2026 seleção", "Esportes")["topico"] == "Copa do Mundo 2026"
+
+
+def test_nao_reaproveita_noticia_de_outra_categoria():
+    expire_news_batch(-60, {}, 1000)
+    save_news_to_cache("Copa do Mundo 2026", "Esportes", noticia("Copa do Mundo 2026"))
+    assert find_similar_news("copa mundo 2026 seleção", "Economia") is None
+    assert find_similar_news("copa mundo 2026 seleção", "Esportes")["categoria"] == "Esportes"
+
+
+def test_busca_parafraseada_serve_a_noticia_existente():
+    assert normalize_tokens("As Eleições de 2026") == {"eleicao", "2026"}
+    save_news_to_cache("Reajuste do salário mínimo", "Economia", noticia("Governo anuncia reajuste do salário mínimo"))
+    economizadas = topic_index.stats()["saved_calls"]
+
+    response = app.test_client().get("/api/news/salario minimo reajuste", query_string={"categoria": "Economia"})
+    body = response.get_json()
+    assert body["from_cache"] is True
+    assert body["topico_original_do_cache"] == "Reajuste do salário mínimo"
+    assert topic_index.stats()["saved_calls"] == economizadas + 1
+    # Termos em comum abaixo do limiar não reaproveitam
+    assert find_similar_news("salário dos professores", "Economia") is None
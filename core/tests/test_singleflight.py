@@ -0,0 +1,55 @@
+import threading
+import time
+
+import app
+from utils_singleflight import SingleFlight
+
+
+def run_together(n, fn):
+    results, errors = [], []
+
+    def target():
+        try:
+            results.append(fn())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=target) for _ in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_erro_da_execucao_chega_a_todos_que_esperavam():
+    flight = SingleFlight()
+
+    def falha():
+        time.sleep(0.2)
+        raise RuntimeError("agente fora do ar")
+
+    results, errors = run_together(5, lambda: flight.do("chave", falha))
+    assert results == []
+    assert len(errors) == 5 and all(str(e) == "agente fora do ar" for e in errors)
+    assert flight.in_flight() == 0
+
+
+def test_requisicoes_simultaneas_geram_a_noticia_uma_vez(monkeypatch):
+    calls = []
+
+    def search_and_process_news(topico, categoria, on_progress=None, on_usage=None):
+        calls.append((topico, categoria))
+        time.sleep(0.2)
+        return {"noticia": {"titulo": topico, "noticia_completa": "Texto."}, "status": "ok"}
+
+    monkeypatch.setattr(app.news_system, "search_and_process_news", search_and_process_news)
+    results, errors = run_together(8, lambda: app.generate_news_coalesced("Tema Coalescido", "Geral"))
+
+    assert errors == []
+    assert calls == [("Tema Coalescido", "Geral")]
+    assert len(results) == 8
+    # Cada chamador recebe a sua cópia, pois as rotas acrescentam campos ao resultado
+    assert len({id(result) for result in results}) == 8
+    assert app.get_cached_news("Tema Coalescido", "Geral") is not None
+
@@ -0,0 +1,17 @@
+import os
+import subprocess
+import sys
+
+from conftest import CORE_DIR
+
+
+def test_importar_o_app_nao_carrega_os_sdks_da_gemini():
+    codigo = (
+        "import sys, app; "
+        "print(sorted(m for m in ('google.adk', 'google.genai', 'google.generativeai', 'pytrends', 'utils') if m in sys.modules))"
+    )
+    # Num processo novo, no diretório temporário dos testes (o app cria o cache.db no diretório atual)
+    result = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True, timeout=60,
+                            env={**os.environ, "PYTHONPATH": CORE_DIR})
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == "[]"
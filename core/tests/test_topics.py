@@ -0,0 +1,54 @@
+import threading
+import time
+
+import app
+
+
+def test_cache_vazio_faz_uma_unica_busca_de_topicos(monkeypatch):
+    calls = []
+
+    def get_trending_topics(limit):
+        calls.append(limit)
+        time.sleep(0.2)
+        return [{"topico": f"Tópico {i}", "categoria": "Geral"} for i in range(limit)]
+
+    monkeypatch.setattr(app.news_system, "get_trending_topics", get_trending_topics)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(app.get_trending_topics_cached(7)))
+        for _ in range(10)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [7]
+    assert len(results) == 10
+    assert all(len(topicos) == 7 for topicos, _ in results)
+
+
+def test_cache_vencido_e_servido_e_atualizado_uma_vez_em_segundo_plano(monkeypatch):
+    antigos = [{"topico": "Antigo", "categoria": "Geral"}]
+    novos = [{"topico": "Novo", "categoria": "Geral"}]
+    app.save_topics_to_cache(3, antigos)
+    calls = []
+    atualizou = threading.Event()
+
+    def get_trending_topics(limit):
+        calls.append(limit)
+        time.sleep(0.2)
+        return novos
+
+    def schedule(topicos):
+        atualizou.set()
+
+    monkeypatch.setattr(app, "TOPICS_CACHE_TTL", -1)
+    monkeypatch.setattr(app.news_system, "get_trending_topics", get_trending_topics)
+    monkeypatch.setattr(app.news_prefetcher, "schedule", schedule)
+
+    assert app.get_trending_topics_cached(3) == (antigos, True)
+    assert app.get_trending_topics_cached(3) == (antigos, True)
+    assert atualizou.wait(5)
+    assert calls == [3]
+    assert app.get_cached_topics(3)["topicos"] == novos
@@ -0,0 +1,116 @@
+import time
+
+import pytest
+
+import utils_tts
+from utils_governor import UpstreamGovernor
+
+
+@pytest.fixture
+def governor(monkeypatch):
+    governor = UpstreamGovernor("tts", rate=1000, max_concurrency=4, target_latency=0.2, failure_threshold=5,
+                                open_seconds=30, acquire_timeout=5)
+    monkeypatch.setattr(utils_tts, "tts_governor", governor)
+    return governor
+
+
+def fake_stream(pedacos):
+    def synthesize_speech_stream(text, voice, model_name):
+        for i in range(pedacos):
+            yield f"{text}:{i}".encode("utf-8"), "audio/L16;rate=24000"
+    return synthesize_speech_stream
+
+
+def test_cliente_lento_nao_segura_a_vaga_do_tts(monkeypatch, governor):
+    monkeypatch.setattr(utils_tts, "synthesize_speech_stream", fake_stream(3))
+    audio = utils_tts.iter_article_audio(f"Texto para o cliente lento {time.time()}.", "Zephyr")
+
+    primeiro = next(audio)
+    time.sleep(0.5)  # O cliente demora a ler o resto do áudio
+    assert governor.in_flight == 0
+    assert governor.limit == governor.max_limit  # a leitura lenta não contou como latência da Gemini
+    assert [primeiro, *audio][-1][0].endswith(b":2")
+
+
+def test_artigo_em_varios_pedacos_e_guardado_uma_vez(monkeypatch):
+    import app
+    from utils_cache_sqlite import db_connection
+
+    monkeypatch.setattr(app, "GEMINI_API_KEY_FROM_CONFIG", "chave-de-teste")
+    monkeypatch.setattr(utils_tts, "synthesize_speech_stream", fake_stream(2))
+    with db_connection() as conn:
+        antes = conn.execute("SELECT COUNT(*), COALESCE(SUM(audio_size), 0) FROM cache_tts_audio").fetchone()
+    texto = f"Primeiro parágrafo {time.time()}.\n\nSegundo parágrafo.\n\nTerceiro parágrafo."
+
+    response = app.app.test_client().post("/api/gemini-tts", json={"text": texto, "stream": False})
+    assert response.status_code == 200
+
+    with db_connection() as conn:
+        depois = conn.execute("SELECT COUNT(*), COALESCE(SUM(audio_size), 0) FROM cache_tts_audio").fetchone()
+    assert depois[0] == antes[0] + 1
+    assert depois[1] - antes[1] == len(response.data)
+
+
+def test_audio_transmitido_com_cabecalho_de_streaming_e_guardado_ao_final(monkeypatch):
+    import app
+
+    monkeypatch.setattr(app, "GEMINI_API_KEY_FROM_CONFIG", "chave-de-teste")
+    monkeypatch.setattr(utils_tts, "synthesize_speech_stream", fake_stream(3))
+    texto = f"Texto transmitido {time.time()}."
+    client = app.app.test_client()
+
+    response = client.post("/api/gemini-tts", json={"text": texto})
+    assert response.status_code == 200
+    assert response.content_length is None  # enviado à medida que chega
+    pcm = b"".join(f"{texto}:{i}".encode("utf-8") for i in range(3))
+    assert response.data == utils_tts.build_wav_header("audio/L16;rate=24000", None) + pcm
+
+    # O áudio completo foi guardado com o tamanho real no cabeçalho; o próximo pedido sai do cache
+    monkeypatch.setattr(utils_tts, "synthesize_speech_stream", None)
+    cached = client.post("/api/gemini-tts", json={"text": texto})
+    assert cached.content_length == len(cached.data)
+    assert cached.data == utils_tts.convert_to_wav(pcm, "audio/L16;rate=24000")
+
+
+def test_divisao_respeita_paragrafos_e_tamanho_maximo():
+    texto = "Frase um. Frase dois.\n\nOutro parágrafo aqui. " + "palavra " * 30
+    chunks = utils_tts.split_text_for_tts(texto, max_chars=40)
+    assert chunks[0] == "Frase um. Frase dois."
+    assert all(len(chunk) <= 40 for chunk in chunks)
+    assert " ".join(chunks) == " ".join(texto.split())
+    assert utils_tts.split_text_for_tts(" \n\n ") == []
+
+
+def test_pedacos_sintetizados_em_paralelo_e_entregues_em_ordem(monkeypatch, governor):
+    def synthesize_speech_stream(text, voice, model_name):
+        # Os primeiros pedaços demoram mais, para terminarem depois dos seguintes
+        time.sleep(0.3 if text.startswith("Parágrafo 0") else 0.1)
+        yield text.encode("utf-8"), "audio/L16;rate=24000"
+
+    monkeypatch.setattr(utils_tts, "synthesize_speech_stream", synthesize_speech_stream)
+    paragrafos = [f"Parágrafo {i} {time.time()}." for i in range(4)]
+    inicio = time.monotonic()
+    audio = [data for data, _ in utils_tts.iter_article_audio("\n\n".join(paragrafos), "Zephyr")]
+    assert audio == [p.encode("utf-8") for p in paragrafos]
+    assert time.monotonic() - inicio < 0.5  # em sequência levaria 0,6 s
+
+
+def test_chave_de_audio_por_conteudo():
+    chave = utils_tts.tts_cache_key("Mesmo  texto\nda notícia.", "Zephyr", "modelo")
+    assert chave == utils_tts.tts_cache_key("Mesmo texto da notícia.", "Zephyr", "modelo")
+    assert chave != utils_tts.tts_cache_key("Mesmo texto da notícia.", "Puck", "modelo")
+    assert chave != utils_tts.tts_cache_key("Mesmo texto da notícia.", "Zephyr", "outro-modelo")
+
+
+def test_orcamento_remove_o_audio_usado_ha_mais_tempo():
+    from utils_cache_sqlite import evict_tts_audio, get_tts_audio_info, save_tts_audio, touch_tts_audio
+
+    evict_tts_audio(0)
+    for chave in ("antigo", "usado", "novo"):
+        save_tts_audio(chave, "Zephyr", "teste", b"\x00" * 1000, "audio/wav")
+        time.sleep(0.01)
+    touch_tts_audio("antigo")
+    save_tts_audio("ultimo", "Zephyr", "teste", b"\x00" * 1000, "audio/wav", max_bytes=3000)
+
+    assert get_tts_audio_info("usado") is None
+    assert all(get_tts_audio_info(chave) for chave in ("antigo", "novo", "ultimo"))
@@ -1,49 +1,208 @@
 import time
+import uuid
+import asyncio
+import threading
 import traceback
+from contextlib import contextmanager
 from google.genai import errors as genai_errors
 from google.genai import types
 from google.adk.agents import Agent
+from google.adk.agents.run_config import RunConfig, StreamingMode
 from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
-from config import MAX_RETRIES, INITIAL_BACKOFF
+from config import MAX_RETRIES
+from utils_governor import UpstreamUnavailable, agent_governor, is_overload_error
+from utils_replay import agent_fixtures
 
-def call_agent(agent: Agent, message_text: str) -> str:
+class RunnerPool:
     """
-    Envia uma mensagem para um agente via Runner com lógica de retentativa exponencial.
+    Mantém um Runner por agente, criado uma única vez e compartilhado entre as chamadas.
+    Cada chamada recebe uma sessão nova com id único, removida ao final (evita que
+    requisições simultâneas compartilhem histórico e que as sessões se acumulem na memória).
+    Seguro para uso por várias threads.
+    """
+
+    USER_ID = "noticias"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._runners = {}
+        self.session_service = InMemorySessionService()
+
+    def get_runner(self, agent: Agent) -> Runner:
+        """Retorna o Runner do agente, criando-o na primeira chamada."""
+        # O Runner mantém uma referência ao agente, então id(agent) não é reaproveitado
+        runner = self._runners.get(id(agent))
+        if runner is None:
+            with self._lock:
+                runner = self._runners.get(id(agent))
+                if runner is None:
+                    runner = Runner(agent=agent, app_name=agent.name, session_service=self.session_service)
+                    self._runners[id(agent)] = runner
+        return runner
+
+    @contextmanager
+    def session(self, agent: Agent):
+        """Cria uma sessão descartável para uma chamada e a remove ao sair do bloco."""
+        session_id = uuid.uuid4().hex
+        # O InMemorySessionService não é thread-safe na criação/remoção de sessões
+        with self._lock:
+            self.session_service.create_session(app_name=agent.name, user_id=self.USER_ID, session_id=session_id)
+        try:
+            yield session_id
+        finally:
+            with self._lock:
+                self.session_service.delete_session(app_name=agent.name, user_id=self.USER_ID, session_id=session_id)
+
+    def active_sessions(self) -> int:
+        """Retorna quantas sessões estão abertas no momento (todas as apps e usuários)."""
+        with self._lock:
+            return sum(
+                len(sessions)
+                for users in self.session_service.sessions.values()
+                for sessions in users.values()
+            )
+
+runner_pool = RunnerPool()
+
+def _report_progress(event, on_progress, seen_queries):
+    """Repassa a on_progress as novas buscas no Google Search e os trechos de texto parciais de um evento."""
+    grounding = event.grounding_metadata
+    if grounding and grounding.web_search_queries:
+        novas = [q for q in grounding.web_search_queries if q not in seen_queries]
+        if novas:
+            seen_queries.update(novas)
+            on_progress("busca", {"consultas": novas})
+    if event.partial and event.content and event.content.parts:
+        delta = "".join(part.text for part in event.content.parts if part.text)
+        if delta:
+            on_progress("texto", {"delta": delta})
+
+def _final_text(event) -> str:
+    """
+    Texto de um evento final do agente. No modo streaming, o evento final traz o texto completo (os parciais não contam)
+    e o último pedaço recebido pode chegar como um evento final sem conteúdo.
+    """
+    if not (event.is_final_response() and event.content and event.content.parts):
+        return ""
+    return "".join(part.text + "\n" for part in event.content.parts if part.text is not None)
+
+async def _run_agent_async(runner: Runner, agent: Agent, content, run_config, on_progress) -> str:
+    """Uma tentativa de call_agent_async: roda o agente numa sessão nova e retorna o texto final."""
+    final_response = ""
+    seen_queries = set()
+    with runner_pool.session(agent) as session_id:
+        async for event in runner.run_async(user_id=RunnerPool.USER_ID, session_id=session_id, new_message=content, run_config=run_config):
+            if on_progress:
+                _report_progress(event, on_progress, seen_queries)
+            final_response += _final_text(event)
+    return final_response
+
+def _run_agent(runner: Runner, agent: Agent, content, run_config, on_progress) -> str:
+    """
+    Uma tentativa de call_agent. Roda o run_async do Runner num event loop da própria thread: o Runner.run
+    o roda numa thread auxiliar e descarta as exceções de lá (um 429 viraria uma resposta vazia, sem retentativa
+    e sem contar como falha no agent_governor).
+    """
+    return asyncio.run(_run_agent_async(runner, agent, content, run_config, on_progress))
+
+def call_agent(agent: Agent, message_text: str, on_progress=None) -> str:
+    """
+    Envia uma mensagem para um agente via Runner com lógica de retentativa exponencial (com jitter).
+    O Runner do agente é reaproveitado do pool e cada tentativa usa uma sessão nova.
+    Cada tentativa passa pelo controle de chamadas (agent_governor): a vaga só é ocupada durante a chamada,
+    não durante a espera entre tentativas, e com o circuito aberto a chamada falha na hora.
     
     Args:
         agent (Agent): Instância do agente ADK.
         message_text (str): Texto da mensagem a ser enviada ao agente.
+        on_progress (callable, opcional): Se informado, a resposta é gerada em modo streaming e
+            on_progress(tipo, dados) é chamado à medida que os eventos chegam: "busca" (consultas feitas
+            ao Google Search), "texto" (cada trecho gerado) e "reinicio" (a tentativa falhou e o texto
+            recebido até ali deve ser descartado).
     
     Returns:
         str: Resposta final do agente.
     
     Raises:
+        UpstreamUnavailable: Se o circuito estiver aberto ou não houver vaga para a chamada.
         Exception: Se exceder o número máximo de tentativas ou ocorrer erro inesperado.
     """
-    session_service = InMemorySessionService()
-    session = session_service.create_session(app_name=agent.name, user_id="user1", session_id="session1")
-    runner = Runner(agent=agent, app_name=agent.name, session_service=session_service)
+    runner = runner_pool.get_runner(agent)
     content = types.Content(role="user", parts=[types.Part(text=message_text)])
+    run_config = RunConfig(streaming_mode=StreamingMode.SSE if on_progress else StreamingMode.NONE)
 
-    final_response = ""
     retries = 0
     while retries < MAX_RETRIES:
         try:
-            for event in runner.run(user_id="user1", session_id="session1", new_message=content):
-                if event.is_final_response():
-                    for part in event.content.parts:
-                        if part.text is not None:
-                            final_response += part.text
-                            final_response += "\n"
-            return final_response
-        except genai_errors.ServerError as e:
+            with agent_governor.call():
+                # Com UPSTREAM_MODE=replay a resposta vem de uma gravação, sem chamar o Runner
+                return agent_fixtures.call(
+                    (agent.name, message_text),
+                    lambda progress: _run_agent(runner, agent, content, run_config, progress),
+                    on_progress
+                )
+        except UpstreamUnavailable as e:
+            print(f"Chamada ao agente '{agent.name}' recusada: {e}")
+            raise
+        except genai_errors.APIError as e:
+            if not is_overload_error(e):
+                print(f"Erro inesperado ao chamar o agente '{agent.name}': {e}")
+                raise
             print(f"Erro de servidor ao chamar o agente '{agent.name}': {e}")
             retries += 1
-            backoff_time = INITIAL_BACKOFF * (2 ** (retries - 1))
-            print(f"Retentando em {backoff_time} segundos...")
-            time.sleep(backoff_time)
+            if on_progress:
+                on_progress("reinicio", {})
+            if agent_governor.is_open:
+                # Não adianta esperar: o circuito abriu com esta falha
+                raise UpstreamUnavailable("agente: circuito aberto após falhas seguidas da API", agent_governor.retry_after())
+            if retries < MAX_RETRIES:
+                backoff_time = agent_governor.backoff(retries)
+                print(f"Retentando em {backoff_time:.1f} segundos...")
+                time.sleep(backoff_time)
         except Exception as e:
             print(f"Erro inesperado ao chamar o agente '{agent.name}': {e}")
             raise  # Relevanta outras exceções
-    raise Exception(f"Falha ao chamar o agente '{agent.name}' após {MAX_RETRIES} tentativas.")
\ No newline at end of file
+    raise Exception(f"Falha ao chamar o agente '{agent.name}' após {MAX_RETRIES} tentativas.")
+
+async def call_agent_async(agent: Agent, message_text: str, on_progress=None) -> str:
+    """
+    Versão de call_agent para corrotinas (modo ASGI): usa Runner.run_async no event loop do servidor,
+    sem o event loop próprio que call_agent cria a cada chamada, e espera pela vaga
+    no agent_governor e entre as tentativas sem ocupar uma thread.
+    Mesmos argumentos, retentativas e exceções de call_agent.
+    """
+    runner = runner_pool.get_runner(agent)
+    content = types.Content(role="user", parts=[types.Part(text=message_text)])
+    run_config = RunConfig(streaming_mode=StreamingMode.SSE if on_progress else StreamingMode.NONE)
+
+    retries = 0
+    while retries < MAX_RETRIES:
+        try:
+            async with agent_governor.call_async():
+                return await agent_fixtures.call_async(
+                    (agent.name, message_text),
+                    lambda progress: _run_agent_async(runner, agent, content, run_config, progress),
+                    on_progress
+                )
+        except UpstreamUnavailable as e:
+            print(f"Chamada ao agente '{agent.name}' recusada: {e}")
+            raise
+        except genai_errors.APIError as e:
+            if not is_overload_error(e):
+                print(f"Erro inesperado ao chamar o agente '{agent.name}': {e}")
+                raise
+            print(f"Erro de servidor ao chamar o agente '{agent.name}': {e}")
+            retries += 1
+            if on_progress:
+                on_progress("reinicio", {})
+            if agent_governor.is_open:
+                raise UpstreamUnavailable("agente: circuito aberto após falhas seguidas da API", agent_governor.retry_after())
+            if retries < MAX_RETRIES:
+                backoff_time = agent_governor.backoff(retries)
+                print(f"Retentando em {backoff_time:.1f} segundos...")
+                await asyncio.sleep(backoff_time)
+        except Exception as e:
+            print(f"Erro inesperado ao chamar o agente '{agent.name}': {e}")
+            raise
+    raise Exception(f"Falha ao chamar o agente '{agent.name}' após {MAX_RETRIES} tentativas.")
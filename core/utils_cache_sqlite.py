@@ -1,130 +1,1139 @@
 import sqlite3
 import json
+import time
+import uuid
+import base64
+import hashlib
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 
+from utils_lru import ByteLRUCache
+
 DB_PATH = "cache.db"
+AUDIO_STREAM_CHUNK_SIZE = 64 * 1024  # bytes lidos do BLOB por iteração ao servir áudio
+
+# --- Pool de Conexões ---
+# Conexões longas reaproveitam o cache de páginas e os statements já preparados entre requisições.
+DB_POOL_MAX_IDLE = 16        # conexões livres mantidas abertas (as excedentes são fechadas ao devolver)
+DB_CACHED_STATEMENTS = 256   # statements preparados mantidos por conexão
+DB_BUSY_TIMEOUT = 10         # segundos esperando o lock de escrita de outra conexão
+DB_CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",   # seguro com WAL: só os checkpoints fazem fsync
+    "PRAGMA cache_size = -32000",    # ~32 MiB de cache de páginas por conexão
+    "PRAGMA mmap_size = 268435456",  # leituras via mmap (até 256 MiB), sem cópia para o cache de páginas
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA recursive_triggers = ON",  # o REPLACE só dispara os gatilhos de DELETE com esta opção
+)
+_pool_lock = threading.Lock()
+_idle_connections = {}  # DB_PATH -> conexões livres
+
+# --- Cache em Memória das Notícias ---
+# Guarda o resultado já decodificado das leituras de notícias (get_cached_news, get_latest_news_by_title,
+# get_news_history). Toda gravação que muda esses resultados incrementa o contador 'cache_geracao' no banco;
+# cada processo relê o contador no máximo a cada NEWS_GENERATION_CHECK_INTERVAL segundos e descarta
+# o cache quando ele muda (as gravações do próprio processo invalidam na hora).
+NEWS_MEMORY_CACHE_MAX_BYTES = 32 * 1024 * 1024
+NEWS_GENERATION_CHECK_INTERVAL = 1.0  # segundos
+NEWS_ENTRY_OVERHEAD = 512  # bytes estimados por notícia, além do JSON, para os dicionários em memória
+news_memory_cache = ByteLRUCache(NEWS_MEMORY_CACHE_MAX_BYTES)
+_generation_checked_at = 0.0
 
 def init_cache_db():
     """
     Inicializa o banco de dados SQLite para cache de notícias.
-    Cria a tabela 'cache_noticias' se não existir, incluindo colunas para dados de áudio e tipo MIME.
+    Cria a tabela 'cache_noticias' (metadados e texto), o cache de áudio endereçado por conteúdo
+    'cache_tts_audio' e a tabela 'cache_audio' que liga cada notícia ao seu áudio, se não existirem,
+    migrando bancos antigos que guardavam o áudio junto da notícia.
     """
-    conn = sqlite3.connect(DB_PATH)
+    with db_connection() as conn:
+        _create_schema(conn)
+    with db_connection() as conn:
+        # O espaço liberado pela limpeza do cache é devolvido aos poucos (PRAGMA incremental_vacuum);
+        # bancos criados antes disso precisam de um VACUUM completo, uma única vez, para ativar o modo.
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            print("Convertendo cache.db para auto_vacuum incremental (VACUUM único)...")
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            # O VACUUM pode renumerar os rowids de cache_noticias: o índice de títulos é refeito com os novos
+            conn.execute("DELETE FROM noticias_titulo_fts")
+            conn.execute("""
+                INSERT INTO noticias_titulo_fts (rowid, titulo)
+                SELECT rowid, COALESCE(json_extract(noticia, '$.titulo'), '') FROM cache_noticias
+            """)
+
+def _create_schema(conn):
+    # Precisa vir antes de qualquer escrita para valer num banco novo (os antigos são convertidos em init_cache_db)
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    # WAL: leitores não esperam a gravação de um áudio grande, e vice-versa (persistente no arquivo)
+    conn.execute("PRAGMA journal_mode = WAL")
     c = conn.cursor()
-    # Adicionando a coluna 'audio_data' para armazenar o áudio em BLOB
-    # e 'audio_mime_type' para o tipo MIME do áudio.
     c.execute("""
         CREATE TABLE IF NOT EXISTS cache_noticias (
             topico TEXT NOT NULL,
             categoria TEXT NOT NULL,
             noticia TEXT NOT NULL,
-            audio_data BLOB,           -- Nova coluna para dados de áudio
-            audio_mime_type TEXT,      -- Nova coluna para tipo MIME do áudio
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             PRIMARY KEY (topico, categoria)
         );
     """)
-    conn.commit()
+    # Áudio sintetizado, endereçado por conteúdo: a chave é o hash do texto normalizado, da voz e do modelo.
+    # Guarda o WAV completo de cada texto (os pedaços da síntese paralela não são guardados à parte);
+    # 'last_used_at' ordena a remoção (LRU) quando o cache passa do orçamento de bytes.
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS cache_tts_audio (
+            chave TEXT PRIMARY KEY,
+            voice TEXT NOT NULL,
+            model TEXT NOT NULL,
+            audio_data BLOB NOT NULL,
+            audio_mime_type TEXT,
+            audio_size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            last_used_at REAL NOT NULL
+        );
+    """)
+    colunas_tts = [row[1] for row in c.execute("PRAGMA table_info(cache_tts_audio)")]
+    if "last_used_at" not in colunas_tts:
+        c.execute("ALTER TABLE cache_tts_audio ADD COLUMN last_used_at REAL NOT NULL DEFAULT 0")
+        c.execute("UPDATE cache_tts_audio SET last_used_at = created_at")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_cache_tts_audio_last_used ON cache_tts_audio (last_used_at)")
+    # Usado pelo histórico e pela expiração das notícias mais antigas
+    c.execute("CREATE INDEX IF NOT EXISTS idx_cache_noticias_created_at ON cache_noticias (created_at)")
+    # Histórico filtrado por categoria: as páginas saem direto do índice (o rowid, que desempata, vem junto)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_cache_noticias_categoria ON cache_noticias (categoria, created_at)")
+    # Quantas notícias há em cada categoria, mantido por gatilhos para que a lista de categorias não leia a tabela
+    categorias_exists = c.execute("SELECT 1 FROM sqlite_master WHERE name = 'cache_categorias'").fetchone()
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS cache_categorias (
+            categoria TEXT PRIMARY KEY,
+            total INTEGER NOT NULL
+        );
+    """)
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_cache_categorias_insert AFTER INSERT ON cache_noticias BEGIN
+            INSERT INTO cache_categorias (categoria, total) VALUES (new.categoria, 1)
+            ON CONFLICT(categoria) DO UPDATE SET total = total + 1;
+        END;
+    """)
+    c.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_cache_categorias_delete AFTER DELETE ON cache_noticias BEGIN
+            UPDATE cache_categorias SET total = total - 1 WHERE categoria = old.categoria;
+            DELETE FROM cache_categorias WHERE categoria = old.categoria AND total <= 0;
+        END;
+    """)
+    if not categorias_exists:
+        # Migração: conta as notícias já existentes no cache
+        c.execute("INSERT INTO cache_categorias (categoria, total) SELECT categoria, COUNT(*) FROM cache_noticias GROUP BY categoria")
+    # Origem da notícia ('sob_demanda' ou 'prefetch', pré-gerada a partir dos tópicos em alta) e quantas vezes
+    # ela foi servida do cache, para medir quanto da pré-geração é de fato aproveitado
+    colunas_noticias = [row[1] for row in c.execute("PRAGMA table_info(cache_noticias)")]
+    if "origem" not in colunas_noticias:
+        c.execute("ALTER TABLE cache_noticias ADD COLUMN origem TEXT NOT NULL DEFAULT 'sob_demanda'")
+    if "acessos" not in colunas_noticias:
+        c.execute("ALTER TABLE cache_noticias ADD COLUMN acessos INTEGER NOT NULL DEFAULT 0")
+    # Versão de cada gravação: a geração do cache no momento em que a notícia foi gravada. Ao contrário do rowid,
+    # que o SQLite reaproveita quando a linha de maior rowid é removida, nunca se repete (ETags, índice de tópicos).
+    if "versao" not in colunas_noticias:
+        c.execute("ALTER TABLE cache_noticias ADD COLUMN versao INTEGER NOT NULL DEFAULT 0")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_cache_noticias_versao ON cache_noticias (versao)")
+
+    # O áudio de cada notícia é só uma referência ao cache de TTS, para que consultas de metadados
+    # (histórico, busca por título) nunca leiam os BLOBs e o mesmo áudio não seja guardado duas vezes.
+    colunas_audio = [row[1] for row in c.execute("PRAGMA table_info(cache_audio)")]
+    if "audio_data" in colunas_audio:
+        c.execute("ALTER TABLE cache_audio RENAME TO cache_audio_legado")
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS cache_audio (
+            topico TEXT NOT NULL,
+            categoria TEXT NOT NULL,
+            chave TEXT NOT NULL,
+            PRIMARY KEY (topico, categoria)
+        );
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_cache_audio_chave ON cache_audio (chave)")
+    if "audio_data" in colunas_audio:
+        # Migração: áudios guardados por (topico, categoria) passam para o cache endereçado por conteúdo
+        print("Migrando áudios de cache_audio para cache_tts_audio...")
+        _migrate_legacy_audio(conn, "cache_audio_legado")
+        c.execute("DROP TABLE cache_audio_legado")
+    colunas = [row[1] for row in c.execute("PRAGMA table_info(cache_noticias)")]
+    if "audio_data" in colunas:
+        # Migração: move o áudio das linhas antigas de cache_noticias para o cache de TTS
+        print("Migrando áudios de cache_noticias para cache_tts_audio...")
+        _migrate_legacy_audio(conn, "cache_noticias")
+        c.execute("ALTER TABLE cache_noticias DROP COLUMN audio_data")
+        c.execute("ALTER TABLE cache_noticias DROP COLUMN audio_mime_type")
+    # Índice full-text dos títulos (sem acentos), com rowid igual ao rowid de cache_noticias.
+    # Como REPLACE sempre gera um rowid novo e maior, ordenar por rowid equivale a ordenar por recência.
+    fts_exists = c.execute("SELECT 1 FROM sqlite_master WHERE name = 'noticias_titulo_fts'").fetchone()
+    c.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS noticias_titulo_fts USING fts5(
+            titulo,
+            tokenize = 'unicode61 remove_diacritics 2'
+        );
+    """)
+    if not fts_exists:
+        # Migração: indexa as notícias já existentes no cache
+        c.execute("""
+            INSERT INTO noticias_titulo_fts (rowid, titulo)
+            SELECT rowid, COALESCE(json_extract(noticia, '$.titulo'), '') FROM cache_noticias
+        """)
+    # Cache dos tópicos em alta, uma linha por 'limite' pedido ao agente.
+    # 'updated_at' guarda o epoch (segundos) para o controle de TTL.
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS cache_topicos (
+            limite INTEGER PRIMARY KEY,
+            topicos TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        );
+    """)
+    # Contador de gerações das notícias: incrementado a cada gravação que muda o resultado das leituras,
+    # para que os caches em memória de todos os processos percebam a mudança com uma consulta barata.
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS cache_geracao (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            geracao INTEGER NOT NULL
+        );
+    """)
+    c.execute("INSERT OR IGNORE INTO cache_geracao (id, geracao) VALUES (1, 0)")
+    if "versao" not in colunas_noticias:
+        # Migração: as notícias já existentes recebem versões distintas e a geração passa de todas elas
+        c.execute("UPDATE cache_noticias SET versao = rowid")
+        c.execute("UPDATE cache_geracao SET geracao = MAX(geracao, (SELECT COALESCE(MAX(versao), 0) FROM cache_noticias)) WHERE id = 1")
+    # Fila de geração de notícias: sobrevive a reinícios e é compartilhada entre processos.
+    # Um job em 'processando' tem um lease; se o processo morrer, o job volta para 'pendente' quando ele vence.
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS news_jobs (
+            id TEXT PRIMARY KEY,
+            topico TEXT NOT NULL,
+            categoria TEXT NOT NULL,
+            status TEXT NOT NULL,
+            erro TEXT,
+            owner TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            lease_expires_at REAL,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL
+        );
+    """)
+    colunas_jobs = [row[1] for row in c.execute("PRAGMA table_info(news_jobs)")]
+    if "origem" not in colunas_jobs:
+        c.execute("ALTER TABLE news_jobs ADD COLUMN origem TEXT NOT NULL DEFAULT 'sob_demanda'")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_news_jobs_status ON news_jobs (status, created_at)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_news_jobs_topico ON news_jobs (topico, categoria)")
+    # Leases de geração: garantem que só um processo gera a notícia de um (topico, categoria) por vez.
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS generation_leases (
+            topico TEXT NOT NULL,
+            categoria TEXT NOT NULL,
+            owner TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            PRIMARY KEY (topico, categoria)
+        );
+    """)
+    # Tokens (estimados) gastos pela pré-geração em cada dia UTC, para o orçamento diário
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS prefetch_orcamento (
+            dia TEXT PRIMARY KEY,
+            tokens INTEGER NOT NULL DEFAULT 0,
+            geracoes INTEGER NOT NULL DEFAULT 0
+        );
+    """)
+
+def _migrate_legacy_audio(conn, tabela):
+    """
+    Copia os áudios de 'tabela' (colunas topico, categoria, audio_data, audio_mime_type) para o
+    cache de TTS, com chave 'legado:<sha256 dos bytes>' (texto e voz originais são desconhecidos),
+    e liga cada notícia ao seu áudio em 'cache_audio'.
+    """
+    conn.create_function("sha256_hex", 1, lambda data: hashlib.sha256(data).hexdigest(), deterministic=True)
+    agora = time.time()
+    conn.execute(f"""
+        INSERT OR IGNORE INTO cache_tts_audio (chave, voice, model, audio_data, audio_mime_type, audio_size, created_at, last_used_at)
+        SELECT 'legado:' || sha256_hex(audio_data), '', '', audio_data, audio_mime_type, length(audio_data), ?, ?
+        FROM {tabela} WHERE audio_data IS NOT NULL
+    """, (agora, agora))
+    conn.execute(f"""
+        INSERT OR REPLACE INTO cache_audio (topico, categoria, chave)
+        SELECT topico, categoria, 'legado:' || sha256_hex(audio_data)
+        FROM {tabela} WHERE audio_data IS NOT NULL
+    """)
+
+def _new_connection(db_path):
+    """
+    Abre uma conexão configurada para o pool: acesso às colunas por nome, cache de statements
+    preparados e os PRAGMAs de desempenho (que valem por conexão).
+    """
+    conn = sqlite3.connect(db_path, timeout=DB_BUSY_TIMEOUT, check_same_thread=False, cached_statements=DB_CACHED_STATEMENTS)
+    conn.row_factory = sqlite3.Row
+    for pragma in DB_CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+@contextmanager
+def db_connection():
+    """
+    Empresta uma conexão persistente do pool (criando uma nova se não houver livre) e a devolve ao sair.
+    Ao sair sem erro, uma transação aberta é confirmada; com erro, é desfeita, para a conexão
+    voltar ao pool sem transação pendente. As conexões podem ser usadas por qualquer thread,
+    mas só por uma de cada vez.
+    """
+    db_path = DB_PATH
+    conn = None
+    with _pool_lock:
+        idle = _idle_connections.get(db_path)
+        if idle:
+            conn = idle.pop()
+    if conn is None:
+        conn = _new_connection(db_path)
+
+    try:
+        yield conn
+        if conn.in_transaction:
+            conn.commit()
+    except BaseException:
+        try:
+            conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            raise
+        _release_connection(db_path, conn)
+        raise
+    _release_connection(db_path, conn)
+
+def _release_connection(db_path, conn):
+    with _pool_lock:
+        idle = _idle_connections.setdefault(db_path, [])
+        if len(idle) < DB_POOL_MAX_IDLE:
+            idle.append(conn)
+            return
     conn.close()
 
 def get_db_connection():
     """
-    Cria e retorna uma conexão com o banco de dados SQLite.
+    Cria e retorna uma conexão avulsa com o banco de dados SQLite (fora do pool), com a mesma configuração.
     Define o row_factory para sqlite3.Row para acesso por nome às colunas.
+    Quem a usa é responsável por fechá-la; prefira db_connection().
     """
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return _new_connection(DB_PATH)
+
+def configure_news_memory_cache(max_bytes, check_interval=None):
+    """
+    Ajusta o limite em bytes do cache em memória das notícias (0 desativa) e, opcionalmente,
+    o intervalo entre as leituras do contador de gerações.
+    """
+    global NEWS_GENERATION_CHECK_INTERVAL
+    news_memory_cache.resize(max_bytes)
+    if check_interval is not None:
+        NEWS_GENERATION_CHECK_INTERVAL = check_interval
+
+def _current_news_generation():
+    """
+    Retorna a geração com que uma leitura do banco deve ser guardada no cache em memória,
+    relendo o contador do banco (e descartando o cache, se ele mudou) quando o intervalo venceu.
+    """
+    global _generation_checked_at
+    now = time.monotonic()
+    if news_memory_cache.generation is None or now - _generation_checked_at >= NEWS_GENERATION_CHECK_INTERVAL:
+        with db_connection() as conn:
+            row = conn.execute("SELECT geracao FROM cache_geracao WHERE id = 1").fetchone()
+        news_memory_cache.set_generation(row[0] if row else 0)
+        _generation_checked_at = now
+    return news_memory_cache.generation
+
+def get_news_generation():
+    """
+    Versão atual do conteúdo das notícias (muda a cada gravação ou remoção no cache, em qualquer processo,
+    e é percebida em até NEWS_GENERATION_CHECK_INTERVAL). Serve para validar respostas derivadas de várias notícias.
+    """
+    return _current_news_generation()
+
+def _bump_news_generation(cur):
+    """
+    Incrementa o contador de gerações dentro da transação de uma gravação.
+    Retorna a nova geração, que deve ser aplicada ao cache em memória após o commit.
+    """
+    cur.execute("UPDATE cache_geracao SET geracao = geracao + 1 WHERE id = 1")
+    return cur.execute("SELECT geracao FROM cache_geracao WHERE id = 1").fetchone()[0]
+
+def get_news_memory_cache_stats():
+    """
+    Retorna os contadores do cache em memória das notícias (acertos, faltas, taxa de acerto,
+    remoções por falta de espaço e invalidações).
+    """
+    return news_memory_cache.stats()
 
 def get_cached_news(topico, categoria):
     """
     Recupera uma notícia do cache com base no tópico e categoria.
-    Retorna um dicionário com a notícia, dados de áudio e tipo MIME, ou None se não encontrado.
+    Retorna um dicionário com a notícia (decodificada em 'noticia' e como bytes do JSON pronto para envio em 'noticia_json'),
+    o tamanho e tipo MIME do áudio (sem os bytes), o rowid, a versão (que muda a cada regravação) e a data de criação,
+    ou None se não encontrado.
+    O dicionário pode vir do cache em memória e é compartilhado: não deve ser modificado.
     """
-    conn = get_db_connection()
-    cur = conn.cursor()
-    # Seleciona também os dados de áudio e tipo MIME
-    cur.execute("SELECT noticia, audio_data, audio_mime_type FROM cache_noticias WHERE topico = ? AND categoria = ?", (topico, categoria))
-    row = cur.fetchone()
-    conn.close()
+    key = ("noticia", topico, categoria)
+    generation = _current_news_generation()
+    cached = news_memory_cache.get(key)
+    if cached is not None:
+        return cached
+
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """SELECT n.rowid, n.versao, n.noticia, t.audio_size, t.audio_mime_type, n.created_at
+               FROM cache_noticias n
+               LEFT JOIN cache_audio a ON a.topico = n.topico AND a.categoria = n.categoria
+               LEFT JOIN cache_tts_audio t ON t.chave = a.chave
+               WHERE n.topico = ? AND n.categoria = ?""",
+            (topico, categoria)
+        )
+        row = cur.fetchone()
     if row:
-        return {
+        result = {
             "noticia": json.loads(row["noticia"]),
-            "audio_data": row["audio_data"],
-            "audio_mime_type": row["audio_mime_type"]
+            "noticia_json": row["noticia"].encode("utf-8"),
+            "audio_available": row["audio_size"] is not None,
+            "audio_size": row["audio_size"],
+            "audio_mime_type": row["audio_mime_type"],
+            "rowid": row["rowid"],
+            "versao": row["versao"],
+            "created_at": row["created_at"]
         }
+        news_memory_cache.put(key, result, _news_entry_size(row), generation)
+        return result
     return None
 
-def save_news_to_cache(topico, categoria, noticia_dict, audio_data=None, audio_mime_type=None):
+def get_cached_audio_info(topico, categoria):
     """
-    Salva ou atualiza uma notícia no cache.
-    Armazena o dicionário da notícia, dados de áudio (opcional) e tipo MIME (opcional).
+    Recupera os metadados do áudio ligado a uma notícia (chave, rowid, tamanho e tipo MIME), sem ler os bytes.
+    Retorna um dicionário ou None se não houver áudio.
     """
-    conn = get_db_connection()
-    cur = conn.cursor()
-    # Insere ou substitui a notícia, incluindo os dados de áudio e tipo MIME
-    cur.execute(
-        "REPLACE INTO cache_noticias (topico, categoria, noticia, audio_data, audio_mime_type) VALUES (?, ?, ?, ?, ?)",
-        (topico, categoria, json.dumps(noticia_dict), audio_data, audio_mime_type)
-    )
-    conn.commit()
-    conn.close()
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """SELECT t.chave, t.rowid, t.audio_size, t.audio_mime_type
+               FROM cache_audio a JOIN cache_tts_audio t ON t.chave = a.chave
+               WHERE a.topico = ? AND a.categoria = ?""",
+            (topico, categoria)
+        )
+        row = cur.fetchone()
+    return dict(row) if row else None
+
+def get_tts_audio_info(chave):
+    """
+    Recupera os metadados de um áudio do cache de TTS (chave, rowid, tamanho e tipo MIME), sem ler os bytes.
+    Retorna um dicionário ou None se a chave não estiver no cache.
+    """
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT chave, rowid, audio_size, audio_mime_type FROM cache_tts_audio WHERE chave = ?",
+            (chave,)
+        )
+        row = cur.fetchone()
+    return dict(row) if row else None
+
+def link_news_audio(topico, categoria, chave):
+    """
+    Liga uma notícia a um áudio do cache de TTS (substituindo a ligação anterior).
+    A geração do cache só muda se a ligação mudou: religar o mesmo áudio (ex: a cada acerto do cache de TTS)
+    não invalida os caches em memória nem os ETags do histórico.
+    Retorna False se a notícia não existir no cache; o áudio continua no cache de TTS.
+    """
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """INSERT INTO cache_audio (topico, categoria, chave)
+               SELECT topico, categoria, ? FROM cache_noticias WHERE topico = ? AND categoria = ?
+               ON CONFLICT (topico, categoria) DO UPDATE SET chave = excluded.chave WHERE chave IS NOT excluded.chave""",
+            (chave, topico, categoria)
+        )
+        changed = cur.rowcount == 1
+        if changed:
+            generation = _bump_news_generation(cur)
+        else:
+            linked = cur.execute(
+                "SELECT 1 FROM cache_audio WHERE topico = ? AND categoria = ? AND chave = ?",
+                (topico, categoria, chave)
+            ).fetchone() is not None
+    if changed:
+        news_memory_cache.set_generation(generation)
+        return True
+    return linked
+
+def touch_tts_audio(chave):
+    """
+    Marca um áudio do cache de TTS como usado agora (posição na fila de remoção LRU).
+    """
+    with db_connection() as conn:
+        conn.execute("UPDATE cache_tts_audio SET last_used_at = ? WHERE chave = ?", (time.time(), chave))
+
+def iter_cached_audio(rowid, start=0, end=None, chunk_size=AUDIO_STREAM_CHUNK_SIZE):
+    """
+    Gerador que lê o intervalo [start, end) de um BLOB do cache de TTS em pedaços, via leitura incremental
+    (blobopen), para que a memória por requisição seja constante qualquer que seja o tamanho do áudio.
+    A conexão é retirada do pool na primeira iteração e devolvida ao final (ou quando o gerador é fechado).
+    Esta é a única função que lê os bytes do áudio completo das notícias.
+    """
+    with db_connection() as conn:
+        with conn.blobopen("cache_tts_audio", "audio_data", rowid, readonly=True) as blob:
+            if end is None:
+                end = len(blob)
+            blob.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                data = blob.read(min(chunk_size, remaining))
+                if not data:
+                    break
+                remaining -= len(data)
+                yield data
+
+def save_news_to_cache(topico, categoria, noticia_dict, origem="sob_demanda"):
+    """
+    Salva ou atualiza uma notícia no cache, com a origem 'sob_demanda' ou 'prefetch' (pré-geração).
+    Remove a ligação com o áudio anterior, que corresponderia ao texto antigo
+    (o áudio em si continua no cache de TTS).
+    """
+    with db_connection() as conn:
+        cur = conn.cursor()
+        # Remove a entrada antiga do índice de títulos (o REPLACE abaixo gera um rowid novo)
+        cur.execute(
+            "DELETE FROM noticias_titulo_fts WHERE rowid IN (SELECT rowid FROM cache_noticias WHERE topico = ? AND categoria = ?)",
+            (topico, categoria)
+        )
+        generation = _bump_news_generation(cur)
+        # Insere ou substitui a notícia, com a nova geração como versão
+        cur.execute(
+            "REPLACE INTO cache_noticias (topico, categoria, noticia, origem, versao) VALUES (?, ?, ?, ?, ?)",
+            (topico, categoria, json.dumps(noticia_dict), origem, generation)
+        )
+        cur.execute(
+            "INSERT INTO noticias_titulo_fts (rowid, titulo) VALUES (?, ?)",
+            (cur.lastrowid, noticia_dict.get("titulo") or "")
+        )
+        cur.execute("DELETE FROM cache_audio WHERE topico = ? AND categoria = ?", (topico, categoria))
+    news_memory_cache.set_generation(generation)
+
+def record_news_hit(topico, categoria):
+    """
+    Conta um acesso à notícia servida do cache. Não muda o resultado das leituras,
+    então não invalida o cache em memória.
+    """
+    with db_connection() as conn:
+        conn.execute(
+            "UPDATE cache_noticias SET acessos = acessos + 1 WHERE topico = ? AND categoria = ?",
+            (topico, categoria)
+        )
+
+def get_news_origin_stats():
+    """
+    Retorna, por origem ('sob_demanda', 'prefetch'), quantas notícias estão no cache,
+    quantas foram servidas do cache ao menos uma vez e o total de acessos.
+    """
+    with db_connection() as conn:
+        rows = conn.execute(
+            """SELECT origem, COUNT(*) AS noticias, SUM(acessos > 0) AS acessadas, SUM(acessos) AS acessos
+               FROM cache_noticias GROUP BY origem"""
+        ).fetchall()
+    return {
+        row["origem"]: {"news_rows": row["noticias"], "hit_rows": row["acessadas"], "hits": row["acessos"]}
+        for row in rows
+    }
+
+def build_title_match_query(title_part):
+    """
+    Converte o texto buscado numa consulta FTS5: uma frase com os termos em sequência,
+    com o último termo como prefixo (ex: 'eleições pres' -> "eleições pres"*).
+    A remoção de acentos fica a cargo do tokenizer do índice.
+    Retorna None se o texto não tiver nenhum termo pesquisável.
+    """
+    termo = " ".join(title_part.replace('"', " ").split())
+    if not any(ch.isalnum() for ch in termo):
+        return None
+    return f'"{termo}"*'
 
 def get_latest_news_by_title(title_part, limit=1):
     """
     Busca as notícias mais recentes cujo título contenha o texto especificado.
-    Retorna uma lista de dicionários com informações da notícia, áudio, tipo MIME e data de criação.
-    """
-    conn = get_db_connection()
-    cur = conn.cursor()
-    # Busca notícias que contenham 'title_part' no título, ordenadas pela mais recente
-    # Adicionamos 'audio_data' e 'audio_mime_type' na seleção
-    cur.execute(
-        "SELECT topico, categoria, noticia, audio_data, audio_mime_type, created_at FROM cache_noticias WHERE noticia LIKE ? ORDER BY created_at DESC LIMIT ?",
-        (f"%{title_part}%", limit)
-    )
-    rows = cur.fetchall()
-    conn.close()
+    Usa o índice full-text 'noticias_titulo_fts' (sem diferenciar acentos ou maiúsculas),
+    então só o título é considerado e o LIMIT se aplica apenas a títulos que casam.
+    Retorna uma lista de dicionários com informações da notícia (incluindo o JSON pronto em 'noticia_json'),
+    tamanho e tipo MIME do áudio, rowid, versão e data de criação.
+    A lista pode vir do cache em memória e é compartilhada: não deve ser modificada.
+    """
+    match_query = build_title_match_query(title_part)
+    if match_query is None:
+        return []
+
+    key = ("titulo", match_query, limit)
+    generation = _current_news_generation()
+    cached = news_memory_cache.get(key)
+    if cached is not None:
+        return cached
+
+    with db_connection() as conn:
+        cur = conn.cursor()
+        # O rowid cresce a cada gravação, então ORDER BY rowid DESC devolve as mais recentes
+        # direto do índice, sem ordenar todas as ocorrências
+        cur.execute(
+            """SELECT c.rowid, c.versao, c.topico, c.categoria, c.noticia, t.audio_size, t.audio_mime_type, c.created_at
+               FROM noticias_titulo_fts f JOIN cache_noticias c ON c.rowid = f.rowid
+               LEFT JOIN cache_audio a ON a.topico = c.topico AND a.categoria = c.categoria
+               LEFT JOIN cache_tts_audio t ON t.chave = a.chave
+               WHERE noticias_titulo_fts MATCH ?
+               ORDER BY f.rowid DESC LIMIT ?""",
+            (match_query, limit)
+        )
+        rows = cur.fetchall()
     
     results = []
     for row in rows:
-        news_data = json.loads(row["noticia"])
-        # Verifica se o 'titulo' está na notícia para o filtro 'LIKE'
-        if title_part.lower() in news_data.get('titulo', '').lower():
-            results.append({
-                "topico": row["topico"],
-                "categoria": row["categoria"],
-                "noticia": news_data,
-                "audio_data": row["audio_data"],
-                "audio_mime_type": row["audio_mime_type"],
-                "created_at": row["created_at"]
-            })
+        results.append({
+            "topico": row["topico"],
+            "categoria": row["categoria"],
+            "noticia": json.loads(row["noticia"]),
+            "noticia_json": row["noticia"].encode("utf-8"),
+            "audio_available": row["audio_size"] is not None,
+            "audio_size": row["audio_size"],
+            "audio_mime_type": row["audio_mime_type"],
+            "rowid": row["rowid"],
+            "versao": row["versao"],
+            "created_at": row["created_at"]
+        })
+    _remember_news_list(key, results, rows, generation)
     return results
 
-def get_news_history(limit=10):
+def encode_news_cursor(created_at, rowid):
+    """Cursor opaco da paginação do histórico: a posição (created_at, rowid) do último item da página."""
+    return base64.urlsafe_b64encode(f"{created_at}|{rowid}".encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_news_cursor(cursor):
+    """Retorna (created_at, rowid) de um cursor de encode_news_cursor. Levanta ValueError se for inválido."""
+    try:
+        created_at, _, rowid = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8").rpartition("|")
+        return created_at, int(rowid)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("cursor inválido") from e
+
+def get_news_page(limit=10, categoria=None, cursor=None):
     """
-    Retorna o histórico das notícias mais recentes do cache, limitado pelo parâmetro.
-    Cada item inclui dados da notícia, áudio, tipo MIME e data de criação.
+    Retorna uma página do histórico de notícias, da mais recente para a mais antiga, opcionalmente
+    só de uma categoria, começando depois de 'cursor' (o 'next_cursor' da página anterior).
+    A paginação é por posição (keyset) sobre os índices (created_at) e (categoria, created_at),
+    então qualquer página custa o mesmo que a primeira, não importa o tamanho do arquivo.
+    Retorna (itens, next_cursor); next_cursor é None na última página.
+    Cada item inclui dados da notícia (incluindo o JSON pronto em 'noticia_json'), tamanho e tipo MIME do áudio e data de criação.
+    A lista pode vir do cache em memória e é compartilhada: não deve ser modificada.
+    Levanta ValueError se o cursor for inválido.
     """
-    conn = get_db_connection()
-    cur = conn.cursor()
-    # Busca todas as notícias, ordenadas pela mais recente, com limite
-    cur.execute(
-        "SELECT topico, categoria, noticia, audio_data, audio_mime_type, created_at FROM cache_noticias ORDER BY created_at DESC LIMIT ?",
-        (limit,)
-    )
-    rows = cur.fetchall()
-    conn.close()
-    
+    position = decode_news_cursor(cursor) if cursor else None
+    key = ("historico", categoria, position, limit)
+    generation = _current_news_generation()
+    cached = news_memory_cache.get(key)
+    if cached is not None:
+        return cached
+
+    where, params = [], []
+    if categoria is not None:
+        where.append("n.categoria = ?")
+        params.append(categoria)
+    if position is not None:
+        where.append("(n.created_at, n.rowid) < (?, ?)")
+        params.extend(position)
+    with db_connection() as conn:
+        cur = conn.cursor()
+        # Uma linha a mais indica se existe a próxima página
+        cur.execute(
+            f"""SELECT n.rowid, n.topico, n.categoria, n.noticia, t.audio_size, t.audio_mime_type, n.created_at
+               FROM cache_noticias n
+               LEFT JOIN cache_audio a ON a.topico = n.topico AND a.categoria = n.categoria
+               LEFT JOIN cache_tts_audio t ON t.chave = a.chave
+               {"WHERE " + " AND ".join(where) if where else ""}
+               ORDER BY n.created_at DESC, n.rowid DESC LIMIT ?""",
+            (*params, limit + 1)
+        )
+        rows = cur.fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_news_cursor(rows[-1]["created_at"], rows[-1]["rowid"])
     results = []
     for row in rows:
-        news_data = json.loads(row["noticia"])
         results.append({
             "topico": row["topico"],
             "categoria": row["categoria"],
-            "noticia": news_data,
-            "audio_data": row["audio_data"],
+            "noticia": json.loads(row["noticia"]),
+            "noticia_json": row["noticia"].encode("utf-8"),
+            "audio_available": row["audio_size"] is not None,
+            "audio_size": row["audio_size"],
             "audio_mime_type": row["audio_mime_type"],
             "created_at": row["created_at"]
         })
-    return results
\ No newline at end of file
+    page = (results, next_cursor)
+    if results:
+        news_memory_cache.put(key, page, sum(_news_entry_size(row) for row in rows), generation)
+    return page
+
+def get_news_history(limit=10):
+    """
+    Retorna o histórico das notícias mais recentes do cache, limitado pelo parâmetro (a primeira página de get_news_page).
+    A lista pode vir do cache em memória e é compartilhada: não deve ser modificada.
+    """
+    return get_news_page(limit)[0]
+
+def get_news_categories():
+    """
+    Retorna as categorias com notícias no cache e quantas notícias cada uma tem, da maior para a menor,
+    a partir da tabela de contagens (sem ler as notícias).
+    """
+    with db_connection() as conn:
+        rows = conn.execute("SELECT categoria, total FROM cache_categorias ORDER BY total DESC, categoria").fetchall()
+    return [(row["categoria"], row["total"]) for row in rows]
+
+def get_news_topics_since(versao):
+    """
+    Retorna (versao, topico, categoria, titulo) das notícias gravadas depois da versão informada, em ordem de versão.
+    Como cada gravação recebe uma versão maior (que, ao contrário do rowid, nunca é reaproveitada),
+    serve para acompanhar as notícias novas sem reler o cache inteiro.
+    """
+    with db_connection() as conn:
+        rows = conn.execute(
+            """SELECT versao, topico, categoria, COALESCE(json_extract(noticia, '$.titulo'), '') AS titulo
+               FROM cache_noticias WHERE versao > ? ORDER BY versao""",
+            (versao,)
+        ).fetchall()
+    return [(row["versao"], row["topico"], row["categoria"], row["titulo"]) for row in rows]
+
+def _news_entry_size(row):
+    # A notícia fica em memória duas vezes: decodificada e como o JSON pronto para envio
+    return 2 * len(row["noticia"]) + NEWS_ENTRY_OVERHEAD
+
+def _remember_news_list(key, results, rows, generation):
+    # Listas vazias não são guardadas: uma busca sem resultado leva à geração da notícia,
+    # e a notícia gravada por outro processo precisa ser vista na hora, não após o intervalo.
+    if results:
+        size = sum(_news_entry_size(row) for row in rows)
+        news_memory_cache.put(key, results, size, generation)
+
+def get_cached_topics(limit):
+    """
+    Recupera a lista de tópicos em alta do cache.
+    Usa a menor entrada com 'limite' >= limit, para que uma busca maior sirva pedidos menores.
+    Retorna um dicionário com os tópicos (já cortados em 'limit') e o epoch da atualização, ou None.
+    """
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT limite, topicos, updated_at FROM cache_topicos WHERE limite >= ? ORDER BY limite ASC LIMIT 1",
+            (limit,)
+        )
+        row = cur.fetchone()
+    if row:
+        return {
+            "topicos": json.loads(row["topicos"])[:limit],
+            "limite": row["limite"],
+            "updated_at": row["updated_at"]
+        }
+    return None
+
+def save_topics_to_cache(limit, topicos):
+    """
+    Salva ou atualiza a lista de tópicos em alta para o 'limite' informado.
+    """
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "REPLACE INTO cache_topicos (limite, topicos, updated_at) VALUES (?, ?, ?)",
+            (limit, json.dumps(topicos), time.time())
+        )
+
+def acquire_generation_lease(topico, categoria, owner, ttl):
+    """
+    Tenta adquirir o lease de geração de um (topico, categoria) por 'ttl' segundos.
+    Um lease vencido (ex: processo que morreu no meio da geração) pode ser tomado por outro dono.
+    Retorna True se o lease pertence a 'owner' após a chamada.
+    """
+    now = time.time()
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """INSERT INTO generation_leases (topico, categoria, owner, expires_at) VALUES (?, ?, ?, ?)
+               ON CONFLICT (topico, categoria) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+               WHERE generation_leases.expires_at < ? OR generation_leases.owner = excluded.owner""",
+            (topico, categoria, owner, now + ttl, now)
+        )
+        acquired = cur.rowcount == 1
+    return acquired
+
+def release_generation_lease(topico, categoria, owner):
+    """
+    Libera o lease de geração, se ainda pertencer a 'owner'.
+    """
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "DELETE FROM generation_leases WHERE topico = ? AND categoria = ? AND owner = ?",
+            (topico, categoria, owner)
+        )
+
+def is_generation_lease_active(topico, categoria):
+    """
+    Indica se algum processo detém um lease válido para o (topico, categoria).
+    """
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT 1 FROM generation_leases WHERE topico = ? AND categoria = ? AND expires_at >= ?",
+            (topico, categoria, time.time())
+        )
+        row = cur.fetchone()
+    return row is not None
+
+# --- Fila de Jobs de Geração ---
+NEWS_JOB_ACTIVE = ("pendente", "processando")
+
+def create_news_job(topico, categoria, origem="sob_demanda"):
+    """
+    Enfileira a geração de um (topico, categoria). Se já houver um job ativo (pendente ou em processamento)
+    para ele, reaproveita-o; um pedido sob demanda que encontra uma pré-geração ainda pendente
+    a promove para 'sob_demanda', para que ela não espere atrás das outras pré-gerações.
+    Retorna (job, criado).
+    """
+    with db_connection() as conn:
+        cur = conn.cursor()
+        row = cur.execute(
+            """SELECT * FROM news_jobs WHERE topico = ? AND categoria = ? AND status IN (?, ?)
+               ORDER BY created_at LIMIT 1""",
+            (topico, categoria, *NEWS_JOB_ACTIVE)
+        ).fetchone()
+        if row:
+            if origem == "sob_demanda" and row["origem"] == "prefetch" and row["status"] == "pendente":
+                cur.execute("UPDATE news_jobs SET origem = 'sob_demanda' WHERE id = ?", (row["id"],))
+                row = cur.execute("SELECT * FROM news_jobs WHERE id = ?", (row["id"],)).fetchone()
+            return dict(row), False
+        job_id = uuid.uuid4().hex
+        cur.execute(
+            "INSERT INTO news_jobs (id, topico, categoria, status, origem, created_at) VALUES (?, ?, ?, 'pendente', ?, ?)",
+            (job_id, topico, categoria, origem, time.time())
+        )
+        row = cur.execute("SELECT * FROM news_jobs WHERE id = ?", (job_id,)).fetchone()
+    return dict(row), True
+
+def get_news_job(job_id):
+    """
+    Retorna o job como dicionário, ou None se não existir.
+    """
+    with db_connection() as conn:
+        row = conn.execute("SELECT * FROM news_jobs WHERE id = ?", (job_id,)).fetchone()
+    return dict(row) if row else None
+
+def claim_news_job(owner, lease_ttl, max_attempts, max_prefetch=None):
+    """
+    Reserva o job pendente mais antigo para 'owner' por 'lease_ttl' segundos e o marca como 'processando'.
+    Jobs sob demanda passam na frente das pré-gerações, e uma pré-geração só é reservada se houver menos de
+    'max_prefetch' em processamento (somando todos os processos; None não limita).
+    Antes, devolve à fila os jobs cujo lease venceu (processo que morreu), ou os marca como 'erro'
+    se já foram tentados 'max_attempts' vezes.
+    Retorna o job reservado ou None se a fila estiver vazia.
+    """
+    now = time.time()
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """UPDATE news_jobs SET status = CASE WHEN attempts >= ? THEN 'erro' ELSE 'pendente' END,
+                   erro = CASE WHEN attempts >= ? THEN 'Geração interrompida repetidamente.' ELSE erro END,
+                   owner = NULL, lease_expires_at = NULL,
+                   finished_at = CASE WHEN attempts >= ? THEN ? ELSE NULL END
+               WHERE status = 'processando' AND lease_expires_at < ?""",
+            (max_attempts, max_attempts, max_attempts, now, now)
+        )
+        while True:
+            allow_prefetch = max_prefetch is None or cur.execute(
+                "SELECT COUNT(*) FROM news_jobs WHERE status = 'processando' AND origem = 'prefetch'"
+            ).fetchone()[0] < max_prefetch
+            row = cur.execute(
+                """SELECT id FROM news_jobs WHERE status = 'pendente' AND (? OR origem != 'prefetch')
+                   ORDER BY origem = 'prefetch', created_at LIMIT 1""",
+                (allow_prefetch,)
+            ).fetchone()
+            if row is None:
+                return None
+            # Outro processo pode ter reservado o mesmo job entre o SELECT e o UPDATE
+            cur.execute(
+                """UPDATE news_jobs SET status = 'processando', owner = ?, attempts = attempts + 1,
+                       lease_expires_at = ?, started_at = ?
+                   WHERE id = ? AND status = 'pendente'""",
+                (owner, now + lease_ttl, now, row["id"])
+            )
+            if cur.rowcount == 1:
+                job = cur.execute("SELECT * FROM news_jobs WHERE id = ?", (row["id"],)).fetchone()
+                return dict(job)
+
+def finish_news_job(job_id, owner, status, erro=None):
+    """
+    Marca o job como 'concluido' ou 'erro', se ele ainda estiver reservado para 'owner'.
+    Retorna False se o lease já tinha sido perdido para outro processo.
+    """
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """UPDATE news_jobs SET status = ?, erro = ?, finished_at = ?, owner = NULL, lease_expires_at = NULL
+               WHERE id = ? AND owner = ? AND status = 'processando'""",
+            (status, erro, time.time(), job_id, owner)
+        )
+        finished = cur.rowcount == 1
+    return finished
+
+def delete_finished_news_jobs(older_than):
+    """
+    Remove os jobs concluídos ou com erro que terminaram há mais de 'older_than' segundos.
+    Retorna o número de jobs removidos.
+    """
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "DELETE FROM news_jobs WHERE status IN ('concluido', 'erro') AND finished_at < ?",
+            (time.time() - older_than,)
+        )
+        removed = cur.rowcount
+    return removed
+
+def get_news_job_counts(origem=None):
+    """
+    Retorna quantos jobs existem em cada status (só os da 'origem' informada, se houver).
+    """
+    with db_connection() as conn:
+        rows = conn.execute(
+            "SELECT status, COUNT(*) AS total FROM news_jobs WHERE ? IS NULL OR origem = ? GROUP BY status",
+            (origem, origem)
+        ).fetchall()
+    return {row["status"]: row["total"] for row in rows}
+
+# --- Orçamento da Pré-geração ---
+def get_prefetch_usage(dia):
+    """
+    Retorna (tokens, gerações) gastos pela pré-geração no dia 'dia' (AAAA-MM-DD, UTC).
+    """
+    with db_connection() as conn:
+        row = conn.execute("SELECT tokens, geracoes FROM prefetch_orcamento WHERE dia = ?", (dia,)).fetchone()
+    return (row["tokens"], row["geracoes"]) if row else (0, 0)
+
+def add_prefetch_usage(dia, tokens):
+    """
+    Soma os tokens de uma pré-geração ao gasto do dia 'dia' e remove os dias com mais de uma semana.
+    """
+    with db_connection() as conn:
+        conn.execute(
+            """INSERT INTO prefetch_orcamento (dia, tokens, geracoes) VALUES (?, ?, 1)
+               ON CONFLICT(dia) DO UPDATE SET tokens = tokens + excluded.tokens, geracoes = geracoes + 1""",
+            (dia, tokens)
+        )
+        conn.execute("DELETE FROM prefetch_orcamento WHERE dia < date(?, '-7 days')", (dia,))
+
+def save_tts_audio(chave, voice, model, audio_data, audio_mime_type, max_bytes=None):
+    """
+    Salva um áudio sintetizado no cache endereçado por conteúdo.
+    Uma chave já existente não é regravada (o conteúdo é o mesmo), só marcada como usada.
+    Se 'max_bytes' for informado, remove os áudios usados há mais tempo até o cache caber no orçamento.
+    """
+    now = time.time()
+    with db_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """INSERT INTO cache_tts_audio (chave, voice, model, audio_data, audio_mime_type, audio_size, created_at, last_used_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (chave) DO UPDATE SET last_used_at = excluded.last_used_at""",
+            (chave, voice, model, audio_data, audio_mime_type, len(audio_data), now, now)
+        )
+    if max_bytes is not None:
+        evict_tts_audio(max_bytes, keep=chave)
+
+def evict_tts_audio(max_bytes, keep=None):
+    """
+    Remove os áudios do cache de TTS usados há mais tempo (LRU) até o total caber em 'max_bytes'.
+    As notícias ligadas a um áudio removido ficam sem áudio. A chave 'keep' nunca é removida.
+    Retorna o número de áudios removidos.
+    """
+    with db_connection() as conn:
+        cur = conn.cursor()
+        total = cur.execute("SELECT COALESCE(SUM(audio_size), 0) FROM cache_tts_audio").fetchone()[0]
+        if total <= max_bytes:
+            return 0
+
+        removidas = []
+        for row in cur.execute("SELECT chave, audio_size FROM cache_tts_audio ORDER BY last_used_at ASC").fetchall():
+            if total <= max_bytes:
+                break
+            if row["chave"] == keep:
+                continue
+            removidas.append(row["chave"])
+            total -= row["audio_size"]
+
+        if not removidas:
+            return 0
+        cur.executemany("DELETE FROM cache_audio WHERE chave = ?", [(chave,) for chave in removidas])
+        cur.executemany("DELETE FROM cache_tts_audio WHERE chave = ?", [(chave,) for chave in removidas])
+        generation = _bump_news_generation(cur)
+    news_memory_cache.set_generation(generation)
+    print(f"Cache de TTS acima do orçamento: {len(removidas)} áudio(s) removido(s).")
+    return len(removidas)
+
+# --- Limpeza do Cache (TTL, orçamento de bytes e vacuum incremental) ---
+# Cada função abaixo faz um lote pequeno numa transação curta, para ser chamada em laço
+# pela thread de limpeza sem segurar o lock de escrita por muito tempo.
+
+def _delete_news_rows(cur, rows):
+    """
+    Remove as notícias (linhas com rowid, topico e categoria), suas entradas no índice de títulos,
+    as ligações com áudio e os áudios que só essas notícias usavam. Retorna a nova geração.
+    """
+    chaves = set()
+    for row in rows:
+        link = cur.execute(
+            "SELECT chave FROM cache_audio WHERE topico = ? AND categoria = ?",
+            (row["topico"], row["categoria"])
+        ).fetchone()
+        if link:
+            chaves.add(link["chave"])
+    cur.executemany(
+        "DELETE FROM cache_audio WHERE topico = ? AND categoria = ?",
+        [(row["topico"], row["categoria"]) for row in rows]
+    )
+    cur.executemany("DELETE FROM noticias_titulo_fts WHERE rowid = ?", [(row["rowid"],) for row in rows])
+    cur.executemany("DELETE FROM cache_noticias WHERE rowid = ?", [(row["rowid"],) for row in rows])
+    cur.executemany(
+        "DELETE FROM cache_tts_audio WHERE chave = ? AND NOT EXISTS (SELECT 1 FROM cache_audio WHERE chave = ?)",
+        [(chave, chave) for chave in chaves]
+    )
+    return _bump_news_generation(cur)
+
+def expire_news_batch(default_ttl, category_ttls, batch_size):
+    """
+    Remove até 'batch_size' notícias mais velhas que o TTL da sua categoria
+    ('category_ttls', em segundos, ou 'default_ttl' para as demais), junto com o áudio exclusivo delas.
+    Retorna o número de notícias removidas.
+    """
+    now = time.time()
+
+    def cutoff(ttl):
+        # created_at é gravado por CURRENT_TIMESTAMP (UTC, 'AAAA-MM-DD HH:MM:SS')
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(now - ttl))
+
+    with db_connection() as conn:
+        cur = conn.cursor()
+        rows = []
+        for categoria, ttl in category_ttls.items():
+            rows += cur.execute(
+                """SELECT rowid, topico, categoria FROM cache_noticias
+                   WHERE categoria = ? AND created_at < ? ORDER BY created_at LIMIT ?""",
+                (categoria, cutoff(ttl), batch_size - len(rows))
+            ).fetchall()
+            if len(rows) >= batch_size:
+                break
+        if len(rows) < batch_size:
+            placeholders = ", ".join("?" for _ in category_ttls)
+            excluidas = f"AND categoria NOT IN ({placeholders})" if category_ttls else ""
+            rows += cur.execute(
+                f"""SELECT rowid, topico, categoria FROM cache_noticias
+                    WHERE created_at < ? {excluidas} ORDER BY created_at LIMIT ?""",
+                (cutoff(default_ttl), *category_ttls.keys(), batch_size - len(rows))
+            ).fetchall()
+        if not rows:
+            return 0
+        generation = _delete_news_rows(cur, rows)
+    news_memory_cache.set_generation(generation)
+    return len(rows)
+
+def _take_until(rows, size_column, bytes_to_free):
+    # Para no primeiro registro que completa 'bytes_to_free', em vez de remover o lote inteiro
+    taken, freed = [], 0
+    for row in rows:
+        if bytes_to_free is not None and freed >= bytes_to_free:
+            break
+        taken.append(row)
+        freed += row[size_column]
+    return taken
+
+def evict_oldest_audio_batch(batch_size, bytes_to_free=None):
+    """
+    Remove até 'batch_size' áudios do cache de TTS usados há mais tempo (LRU),
+    parando assim que 'bytes_to_free' bytes forem removidos, se informado.
+    As notícias ligadas a eles ficam sem áudio. Retorna o número de áudios removidos.
+    """
+    with db_connection() as conn:
+        cur = conn.cursor()
+        rows = cur.execute(
+            "SELECT chave, audio_size FROM cache_tts_audio ORDER BY last_used_at ASC LIMIT ?", (batch_size,)
+        ).fetchall()
+        chaves = [row["chave"] for row in _take_until(rows, "audio_size", bytes_to_free)]
+        if not chaves:
+            return 0
+        cur.executemany("DELETE FROM cache_audio WHERE chave = ?", [(chave,) for chave in chaves])
+        cur.executemany("DELETE FROM cache_tts_audio WHERE chave = ?", [(chave,) for chave in chaves])
+        generation = _bump_news_generation(cur)
+    news_memory_cache.set_generation(generation)
+    return len(chaves)
+
+def evict_oldest_news_batch(batch_size, bytes_to_free=None):
+    """
+    Remove até 'batch_size' notícias mais antigas (e o áudio exclusivo delas),
+    parando assim que o texto removido somar 'bytes_to_free' bytes, se informado.
+    Retorna o número de notícias removidas.
+    """
+    with db_connection() as conn:
+        cur = conn.cursor()
+        rows = cur.execute(
+            """SELECT rowid, topico, categoria, length(CAST(noticia AS BLOB)) AS tamanho
+               FROM cache_noticias ORDER BY created_at ASC LIMIT ?""",
+            (batch_size,)
+        ).fetchall()
+        rows = _take_until(rows, "tamanho", bytes_to_free)
+        if not rows:
+            return 0
+        generation = _delete_news_rows(cur, rows)
+    news_memory_cache.set_generation(generation)
+    return len(rows)
+
+def get_cache_db_usage():
+    """
+    Retorna (bytes_usados, bytes_livres) do arquivo do banco, pelas contagens de páginas.
+    As páginas livres são as liberadas por remoções e ainda não devolvidas pelo vacuum incremental.
+    """
+    with db_connection() as conn:
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return (page_count - freelist) * page_size, freelist * page_size
+
+def incremental_vacuum(pages):
+    """
+    Devolve ao sistema até 'pages' páginas livres do arquivo do banco.
+    Retorna quantas páginas foram devolvidas.
+    """
+    with db_connection() as conn:
+        before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if not before:
+            return 0
+        # O PRAGMA só avança enquanto seus resultados são lidos
+        conn.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+        return before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+def get_cache_db_stats():
+    """
+    Retorna as contagens de linhas e bytes do cache em disco: notícias, áudios e o arquivo do banco.
+    """
+    with db_connection() as conn:
+        noticias = conn.execute("SELECT COUNT(*) FROM cache_noticias").fetchone()[0]
+        audios, audio_bytes = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(audio_size), 0) FROM cache_tts_audio"
+        ).fetchone()
+    used_bytes, free_bytes = get_cache_db_usage()
+    return {
+        "news_rows": noticias,
+        "audio_rows": audios,
+        "audio_bytes": audio_bytes,
+        "db_used_bytes": used_bytes,
+        "db_free_bytes": free_bytes
+    }
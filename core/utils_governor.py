@@ -0,0 +1,237 @@
+import time
+import random
+import asyncio
+import threading
+from contextlib import asynccontextmanager, contextmanager
+
+from config import (
+    AGENT_RATE_LIMIT, AGENT_MAX_CONCURRENCY, AGENT_TARGET_LATENCY,
+    TTS_RATE_LIMIT, TTS_MAX_CONCURRENCY, TTS_TARGET_LATENCY,
+    UPSTREAM_FAILURE_THRESHOLD, UPSTREAM_OPEN_SECONDS, UPSTREAM_ACQUIRE_TIMEOUT,
+    INITIAL_BACKOFF
+)
+
+
+class UpstreamUnavailable(Exception):
+    """A API está com o circuito aberto ou saturada; 'retry_after' é a espera sugerida em segundos."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_overload_error(exc):
+    """Erros que indicam sobrecarga da API: HTTP 429 e 5xx (google.genai e google.api_core expõem 'code')."""
+    code = getattr(exc, "code", None)
+    return isinstance(code, int) and (code == 429 or code >= 500)
+
+
+class UpstreamGovernor:
+    """
+    Controla as chamadas de um processo a uma API externa (agente ou TTS da Gemini):
+      - limite de taxa por token bucket ('rate' chamadas por segundo, rajadas de até 'max_concurrency';
+        0 ou menos desativa o limite de taxa);
+      - limite de chamadas simultâneas ajustado por AIMD: sobe aos poucos enquanto as chamadas terminam
+        dentro de 'target_latency' e cai pela metade a cada erro de sobrecarga (ou 10% se só ficaram lentas);
+      - disjuntor: após 'failure_threshold' erros de sobrecarga seguidos, recusa chamadas por 'open_seconds'
+        e depois deixa passar uma única chamada de teste, que fecha o circuito se der certo.
+    Quem espera por vaga desiste após 'acquire_timeout' segundos com UpstreamUnavailable.
+    """
+
+    LATENCY_DECREASE = 0.9   # fator aplicado ao limite quando uma chamada passa da latência alvo
+    ERROR_DECREASE = 0.5     # fator aplicado ao limite a cada erro de sobrecarga
+    MAX_BACKOFF = 30.0       # segundos, teto da espera entre retentativas
+    ASYNC_POLL_INTERVAL = 0.05  # segundos entre verificações de vaga em call_async
+
+    def __init__(self, name, rate, max_concurrency, target_latency, failure_threshold, open_seconds,
+                 acquire_timeout, backoff_base=INITIAL_BACKOFF):
+        self.name = name
+        self.rate = rate
+        self.burst = max(1, max_concurrency)
+        self.max_limit = max(1, max_concurrency)
+        self.target_latency = target_latency
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.acquire_timeout = acquire_timeout
+        self.backoff_base = backoff_base
+        self._cond = threading.Condition()
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._failures = 0
+        self._open_until = 0.0
+        self._probing = False
+        self.calls = 0
+        self.overload_errors = 0
+        self.rejected = 0
+        self.circuit_opened = 0
+
+    @property
+    def is_open(self):
+        """Se o disjuntor está recusando chamadas (fora do período de teste)."""
+        return time.monotonic() < self._open_until
+
+    def retry_after(self):
+        return max(1, int(self._open_until - time.monotonic() + 0.999))
+
+    def backoff(self, attempt):
+        """Espera antes da retentativa 'attempt' (1, 2, ...): exponencial com jitter, metade fixa e metade aleatória."""
+        delay = min(self.MAX_BACKOFF, self.backoff_base * 2 ** (attempt - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _reject(self, message):
+        self.rejected += 1
+        raise UpstreamUnavailable(f"{self.name}: {message}", self.retry_after())
+
+    def _begin(self):
+        """Verifica o disjuntor antes de esperar por vaga. Retorna se esta é a chamada de teste (com _cond adquirido)."""
+        if time.monotonic() < self._open_until:
+            self._reject("circuito aberto após falhas seguidas da API")
+        probe = self._open_until > 0 and self._failures >= self.failure_threshold
+        if probe:
+            # Circuito meio-aberto: só uma chamada de teste por vez
+            if self._probing:
+                self._reject("aguardando a chamada de teste da API")
+            self._probing = True
+        return probe
+
+    def _take(self, deadline):
+        """
+        Tenta ocupar uma vaga (com _cond adquirido). Retorna 0 se conseguiu, ou quantos segundos esperar
+        antes de tentar de novo; levanta UpstreamUnavailable se o prazo 'deadline' venceu.
+        """
+        now = time.monotonic()
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        else:
+            self._tokens = float(self.burst)  # sem limite de taxa: só o de simultâneas
+        self._refilled_at = now
+        if self.in_flight < max(1, int(self.limit)) and self._tokens >= 1:
+            self._tokens -= 1
+            self.in_flight += 1
+            self.calls += 1
+            return 0
+        remaining = deadline - now
+        if remaining <= 0:
+            self._reject("limite de chamadas simultâneas ou de taxa atingido")
+        return remaining if self._tokens >= 1 else min(remaining, (1 - self._tokens) / self.rate)
+
+    def _acquire(self):
+        deadline = time.monotonic() + self.acquire_timeout
+        with self._cond:
+            probe = self._begin()
+            try:
+                while True:
+                    wait = self._take(deadline)
+                    if not wait:
+                        return probe
+                    self._cond.wait(wait)
+            except UpstreamUnavailable:
+                if probe:
+                    self._probing = False
+                raise
+
+    async def _acquire_async(self):
+        # Mesma espera de _acquire sem bloquear o event loop: a vaga é verificada a cada ASYNC_POLL_INTERVAL
+        deadline = time.monotonic() + self.acquire_timeout
+        with self._cond:
+            probe = self._begin()
+        try:
+            while True:
+                with self._cond:
+                    wait = self._take(deadline)
+                if not wait:
+                    return probe
+                await asyncio.sleep(min(wait, self.ASYNC_POLL_INTERVAL))
+        except BaseException:
+            # Inclui o cancelamento da requisição enquanto esperava
+            if probe:
+                with self._cond:
+                    self._probing = False
+            raise
+
+    def _release(self, probe, latency, overload):
+        with self._cond:
+            self.in_flight -= 1
+            if probe:
+                self._probing = False
+            if overload:
+                self.overload_errors += 1
+                self._failures += 1
+                self.limit = max(1.0, self.limit * self.ERROR_DECREASE)
+                if self._failures >= self.failure_threshold:
+                    if not self.is_open:
+                        self.circuit_opened += 1
+                        print(f"{self.name}: circuito aberto por {self.open_seconds}s após {self._failures} falhas seguidas.")
+                    self._open_until = time.monotonic() + self.open_seconds
+            elif latency is not None:
+                if self._failures >= self.failure_threshold:
+                    print(f"{self.name}: chamada de teste bem-sucedida, circuito fechado.")
+                    self._open_until = 0.0
+                self._failures = 0
+                if latency > self.target_latency:
+                    self.limit = max(1.0, self.limit * self.LATENCY_DECREASE)
+                else:
+                    self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    @contextmanager
+    def call(self):
+        """
+        Reserva uma vaga para uma chamada à API durante o bloco. Erros de sobrecarga levantados no bloco
+        reduzem o limite e contam para o disjuntor; outras exceções só liberam a vaga.
+        Levanta UpstreamUnavailable se o circuito estiver aberto ou não houver vaga a tempo.
+        """
+        probe = self._acquire()
+        start = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self._release(probe, None, is_overload_error(e))
+            raise
+        except BaseException:
+            # Ex: GeneratorExit de um streaming abandonado pelo cliente
+            self._release(probe, None, False)
+            raise
+        self._release(probe, time.monotonic() - start, False)
+
+    @asynccontextmanager
+    async def call_async(self):
+        """Versão de call() para corrotinas: espera pela vaga sem ocupar uma thread."""
+        probe = await self._acquire_async()
+        start = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self._release(probe, None, is_overload_error(e))
+            raise
+        except BaseException:
+            # Ex: a requisição foi cancelada porque o cliente desconectou
+            self._release(probe, None, False)
+            raise
+        self._release(probe, time.monotonic() - start, False)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "circuit_open": self.is_open,
+                "retry_after": self.retry_after() if self.is_open else 0,
+                "concurrency_limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "calls": self.calls,
+                "overload_errors": self.overload_errors,
+                "rejected": self.rejected,
+                "circuit_opened": self.circuit_opened
+            }
+
+
+# Compartilhados por todas as requisições do processo
+agent_governor = UpstreamGovernor(
+    "agente", AGENT_RATE_LIMIT, AGENT_MAX_CONCURRENCY, AGENT_TARGET_LATENCY,
+    UPSTREAM_FAILURE_THRESHOLD, UPSTREAM_OPEN_SECONDS, UPSTREAM_ACQUIRE_TIMEOUT
+)
+tts_governor = UpstreamGovernor(
+    "tts", TTS_RATE_LIMIT, TTS_MAX_CONCURRENCY, TTS_TARGET_LATENCY,
+    UPSTREAM_FAILURE_THRESHOLD, UPSTREAM_OPEN_SECONDS, UPSTREAM_ACQUIRE_TIMEOUT
+)
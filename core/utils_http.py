@@ -0,0 +1,88 @@
+import gzip
+from datetime import datetime, timezone
+
+from flask import Response, request
+
+from config import HTTP_COMPRESSED_CACHE_MAX_BYTES
+from utils_lru import ByteLRUCache
+
+try:
+    import brotli
+except ImportError:
+    brotli = None  # sem o pacote 'brotli' as respostas só são comprimidas com gzip
+
+COMPRESS_MIN_BYTES = 1024  # corpos menores vão sem compressão
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Corpos prontos (já comprimidos ou não) por (ETag, codificação). O ETag muda com a versão do conteúdo,
+# então uma entrada nunca fica desatualizada: as versões antigas só deixam de ser pedidas e saem pelo LRU.
+response_body_cache = ByteLRUCache(HTTP_COMPRESSED_CACHE_MAX_BYTES)
+
+
+def choose_encoding():
+    """Codificação aceita pelo cliente, na ordem de preferência do servidor: br, gzip ou None (identidade)."""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+
+def compress(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        # mtime fixo: o mesmo conteúdo sempre gera os mesmos bytes
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return body
+
+
+def parse_db_timestamp(value):
+    """Converte um TIMESTAMP do SQLite ('AAAA-MM-DD HH:MM:SS', em UTC) em datetime com fuso, ou None."""
+    try:
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+    except (TypeError, ValueError):
+        return None
+
+
+def conditional_response(etag, build_body, last_modified=None, mimetype="application/json"):
+    """
+    Resposta com validadores para conteúdo versionado: 'etag' (fraco) identifica a versão do conteúdo e
+    'build_body()' monta os bytes só quando necessário.
+    Responde 304 quando If-None-Match casa com o ETag (ou, sem If-None-Match, quando If-Modified-Since
+    não é anterior a 'last_modified'). Senão envia o corpo comprimido conforme Accept-Encoding,
+    reaproveitando o corpo da mesma versão já montado e comprimido antes.
+    """
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains_weak(etag)
+    else:
+        since = request.if_modified_since
+        not_modified = bool(last_modified and since and last_modified.replace(microsecond=0) <= since)
+
+    if not_modified:
+        response = Response(status=304)
+    else:
+        encoding = choose_encoding()
+        key = (etag, encoding)
+        body = response_body_cache.get(key)
+        if body is None:
+            body = build_body()
+            if len(body) < COMPRESS_MIN_BYTES:
+                encoding = None
+            body = compress(body, encoding)
+            response_body_cache.put(key, (body, encoding), len(body), None)
+        else:
+            body, encoding = body
+        response = Response(body, mimetype=mimetype)
+        if encoding:
+            response.content_encoding = encoding
+
+    response.set_etag(etag, weak=True)
+    if last_modified:
+        response.last_modified = last_modified
+    # O navegador pode guardar a resposta, mas revalida a cada uso (a notícia muda quando é regenerada)
+    response.headers["Cache-Control"] = "no-cache"
+    response.vary.add("Accept-Encoding")
+    return response
@@ -0,0 +1,120 @@
+import time
+import threading
+
+from utils_cache_sqlite import (
+    evict_oldest_audio_batch, evict_oldest_news_batch, expire_news_batch,
+    get_cache_db_usage, incremental_vacuum
+)
+
+
+class CacheJanitor:
+    """
+    Thread em segundo plano que mantém o cache em disco dentro dos limites:
+    remove as notícias vencidas (TTL por categoria), depois, se o banco passar do orçamento de bytes,
+    remove áudios (os menos usados) antes de remover texto (as notícias mais antigas),
+    e por fim devolve as páginas liberadas ao sistema com vacuum incremental.
+    Tudo é feito em lotes pequenos com pausas entre eles, para não travar as requisições.
+    Enquanto 'hold_expiration()' retornar True (ex: a API de geração está fora), as notícias vencidas são mantidas.
+    """
+
+    BATCH_SIZE = 100          # linhas removidas por transação
+    BATCH_PAUSE = 0.05        # segundos entre lotes, liberando o lock de escrita
+    VACUUM_PAGES = 256        # páginas devolvidas por passo do vacuum incremental
+
+    def __init__(self, default_ttl, category_ttls, max_bytes, interval, hold_expiration=None):
+        self.default_ttl = default_ttl
+        self.category_ttls = dict(category_ttls)
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.hold_expiration = hold_expiration
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.expired_news = 0
+        self.evicted_news = 0
+        self.evicted_audio = 0
+        self.vacuumed_pages = 0
+        self.runs = 0
+        self.last_run_at = None
+        self.last_error = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="cache-janitor", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _loop(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                # A limpeza tenta de novo na próxima rodada; o cache continua funcionando
+                self.last_error = str(e)
+                print(f"Erro na limpeza do cache: {e}")
+            if self._stop.wait(self.interval):
+                return
+
+    def _batches(self, fn, *args):
+        """Chama fn em laço até ela não remover (ou devolver) mais nada. Retorna o total."""
+        total = 0
+        while not self._stop.is_set():
+            removed = fn(*args)
+            if not removed:
+                break
+            total += removed
+            time.sleep(self.BATCH_PAUSE)
+        return total
+
+    def _evict_over_budget(self, fn):
+        """Remove lotes com fn enquanto o banco estiver acima do orçamento. Retorna o total removido."""
+        total = 0
+        while not self._stop.is_set():
+            excess = get_cache_db_usage()[0] - self.max_bytes
+            if excess <= 0:
+                break
+            removed = fn(self.BATCH_SIZE, excess)
+            if not removed:
+                break
+            total += removed
+            time.sleep(self.BATCH_PAUSE)
+        return total
+
+    def run_once(self):
+        """Executa uma rodada completa de limpeza."""
+        expired = 0
+        if not (self.hold_expiration and self.hold_expiration()):
+            expired = self._batches(expire_news_batch, self.default_ttl, self.category_ttls, self.BATCH_SIZE)
+
+        # Acima do orçamento: áudio sai primeiro (pode ser sintetizado de novo), texto por último
+        audio = self._evict_over_budget(evict_oldest_audio_batch)
+        news = self._evict_over_budget(evict_oldest_news_batch)
+
+        vacuumed = self._batches(incremental_vacuum, self.VACUUM_PAGES)
+
+        with self._lock:
+            self.expired_news += expired
+            self.evicted_audio += audio
+            self.evicted_news += news
+            self.vacuumed_pages += vacuumed
+            self.runs += 1
+            self.last_run_at = time.time()
+        if expired or audio or news:
+            print(f"Limpeza do cache: {expired} notícia(s) vencida(s), {audio} áudio(s) e {news} notícia(s) removidos por espaço.")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "expired_news": self.expired_news,
+                "evicted_news": self.evicted_news,
+                "evicted_audio": self.evicted_audio,
+                "vacuumed_pages": self.vacuumed_pages,
+                "runs": self.runs,
+                "last_run_at": self.last_run_at,
+                "last_error": self.last_error,
+                "max_bytes": self.max_bytes
+            }
@@ -0,0 +1,194 @@
+import os
+import time
+import uuid
+import threading
+
+from utils_cache_sqlite import claim_news_job, create_news_job, delete_finished_news_jobs, finish_news_job
+from utils_json import partial_json_string
+
+
+class JobProgress:
+    """
+    Eventos de progresso de um job em execução neste processo, guardados em ordem para que
+    quem se inscreve no meio da geração receba tudo desde o início.
+    Também converte o texto bruto do agente (o JSON da resposta, ainda incompleto) em
+    eventos com o título e o texto da notícia.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.events = []
+        self.done = False
+        self.etapa = None
+        self._reset_article()
+
+    def _reset_article(self):
+        self._raw = ""
+        self._title_sent = False
+        self._text_sent = 0
+
+    def publish(self, tipo, dados):
+        with self._cond:
+            if tipo == "etapa":
+                self.etapa = dados["mensagem"]
+            self.events.append((tipo, dados))
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self.done = True
+            self._cond.notify_all()
+
+    def agent_progress(self, tipo, dados):
+        """Callback on_progress de call_agent: traduz os eventos do agente em eventos da notícia."""
+        if tipo == "busca":
+            self.publish("etapa", {"mensagem": "Pesquisando no Google..."})
+            self.publish("busca", dados)
+        elif tipo == "texto":
+            if not self._raw:
+                self.publish("etapa", {"mensagem": "Escrevendo a notícia..."})
+            self._raw += dados["delta"]
+            if not self._title_sent:
+                titulo, completo = partial_json_string(self._raw, "titulo")
+                if completo:
+                    self._title_sent = True
+                    self.publish("titulo", {"titulo": titulo})
+            texto, _ = partial_json_string(self._raw, "noticia_completa")
+            if texto and len(texto) > self._text_sent:
+                self.publish("texto", {"delta": texto[self._text_sent:]})
+                self._text_sent = len(texto)
+        elif tipo == "reinicio":
+            self._reset_article()
+            self.publish("reinicio", {})
+            self.publish("etapa", {"mensagem": "Falha temporária no agente, tentando de novo..."})
+        else:
+            self.publish(tipo, dados)
+
+    def events_since(self, index):
+        """
+        Retorna, sem esperar, os eventos a partir da posição 'index' e se o job já terminou
+        (com todos os eventos entregues). Usado por quem não pode bloquear uma thread (modo ASGI).
+        """
+        with self._cond:
+            batch = self.events[index:]
+            return batch, self.done and index + len(batch) == len(self.events)
+
+    def iter_events(self, timeout):
+        """
+        Gera os eventos (tipo, dados) desde o início e os novos à medida que chegam, até o job terminar.
+        Gera None quando passa 'timeout' segundos sem eventos (para o chamador mandar um heartbeat).
+        """
+        index = 0
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self.events) > index or self.done, timeout)
+            batch, finished = self.events_since(index)
+            index += len(batch)
+            for event in batch:
+                yield event
+            if finished:
+                return
+            if not batch:
+                yield None
+
+
+class NewsJobQueue:
+    """
+    Fila de geração de notícias persistida em cache.db, processada por um número fixo de threads.
+    As requisições só enfileiram e consultam jobs; a chamada ao agente acontece nas threads da fila.
+    Vários processos podem compartilhar a mesma fila: cada job é reservado com um lease, e jobs de um
+    processo que morreu voltam para a fila quando o lease vence.
+    """
+
+    POLL_INTERVAL = 1.0     # segundos entre consultas à fila quando não há aviso de job novo
+    PURGE_INTERVAL = 600    # segundos entre limpezas dos jobs antigos
+
+    def __init__(self, run_job, workers, lease_ttl, max_attempts, retention, progress=None, max_prefetch=None, paused=None):
+        """
+        'run_job(job, progress)' gera a notícia do job, publicando o andamento em 'progress' (JobProgress),
+        e retorna True se ela foi salva no cache; exceções e retorno False marcam o job como 'erro'.
+        'progress' é o dicionário job_id -> JobProgress dos jobs em execução neste processo.
+        'max_prefetch' limita as pré-gerações em processamento ao mesmo tempo (ver claim_news_job).
+        'paused()', se informado, suspende a reserva de jobs novos enquanto retornar True.
+        """
+        self.run_job = run_job
+        self.progress = progress if progress is not None else {}
+        self.workers = workers
+        self.lease_ttl = lease_ttl
+        self.max_attempts = max_attempts
+        self.retention = retention
+        self.max_prefetch = max_prefetch
+        self.paused = paused
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._purged_at = 0.0
+
+    def start(self):
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"news-job-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def submit(self, topico, categoria, origem="sob_demanda"):
+        """
+        Enfileira a geração de um (topico, categoria), reaproveitando um job ativo para o mesmo par.
+        'origem' é 'sob_demanda' (pedido de um usuário) ou 'prefetch' (pré-geração, com prioridade menor).
+        Retorna (job, criado) sem esperar pela geração.
+        """
+        job, created = create_news_job(topico, categoria, origem)
+        # Um pedido sob demanda também pode ter promovido uma pré-geração que esperava pelo limite
+        if created or origem == "sob_demanda":
+            self._wakeup.set()
+        return job, created
+
+    def _worker(self):
+        while not self._stop.is_set():
+            if self.paused and self.paused():
+                self._stop.wait(self.POLL_INTERVAL)
+                continue
+            try:
+                self._purge_old_jobs()
+                owner = f"{os.getpid()}-{uuid.uuid4().hex}"
+                job = claim_news_job(owner, self.lease_ttl, self.max_attempts, self.max_prefetch)
+            except Exception as e:
+                print(f"Erro ao consultar a fila de jobs: {e}")
+                job = None
+            if job is None:
+                self._wakeup.wait(self.POLL_INTERVAL)
+                self._wakeup.clear()
+                continue
+            self._run(job, owner)
+
+    def _run(self, job, owner):
+        print(f"Job {job['id']}: gerando '{job['topico']}' ({job['categoria']}), tentativa {job['attempts']}.")
+        progress = JobProgress()
+        self.progress[job["id"]] = progress
+        try:
+            try:
+                ok = self.run_job(job, progress)
+                status, erro = ("concluido", None) if ok else ("erro", "Notícia não encontrada ou gerada.")
+            except Exception as e:
+                print(f"Job {job['id']}: erro na geração: {e}")
+                status, erro = "erro", str(e)
+            if not finish_news_job(job["id"], owner, status, erro):
+                print(f"Job {job['id']}: lease perdido antes do fim; o resultado fica com o outro processo.")
+        finally:
+            # Só depois de gravar o status final, para quem acompanha o progresso já ler o resultado
+            progress.close()
+            self.progress.pop(job["id"], None)
+
+    def _purge_old_jobs(self):
+        now = time.monotonic()
+        if now - self._purged_at < self.PURGE_INTERVAL:
+            return
+        self._purged_at = now
+        delete_finished_news_jobs(self.retention)
@@ -0,0 +1,247 @@
+import re
+import json
+import threading
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class RawJSON:
+    """
+    Trecho de JSON já serializado em UTF-8 (ex: a notícia como está gravada no cache),
+    inserido como está por dumps_with_raw, sem ser decodificado e codificado de novo.
+    """
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = data.encode("utf-8") if isinstance(data, str) else data
+
+
+def dumps_with_raw(obj):
+    """
+    Serializa 'obj' como json.dumps, mas copia os valores RawJSON byte a byte para a saída.
+    Só a estrutura em volta é codificada, então o custo praticamente não depende do tamanho dos trechos prontos.
+    Retorna os bytes em UTF-8.
+    """
+    parts = []
+    _append(obj, parts)
+    return b"".join(parts)
+
+
+def _append(obj, parts):
+    if isinstance(obj, RawJSON):
+        parts.append(obj.data)
+    elif isinstance(obj, dict):
+        parts.append(b"{")
+        for i, (key, value) in enumerate(obj.items()):
+            if i:
+                parts.append(b",")
+            parts.append(json.dumps(str(key)).encode("utf-8"))
+            parts.append(b":")
+            _append(value, parts)
+        parts.append(b"}")
+    elif isinstance(obj, (list, tuple)):
+        parts.append(b"[")
+        for i, value in enumerate(obj):
+            if i:
+                parts.append(b",")
+            _append(value, parts)
+        parts.append(b"]")
+    else:
+        parts.append(json.dumps(obj).encode("utf-8"))
+
+
+def partial_json_string(text, field):
+    """
+    Lê o valor do campo string 'field' num JSON que ainda está sendo gerado (ex: a resposta parcial do agente),
+    decodificando os escapes até o último caractere completo.
+    Retorna (valor_até_agora, completo), ou (None, False) se o campo ainda não apareceu.
+    """
+    match = re.search(r'"%s"\s*:\s*"' % re.escape(field), text)
+    if not match:
+        return None, False
+    out = []
+    i = match.end()
+    while i < len(text):
+        ch = text[i]
+        if ch == '"':
+            return "".join(out), True
+        if ch != "\\":
+            out.append(ch)
+            i += 1
+            continue
+        if i + 1 >= len(text):
+            break
+        esc = text[i + 1]
+        if esc != "u":
+            out.append(_ESCAPES.get(esc, esc))
+            i += 2
+            continue
+        # \uXXXX, possivelmente um par substituto (\uD83D\uDE00) que só pode ser decodificado inteiro
+        try:
+            code = int(text[i + 2:i + 6], 16) if len(text) >= i + 6 else None
+        except ValueError:
+            code = -1
+        if code is None:
+            break
+        if code == -1:
+            out.append(text[i:i + 6])
+            i += 6
+            continue
+        if 0xD800 <= code < 0xDC00:
+            if len(text) < i + 12:
+                break
+            try:
+                low = int(text[i + 8:i + 12], 16)
+            except ValueError:
+                low = 0
+            if text[i + 6:i + 8] == "\\u" and 0xDC00 <= low < 0xE000:
+                out.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                i += 12
+                continue
+        out.append(chr(code))
+        i += 6
+    return "".join(out), False
+
+
+# --- Extração do JSON das Respostas do Agente ---
+_FENCE_RE = re.compile(r"```[a-zA-Z]*[ \t]*\n?(.*?)```", re.DOTALL)
+_JSON_TOKEN_RE = re.compile(r'[{}"\\]')
+_SMART_QUOTES = "“”"
+
+
+def _balanced_objects(text):
+    """
+    Gera, em ordem, os objetos JSON de primeiro nível do texto ('{' até o '}' que o fecha),
+    ignorando chaves dentro de strings. Uma única passada, pulando direto entre os caracteres relevantes.
+    """
+    depth = 0
+    start = None
+    in_string = False
+    escaped_at = -1
+    for match in _JSON_TOKEN_RE.finditer(text):
+        i = match.start()
+        ch = text[i]
+        if in_string:
+            if ch == "\\":
+                if escaped_at != i:
+                    escaped_at = i + 1  # o próximo caractere está escapado
+            elif ch == '"' and escaped_at != i:
+                in_string = False
+        elif ch == '"':
+            in_string = depth > 0
+        elif ch == "{":
+            if depth == 0:
+                start = i
+            depth += 1
+        elif ch == "}" and depth > 0:
+            depth -= 1
+            if depth == 0:
+                yield text[start:i + 1]
+
+
+def iter_json_candidates(text):
+    """Objetos JSON candidatos de uma resposta: primeiro os dos blocos de código (```json), depois os do texto todo."""
+    seen = set()
+    for fenced in _FENCE_RE.finditer(text):
+        for candidate in _balanced_objects(fenced.group(1)):
+            seen.add(candidate)
+            yield candidate
+    for candidate in _balanced_objects(text):
+        if candidate not in seen:
+            yield candidate
+
+
+def repair_json(text):
+    """
+    Corrige defeitos comuns do JSON gerado por modelos: aspas tipográficas (“ ”) usadas como delimitadores
+    de string e vírgulas sobrando antes de '}' ou ']'. As aspas tipográficas dentro de strings normais são mantidas.
+    """
+    out = []
+    i, n = 0, len(text)
+    delimiter = None  # '"', 'tipografica' ou None (fora de string)
+    while i < n:
+        ch = text[i]
+        if delimiter:
+            if ch == "\\" and i + 1 < n:
+                out.append(text[i:i + 2])
+                i += 2
+                continue
+            if (delimiter == '"' and ch == '"') or (delimiter == "tipografica" and ch in _SMART_QUOTES):
+                out.append('"')
+                delimiter = None
+            elif ch == '"':
+                out.append('\\"')  # aspas retas dentro de uma string delimitada por aspas tipográficas
+            else:
+                out.append(ch)
+        elif ch == '"' or ch in _SMART_QUOTES:
+            delimiter = '"' if ch == '"' else "tipografica"
+            out.append('"')
+        elif ch == ",":
+            j = i + 1
+            while j < n and text[j].isspace():
+                j += 1
+            if j >= n or text[j] not in "}]":
+                out.append(ch)
+        else:
+            out.append(ch)
+        i += 1
+    return "".join(out)
+
+
+class ParseStats:
+    """Contadores das extrações de JSON por tipo de resposta, para acompanhar a taxa de sucesso."""
+
+    OUTCOMES = ("ok", "reparado", "invalido", "sem_json")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def record(self, kind, outcome):
+        with self._lock:
+            counts = self._counts.setdefault(kind, dict.fromkeys(self.OUTCOMES, 0))
+            counts[outcome] += 1
+
+    def stats(self):
+        with self._lock:
+            result = {}
+            for kind, counts in self._counts.items():
+                total = sum(counts.values())
+                result[kind] = {
+                    **counts,
+                    "total": total,
+                    "success_rate": (counts["ok"] + counts["reparado"]) / total if total else None
+                }
+            return result
+
+
+agent_json_stats = ParseStats()
+
+
+def parse_agent_json(text, kind, validate):
+    """
+    Extrai da resposta do agente o primeiro objeto JSON que 'validate' aceita (ela retorna o valor
+    já validado ou None), tentando cada candidato como veio e, se não decodificar, após repair_json.
+    Texto em volta, blocos de código e vários objetos na mesma resposta são tolerados.
+    Registra o resultado em agent_json_stats sob 'kind'. Retorna o valor validado ou None.
+    """
+    decoded_any = False
+    for candidate in iter_json_candidates(text or ""):
+        for attempt, source in enumerate((candidate, None)):
+            if source is None:
+                source = repair_json(candidate)
+                if source == candidate:
+                    break
+            try:
+                # strict=False aceita quebras de linha cruas dentro das strings, comuns no texto da notícia
+                data = json.loads(source, strict=False)
+            except ValueError:
+                continue
+            decoded_any = True
+            value = validate(data)
+            if value is not None:
+                agent_json_stats.record(kind, "reparado" if attempt else "ok")
+                return value
+            break
+    agent_json_stats.record(kind, "invalido" if decoded_any else "sem_json")
+    return None
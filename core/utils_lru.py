@@ -0,0 +1,97 @@
+import threading
+from collections import OrderedDict
+
+
+class ByteLRUCache:
+    """
+    Cache LRU em memória limitado pelo tamanho (em bytes) dos valores, seguro entre threads.
+    O tamanho de cada valor é informado por quem o guarda (ex: o tamanho do JSON de origem).
+
+    Cada entrada é guardada sob uma 'geração': quando a geração avança (alguém gravou no banco),
+    todo o conteúdo é descartado, e valores lidos sob uma geração antiga são recusados por put().
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.generation = None
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # chave -> (valor, tamanho)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """Retorna o valor guardado (marcando-o como usado agora) ou None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size, generation):
+        """
+        Guarda um valor lido sob 'generation', removendo os usados há mais tempo até caber no limite.
+        Valores de uma geração que já não é a atual, ou maiores que o limite, não são guardados.
+        """
+        with self._lock:
+            if generation != self.generation or size > self.max_bytes:
+                return False
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            self._evict_locked()
+            return True
+
+    def set_generation(self, generation):
+        """
+        Avança para 'generation', descartando tudo se ela for mais nova que a atual.
+        Gerações só crescem: uma leitura atrasada de um valor anterior é ignorada.
+        """
+        with self._lock:
+            if self.generation is not None and generation <= self.generation:
+                return
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._bytes = 0
+            self.generation = generation
+
+    def resize(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict_locked()
+
+    def clear(self):
+        """Esvazia o cache e esquece a geração (a próxima leitura do contador a define de novo)."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.generation = None
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "generation": self.generation,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
+
+    def _evict_locked(self):
+        while self._bytes > self.max_bytes and self._entries:
+            _, (_, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
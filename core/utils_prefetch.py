@@ -0,0 +1,124 @@
+import time
+import threading
+
+from utils_cache_sqlite import add_prefetch_usage, get_news_job_counts, get_prefetch_usage
+
+CHARS_PER_TOKEN = 4  # média aproximada de caracteres por token em português
+
+
+def estimate_tokens(*texts):
+    """Estimativa de tokens de um conjunto de textos (prompt e resposta), pelo número de caracteres."""
+    return sum(len(text or "") for text in texts) // CHARS_PER_TOKEN + 1
+
+
+def _today():
+    return time.strftime("%Y-%m-%d", time.gmtime())
+
+
+class NewsPrefetcher:
+    """
+    Pré-geração das notícias dos tópicos em alta: quando uma lista nova de tópicos chega, enfileira
+    (como jobs 'prefetch', de prioridade menor) os primeiros 'top_k' tópicos que ainda não estão no cache,
+    para que o clique num tópico em alta já encontre a notícia pronta.
+    O gasto é limitado por um orçamento diário de tokens (dia UTC, somando todos os processos);
+    a estimativa de uma geração é a média das pré-gerações do dia, ou 'default_estimate' no início do dia.
+    """
+
+    def __init__(self, submit, is_cached, is_similar, top_k, daily_tokens, default_estimate):
+        """
+        'submit(topico, categoria, origem)' enfileira a geração (NewsJobQueue.submit),
+        'is_cached(topico, categoria)' diz se a notícia já está no cache e 'is_similar(topico, categoria)'
+        se a de um tópico parecido está (a busca pelo tópico a reaproveitaria, então não vale pré-gerar).
+        'top_k' igual a 0 desativa a pré-geração.
+        """
+        self.submit = submit
+        self.is_cached = is_cached
+        self.is_similar = is_similar
+        self.top_k = top_k
+        self.daily_tokens = daily_tokens
+        self.default_estimate = default_estimate
+        self._lock = threading.Lock()
+        self.scheduled = 0
+        self.skipped_cached = 0
+        self.skipped_similar = 0
+        self.skipped_budget = 0
+
+    @property
+    def enabled(self):
+        return self.top_k > 0
+
+    def _estimate(self, tokens, geracoes):
+        return tokens // geracoes if geracoes else self.default_estimate
+
+    def remaining_tokens(self):
+        """Tokens do orçamento de hoje ainda livres, descontando a estimativa das pré-gerações na fila."""
+        tokens, geracoes = get_prefetch_usage(_today())
+        counts = get_news_job_counts("prefetch")
+        active = counts.get("pendente", 0) + counts.get("processando", 0)
+        return self.daily_tokens - tokens - active * self._estimate(tokens, geracoes)
+
+    def has_budget(self):
+        """Se ainda há orçamento hoje para começar uma pré-geração já enfileirada."""
+        tokens, _ = get_prefetch_usage(_today())
+        return tokens < self.daily_tokens
+
+    def record_usage(self, tokens):
+        add_prefetch_usage(_today(), tokens)
+
+    def schedule(self, topicos):
+        """
+        Enfileira a pré-geração dos primeiros 'top_k' tópicos da lista que não estão no cache
+        nem já na fila, enquanto couberem no orçamento. Retorna os tópicos enfileirados.
+        """
+        if not self.enabled:
+            return []
+        remaining = self.remaining_tokens()
+        tokens, geracoes = get_prefetch_usage(_today())
+        estimate = self._estimate(tokens, geracoes)
+        enqueued = []
+        skipped_cached = skipped_similar = skipped_budget = 0
+        for item in topicos:
+            if len(enqueued) >= self.top_k:
+                break
+            # Mesma normalização do campo de busca do frontend, para o clique encontrar a mesma chave
+            topico = (item.get("topico") or "").strip()
+            categoria = (item.get("categoria") or "Geral").strip()
+            if not topico:
+                continue
+            if self.is_cached(topico, categoria):
+                skipped_cached += 1
+                continue
+            if self.is_similar(topico, categoria):
+                skipped_similar += 1
+                continue
+            if remaining < estimate:
+                skipped_budget = self.top_k - len(enqueued)
+                break
+            _, created = self.submit(topico, categoria, "prefetch")
+            if created:
+                remaining -= estimate
+            enqueued.append(topico)
+        with self._lock:
+            self.scheduled += len(enqueued)
+            self.skipped_cached += skipped_cached
+            self.skipped_similar += skipped_similar
+            self.skipped_budget += skipped_budget
+        if enqueued or skipped_budget:
+            print(f"Pré-geração: {len(enqueued)} tópico(s) enfileirado(s), {skipped_cached} já no cache, "
+                  f"{skipped_similar} com tópico parecido no cache, {skipped_budget} sem orçamento.")
+        return enqueued
+
+    def stats(self):
+        tokens, geracoes = get_prefetch_usage(_today())
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "top_k": self.top_k,
+                "daily_tokens": self.daily_tokens,
+                "tokens_used_today": tokens,
+                "generated_today": geracoes,
+                "scheduled": self.scheduled,
+                "skipped_cached": self.skipped_cached,
+                "skipped_similar": self.skipped_similar,
+                "skipped_budget": self.skipped_budget
+            }
@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import base64
+import asyncio
+import hashlib
+import threading
+
+from config import UPSTREAM_MODE, UPSTREAM_FIXTURES_DIR, UPSTREAM_REPLAY_LATENCY
+from utils_similarity import jaccard, normalize_tokens
+
+
+class UpstreamFixtures:
+    """
+    Gravação e reprodução das chamadas a uma API externa (agente ou TTS da Gemini), para medir e
+    testar a carga do servidor numa máquina sem rede.
+      - "live": repassa a chamada, sem gravar;
+      - "record": repassa a chamada e grava em 'directory' (um JSON por chamada) a resposta e os
+        eventos ou pedaços transmitidos, com o instante de cada um;
+      - "replay": não chama a API: devolve a gravação com os mesmos tempos multiplicados por 'latency_scale'.
+    A gravação é escolhida pela chamada exata (ex: agente e prompt); se não houver, pela de texto mais
+    parecido (índice de Jaccard dos termos), para que tópicos nunca gravados recebam uma resposta do mesmo tipo.
+    """
+
+    def __init__(self, kind, mode, directory, latency_scale):
+        self.kind = kind
+        self.mode = mode
+        self.directory = directory
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._fixtures = None  # digest -> gravação, carregadas no primeiro uso do modo "replay"
+        self._terms = []  # (termos do texto, digest) para a busca da gravação mais parecida
+        self.recorded = 0
+        self.replayed = 0
+        self.replayed_similar = 0
+
+    @property
+    def recording(self):
+        return self.mode == "record"
+
+    @property
+    def replaying(self):
+        return self.mode == "replay"
+
+    def _digest(self, key):
+        return hashlib.sha256("\x00".join(key).encode("utf-8")).hexdigest()
+
+    def _save(self, key, gravacao):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{self.kind}-{self._digest(key)[:16]}.json")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"tipo": self.kind, "chave": list(key), **gravacao}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)  # Quem lê nunca vê um arquivo pela metade
+        with self._lock:
+            self.recorded += 1
+
+    def _load(self):
+        with self._lock:
+            if self._fixtures is not None:
+                return
+            fixtures, terms = {}, []
+            prefix = f"{self.kind}-"
+            names = sorted(os.listdir(self.directory)) if os.path.isdir(self.directory) else []
+            for name in names:
+                if not (name.startswith(prefix) and name.endswith(".json")):
+                    continue
+                with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                    gravacao = json.load(f)
+                digest = self._digest(gravacao["chave"])
+                fixtures[digest] = gravacao
+                terms.append((normalize_tokens(gravacao["chave"][-1]), digest))
+            self._fixtures, self._terms = fixtures, terms
+            print(f"Reprodução ({self.kind}): {len(fixtures)} gravação(ões) carregada(s) de '{self.directory}'.")
+
+    def find(self, key):
+        """Gravação da chamada 'key' (o último elemento é o texto enviado), ou a de texto mais parecido."""
+        self._load()
+        gravacao = self._fixtures.get(self._digest(key))
+        if gravacao is None:
+            if not self._terms:
+                raise RuntimeError(f"Nenhuma gravação de '{self.kind}' em '{self.directory}' (grave antes com UPSTREAM_MODE=record).")
+            terms = normalize_tokens(key[-1])
+            _, digest = max(self._terms, key=lambda item: jaccard(terms, item[0]))
+            gravacao = self._fixtures[digest]
+            with self._lock:
+                self.replayed_similar += 1
+        with self._lock:
+            self.replayed += 1
+        return gravacao
+
+    def _timeline(self, gravacao, itens):
+        """Gera (segundos a esperar, item) para reproduzir os itens gravados nos seus instantes, e (espera, None) no fim."""
+        elapsed = 0.0
+        for item in gravacao[itens]:
+            at = item["t"] * self.latency_scale
+            yield max(0.0, at - elapsed), item
+            elapsed = max(elapsed, at)
+        yield max(0.0, gravacao["duracao"] * self.latency_scale - elapsed), None
+
+    # --- Agente: texto da resposta e eventos de progresso (ver call_agent) ---
+    def _capture(self, on_progress, start, eventos):
+        if on_progress is None:
+            return None
+
+        def capture(tipo, dados):
+            eventos.append({"t": time.monotonic() - start, "tipo": tipo, "dados": dados})
+            on_progress(tipo, dados)
+        return capture
+
+    def call(self, key, run, on_progress=None):
+        """
+        Uma chamada ao agente: 'run(on_progress)' faz a chamada real e retorna o texto da resposta.
+        Na reprodução, os eventos gravados são repassados a 'on_progress' nos seus instantes.
+        """
+        if self.replaying:
+            gravacao = self.find(key)
+            for wait, evento in self._timeline(gravacao, "eventos"):
+                time.sleep(wait)
+                if evento and on_progress:
+                    on_progress(evento["tipo"], evento["dados"])
+            return gravacao["texto"]
+        if not self.recording:
+            return run(on_progress)
+        start, eventos = time.monotonic(), []
+        texto = run(self._capture(on_progress, start, eventos))
+        self._save(key, {"texto": texto, "eventos": eventos, "duracao": time.monotonic() - start})
+        return texto
+
+    async def call_async(self, key, run, on_progress=None):
+        """Versão de call() para corrotinas: 'run(on_progress)' retorna uma corrotina."""
+        if self.replaying:
+            gravacao = self.find(key)
+            for wait, evento in self._timeline(gravacao, "eventos"):
+                await asyncio.sleep(wait)
+                if evento and on_progress:
+                    on_progress(evento["tipo"], evento["dados"])
+            return gravacao["texto"]
+        if not self.recording:
+            return await run(on_progress)
+        start, eventos = time.monotonic(), []
+        texto = await run(self._capture(on_progress, start, eventos))
+        self._save(key, {"texto": texto, "eventos": eventos, "duracao": time.monotonic() - start})
+        return texto
+
+    # --- TTS: pedaços de áudio transmitidos (bytes, mime_type) ---
+    def stream(self, key, run):
+        """Gera (bytes, mime_type) do áudio: 'run()' faz a chamada real e retorna o iterador dos pedaços."""
+        if self.replaying:
+            gravacao = self.find(key)
+            for wait, pedaco in self._timeline(gravacao, "pedacos"):
+                time.sleep(wait)
+                if pedaco:
+                    yield base64.b64decode(pedaco["dados"]), pedaco["mime_type"]
+            return
+        if not self.recording:
+            yield from run()
+            return
+        start, pedacos = time.monotonic(), []
+        for data, mime_type in run():
+            pedacos.append({"t": time.monotonic() - start, "dados": base64.b64encode(data).decode("ascii"), "mime_type": mime_type})
+            yield data, mime_type
+        self._save(key, {"pedacos": pedacos, "duracao": time.monotonic() - start})
+
+    def stats(self):
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "recorded": self.recorded,
+                "replayed": self.replayed,
+                "replayed_similar": self.replayed_similar
+            }
+
+
+# Compartilhados por todas as chamadas do processo
+agent_fixtures = UpstreamFixtures("agente", UPSTREAM_MODE, UPSTREAM_FIXTURES_DIR, UPSTREAM_REPLAY_LATENCY)
+tts_fixtures = UpstreamFixtures("tts", UPSTREAM_MODE, UPSTREAM_FIXTURES_DIR, UPSTREAM_REPLAY_LATENCY)
@@ -0,0 +1,150 @@
+import re
+import threading
+import unicodedata
+
+from utils_cache_sqlite import get_news_categories, get_news_generation, get_news_topics_since
+
+# Palavras que não ajudam a distinguir um assunto de outro (já sem acentos)
+STOPWORDS = frozenset("""
+a o as os um uma uns umas de da do das dos em no na nos nas ao aos e ou para pra por pelo pela pelos pelas
+com sem sobre entre ate apos que se sua seu suas seus mais menos como ja nao
+""".split())
+
+
+def _stem(token):
+    # Reduz o plural mais comum do português, para "eleição" e "eleições" virarem o mesmo termo
+    if len(token) > 4 and token.endswith(("oes", "aes")):
+        return token[:-3] + "ao"
+    if len(token) > 3 and token.endswith("s"):
+        return token[:-1]
+    return token
+
+
+def normalize_tokens(text):
+    """Conjunto de termos de um texto: sem acentos, em minúsculas, sem stopwords e com o plural reduzido."""
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode("ascii").lower()
+    return frozenset(_stem(token) for token in re.findall(r"[a-z0-9]+", text) if token not in STOPWORDS)
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class TopicSimilarityIndex:
+    """
+    Índice local dos tópicos e títulos das notícias em cache, para reaproveitar a notícia de um tópico
+    escrito de outro jeito ("Eleições 2026" e "eleições presidenciais 2026") em vez de gerar outra.
+    A semelhança é o índice de Jaccard entre os conjuntos de termos normalizados (normalize_tokens),
+    comparando o tópico buscado com o tópico e com o título de cada notícia; os candidatos saem de um
+    índice invertido por termo, então só as notícias com algum termo em comum são comparadas.
+    Só são reaproveitadas notícias da mesma categoria da busca: o mesmo assunto em outra categoria
+    ("Copa 2026" em Esportes e em Economia) costuma ser outra notícia.
+    O índice acompanha o cache de forma incremental (só as notícias com versão maior que a da última leitura,
+    quando a geração do cache muda); notícias removidas do cache são descartadas do índice ao serem encontradas,
+    e o índice é refeito quando passa de duas vezes o número de notícias no cache.
+    """
+
+    def __init__(self, threshold):
+        """'threshold' é a semelhança mínima (0 a 1) para reaproveitar uma notícia; 0 desativa o índice."""
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._entries = {}  # (topico, categoria) -> (termos do tópico, termos do título)
+        self._postings = {}  # termo -> {(topico, categoria), ...}
+        self._last_version = 0
+        self._generation = None
+        self.lookups = 0
+        self.matches = 0
+
+    @property
+    def enabled(self):
+        return self.threshold > 0
+
+    def _add(self, key, topico, titulo):
+        self._remove(key)
+        entry = (normalize_tokens(topico), normalize_tokens(titulo))
+        self._entries[key] = entry
+        for token in entry[0] | entry[1]:
+            self._postings.setdefault(token, set()).add(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for token in entry[0] | entry[1]:
+            keys = self._postings.get(token)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[token]
+
+    def _refresh(self):
+        generation = get_news_generation()
+        if generation == self._generation:
+            return
+        if len(self._entries) > 2 * sum(total for _, total in get_news_categories()) + 100:
+            # Muitas notícias já removidas do cache continuam no índice: refaz do zero
+            self._entries.clear()
+            self._postings.clear()
+            self._last_version = 0
+        for versao, topico, categoria, titulo in get_news_topics_since(self._last_version):
+            # Uma regravação do mesmo (topico, categoria) substitui a entrada anterior
+            self._add((topico, categoria), topico, titulo)
+            self._last_version = versao
+        self._generation = generation
+
+    def _candidates(self, tokens, categoria, exclude):
+        """(semelhança, chave) das notícias da 'categoria' acima do limiar, da mais parecida para a menos."""
+        keys = set()
+        for token in tokens:
+            keys |= self._postings.get(token, set())
+        keys.discard(exclude)
+        scored = []
+        for key in keys:
+            if key[1] != categoria:
+                continue
+            topic_tokens, title_tokens = self._entries[key]
+            score = max(jaccard(tokens, topic_tokens), jaccard(tokens, title_tokens))
+            if score >= self.threshold:
+                scored.append((score, key))
+        scored.sort(reverse=True)
+        return scored
+
+    def find(self, topico, categoria, lookup, record=True):
+        """
+        Procura a notícia de um tópico parecido com 'topico'. 'lookup((topico, categoria))' lê a notícia
+        do cache (None se ela foi removida). Retorna ((topico, categoria), notícia, semelhança) ou None.
+        Com 'record', cada notícia encontrada conta como uma geração (chamada ao agente) economizada;
+        sem ele a busca não entra nas estatísticas (ex: a pré-geração só consulta, não serve a notícia).
+        """
+        if not self.enabled:
+            return None
+        tokens = normalize_tokens(topico)
+        if not tokens:
+            return None
+        with self._lock:
+            self._refresh()
+            if record:
+                self.lookups += 1
+            candidates = self._candidates(tokens, categoria, (topico, categoria))
+        for score, key in candidates:
+            noticia = lookup(key)
+            if noticia is not None:
+                if record:
+                    with self._lock:
+                        self.matches += 1
+                return key, noticia, score
+            with self._lock:
+                self._remove(key)
+        return None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "threshold": self.threshold,
+                "indexed": len(self._entries),
+                "lookups": self.lookups,
+                "saved_calls": self.matches
+            }
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+
+
+class _Call:
+    """Estado de uma execução em andamento compartilhada pelas requisições que esperam por ela."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Agrupa chamadas concorrentes com a mesma chave numa única execução (dentro do processo).
+    A primeira chamada executa a função; as demais esperam e recebem o mesmo resultado
+    (ou a mesma exceção).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """
+        Executa fn() uma única vez por chave entre as chamadas simultâneas.
+        Retorna uma tupla (resultado, compartilhado), onde 'compartilhado' indica
+        que esta chamada apenas esperou a execução de outra.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                call.waiters += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result, False
+
+    def in_flight(self):
+        """Retorna quantas chaves estão em execução no momento."""
+        with self._lock:
+            return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """
+    Versão de SingleFlight para corrotinas num mesmo event loop: a primeira chamada com a chave
+    executa a corrotina numa task; as demais esperam pela mesma task (sem ocupar threads).
+    A task continua mesmo se quem a iniciou for cancelado (ex: o cliente desconectou), para que o
+    resultado chegue aos demais e seja gravado no cache.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+
+    async def do(self, key, make_coro):
+        """
+        Executa 'make_coro()' uma única vez por chave entre as chamadas simultâneas.
+        Retorna uma tupla (resultado, compartilhado), como SingleFlight.do.
+        """
+        task = self._tasks.get(key)
+        shared = task is not None
+        if not shared:
+            task = asyncio.ensure_future(make_coro())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._tasks.pop(key) if self._tasks.get(key) is done else None)
+        # shield: cancelar esta espera não cancela a execução compartilhada
+        return await asyncio.shield(task), shared
+
+    def in_flight(self):
+        """Retorna quantas chaves estão em execução no momento."""
+        return len(self._tasks)
@@ -0,0 +1,285 @@
+import re
+import time
+import asyncio
+import struct
+import hashlib
+import mimetypes
+import threading
+from queue import SimpleQueue
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from config import GOOGLE_API_KEY, TTS_CHUNK_MAX_CHARS, TTS_MAX_WORKERS, MAX_RETRIES
+from utils_governor import is_overload_error, tts_governor
+from utils_replay import tts_fixtures
+
+TTS_MODEL_NAME = "gemini-2.5-flash-preview-tts"
+
+# --- Formato de Áudio (WAV/PCM) ---
+def build_wav_header(mime_type: str, data_size: Optional[int]) -> bytes:
+    """
+    Gera um cabeçalho WAV para dados PCM do MIME type informado.
+    Com data_size=None gera um cabeçalho de streaming (tamanhos 0xFFFFFFFF), usado quando
+    o total ainda não é conhecido; os players leem até o fim do fluxo.
+    """
+    parameters = parse_audio_mime_type(mime_type)
+    bits_per_sample = parameters["bits_per_sample"]
+    sample_rate = parameters["rate"]
+    num_channels = 1
+    bytes_per_sample = bits_per_sample // 8
+    block_align = num_channels * bytes_per_sample
+    byte_rate = sample_rate * block_align
+    if data_size is None:
+        data_size = chunk_size = 0xFFFFFFFF
+    else:
+        chunk_size = 36 + data_size
+
+    print(f"Convertendo para WAV: bits_per_sample={bits_per_sample}, sample_rate={sample_rate}, num_channels={num_channels}, data_size={data_size}")
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", chunk_size, b"WAVE", b"fmt ",
+        16, 1, num_channels, sample_rate,
+        byte_rate, block_align, bits_per_sample,
+        b"data", data_size
+    )
+
+def convert_to_wav(audio_data: bytes, mime_type: str) -> bytes:
+    """Gera um cabeçalho WAV para os dados de áudio."""
+    return build_wav_header(mime_type, len(audio_data)) + audio_data
+
+def is_raw_pcm(mime_type: str) -> bool:
+    """Indica se o MIME type é áudio cru (ex: audio/L16) que precisa de cabeçalho WAV."""
+    return mimetypes.guess_extension(mime_type) is None and "L16" in mime_type
+
+def iter_tts_audio(response_stream):
+    """Gera (bytes, mime_type) para cada pedaço de áudio recebido do stream da Gemini."""
+    for chunk in response_stream:
+        if chunk.candidates and chunk.candidates[0].content and chunk.candidates[0].content.parts:
+            part = chunk.candidates[0].content.parts[0]
+            if part.inline_data and part.inline_data.data:
+                yield part.inline_data.data, part.inline_data.mime_type
+
+def parse_audio_mime_type(mime_type: str) -> dict[str, int | None]:
+    """Extrai bits_per_sample e rate do MIME type."""
+    bits_per_sample = 16
+    rate = 24000
+    print(f"Analisando MIME type: {mime_type}")
+    parts = mime_type.split(";")
+    for param in parts:
+        param = param.strip()
+        if param.lower().startswith("rate="):
+            try:
+                rate = int(param.split("=", 1)[1])
+            except (ValueError, IndexError):
+                pass
+        elif param.startswith("audio/L"):
+            try:
+                bits_per_sample = int(param.split("L", 1)[1])
+            except (ValueError, IndexError):
+                pass
+    print(f"Analisado: bits_per_sample={bits_per_sample}, rate={rate}")
+    return {"bits_per_sample": bits_per_sample, "rate": rate}
+
+# --- SDK da Gemini ---
+# Importado e configurado na primeira síntese, para não pesar na inicialização do servidor
+_genai = None
+_genai_lock = threading.Lock()
+
+def _get_genai():
+    global _genai
+    if _genai is None:
+        with _genai_lock:
+            if _genai is None:
+                import google.generativeai as genai
+                if GOOGLE_API_KEY:
+                    genai.configure(api_key=GOOGLE_API_KEY)
+                _genai = genai
+    return _genai
+
+# --- Síntese de Voz em Pedaços ---
+# Pool compartilhado por todas as requisições: limita quantas chamadas TTS rodam ao mesmo tempo no processo
+_tts_executor = ThreadPoolExecutor(max_workers=TTS_MAX_WORKERS, thread_name_prefix="tts")
+
+def split_text_for_tts(text: str, max_chars: int = TTS_CHUNK_MAX_CHARS) -> list[str]:
+    """
+    Divide o texto em pedaços de até max_chars caracteres, respeitando parágrafos e frases.
+    Frases são agrupadas dentro do mesmo parágrafo, mas um pedaço nunca atravessa parágrafos.
+    Uma frase maior que max_chars é quebrada nos espaços.
+    """
+    pieces = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        for sentence in re.split(r"(?<=[.!?…])\s+", paragraph.strip()):
+            sentence = " ".join(sentence.split())
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(" ", 0, max_chars)
+                cut = cut if cut > 0 else max_chars
+                pieces.append(sentence[:cut])
+                sentence = sentence[cut:].strip()
+            if sentence:
+                pieces.append(sentence)
+        # Marca o fim do parágrafo
+        pieces.append(None)
+
+    chunks, current = [], ""
+    for piece in pieces:
+        if piece is None:
+            if current:
+                chunks.append(current)
+            current = ""
+            continue
+        if current and len(current) + 1 + len(piece) > max_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current} {piece}" if current else piece
+    return chunks
+
+def tts_cache_key(text: str, voice: str, model_name: str, kind: str = "texto") -> str:
+    """
+    Chave do cache de áudio: hash do texto normalizado (espaços), da voz e do modelo.
+    'kind' é o formato guardado: "texto" é o WAV completo de um texto (o único gravado hoje; as chaves
+    "pedaco", do PCM de cada pedaço, só existem em caches antigos e saem pelo LRU).
+    """
+    normalized = " ".join(text.split())
+    return hashlib.sha256(f"{kind}\0{model_name}\0{voice}\0{normalized}".encode("utf-8")).hexdigest()
+
+def synthesize_speech_stream(text: str, voice: str, model_name: str = TTS_MODEL_NAME):
+    """
+    Chama a Gemini TTS para um texto e gera (bytes, mime_type) à medida que o áudio chega.
+    Com UPSTREAM_MODE=replay o áudio vem de uma gravação (ver UpstreamFixtures), sem chamar a API.
+    """
+    def live():
+        contents = [
+            {"parts": [{"text": text}]}
+        ]
+        generate_content_config = {
+            "response_modalities": ["AUDIO"],
+            "speech_config": {
+                "voice_config": {
+                    "prebuilt_voice_config": {"voice_name": voice}
+                }
+            },
+        }
+        model = _get_genai().GenerativeModel(model_name)
+        response_stream = model.generate_content(
+            contents=contents,
+            generation_config=generate_content_config,
+            stream=True
+        )
+        return iter_tts_audio(response_stream)
+
+    return tts_fixtures.stream((model_name, voice, text), live)
+
+def stream_chunk_audio(text: str, voice: str, emit, model_name: str = TTS_MODEL_NAME):
+    """
+    Sintetiza um pedaço de texto na Gemini (pelo controle de chamadas tts_governor) e repassa cada
+    (bytes, mime_type) do áudio a 'emit' à medida que chega. Os pedaços não são gravados no cache de TTS:
+    só o WAV completo do texto é (ver generate_tts_endpoint), para o mesmo áudio não ocupar o orçamento duas vezes.
+    'emit' roda com a vaga do tts_governor ocupada e não deve bloquear (ex: pôr numa fila): um cliente lento
+    seguraria a vaga e o tempo de leitura dele contaria como latência da Gemini.
+    Erros de sobrecarga antes do primeiro byte são repetidos com espera exponencial com jitter.
+    """
+    received = False
+    attempt = 0
+    while True:
+        try:
+            with tts_governor.call():
+                for item in synthesize_speech_stream(text, voice, model_name):
+                    received = True
+                    emit(item)
+            break
+        except Exception as e:
+            attempt += 1
+            # O áudio já entregue não pode ser desfeito, então só se repete antes do primeiro byte
+            if received or not is_overload_error(e) or attempt >= MAX_RETRIES or tts_governor.is_open:
+                raise
+            backoff_time = tts_governor.backoff(attempt)
+            print(f"Erro de servidor na Gemini TTS: {e}. Retentando em {backoff_time:.1f} segundos...")
+            time.sleep(backoff_time)
+
+def _synthesize_chunk(text: str, voice: str, model_name: str) -> list:
+    audio = []
+    stream_chunk_audio(text, voice, audio.append, model_name)
+    return audio
+
+def iter_article_audio(text: str, voice: str, model_name: str = TTS_MODEL_NAME):
+    """
+    Gera (bytes, mime_type) do áudio de um texto longo, na ordem do texto.
+    O texto é dividido em pedaços sintetizados em paralelo no pool; o primeiro pedaço é transmitido
+    à medida que chega (o áudio começa a sair logo) enquanto os demais já estão sendo gerados.
+    O tempo total fica próximo ao do pedaço mais lento.
+    O primeiro pedaço também é recebido por uma thread do pool, que o repassa por uma fila: quem consome
+    (o cliente HTTP) pode ler devagar sem segurar a vaga no tts_governor.
+    """
+    chunks = split_text_for_tts(text)
+    if not chunks:
+        return
+    first = SimpleQueue()
+    done = object()
+
+    def stream_first():
+        try:
+            stream_chunk_audio(chunks[0], voice, first.put, model_name)
+        except BaseException as e:
+            first.put(e)
+        else:
+            first.put(done)
+
+    _tts_executor.submit(stream_first)
+    futures = [_tts_executor.submit(_synthesize_chunk, chunk, voice, model_name) for chunk in chunks[1:]]
+    if futures:
+        print(f"Sintetizando áudio em {len(chunks)} pedaços em paralelo...")
+    try:
+        while (item := first.get()) is not done:
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+        for future in futures:
+            yield from future.result()
+    finally:
+        # Se o consumidor desistir, pedaços que ainda não começaram não são gerados
+        for future in futures:
+            future.cancel()
+
+async def aiter_article_audio(text: str, voice: str, model_name: str = TTS_MODEL_NAME):
+    """
+    Versão de iter_article_audio para o modo ASGI. O primeiro pedaço também é transmitido por uma thread
+    do pool e repassado ao event loop por uma fila, então quem consome não ocupa nenhuma thread:
+    as chamadas à Gemini ficam limitadas ao pool (TTS_MAX_WORKERS) e as requisições só esperam.
+    """
+    chunks = split_text_for_tts(text)
+    if not chunks:
+        return
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    done = object()
+
+    def put(item):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+        except RuntimeError:
+            pass  # Event loop encerrado (servidor parando): não há mais quem receba o áudio
+
+    def stream_first():
+        try:
+            stream_chunk_audio(chunks[0], voice, put, model_name)
+        except BaseException as e:
+            put(e)
+        else:
+            put(done)
+
+    _tts_executor.submit(stream_first)
+    futures = [_tts_executor.submit(_synthesize_chunk, chunk, voice, model_name) for chunk in chunks[1:]]
+    if futures:
+        print(f"Sintetizando áudio em {len(chunks)} pedaços em paralelo...")
+    try:
+        while (item := await queue.get()) is not done:
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+        for future in futures:
+            for item in await asyncio.wrap_future(future):
+                yield item
+    finally:
+        for future in futures:
+            future.cancel()